@@ -0,0 +1,215 @@
+"""
+Shot-grouping analytics for the QuiverStats backend.
+
+Impact coordinates are loaded straight from column-projected selects into
+NumPy arrays, and every statistic is computed with vectorized array
+operations, so grouping a quiver with 100k shots never loops over ORM objects
+or individual shots in Python.
+
+Coordinates are offsets from the target centre, in target units.
+"""
+
+import itertools
+import math
+
+import numpy as np
+from sqlalchemy import select
+
+from backend.extensions import db
+from backend.models import Arrow, ArrowScore
+
+
+def load_impacts(stmt):
+    """
+    Run a select of ``(x, y)`` pairs and return them as an ``(n, 2)`` array.
+
+    Args:
+        stmt (Select): A select whose first two columns are x and y.
+
+    Returns:
+        numpy.ndarray: The coordinates as float64, one row per shot.
+    """
+    # flattening the rows into fromiter avoids NumPy inspecting each Row as a
+    # nested sequence, which is an order of magnitude slower
+    result = db.session.execute(stmt)
+    flat = np.fromiter(itertools.chain.from_iterable(result), dtype=float)
+    return flat.reshape(-1, 2)
+
+
+def arrow_impacts(arrow_id):
+    """
+    Load the recorded impact coordinates of one arrow.
+
+    Args:
+        arrow_id (int): The ID of the arrow.
+
+    Returns:
+        numpy.ndarray: An ``(n, 2)`` array of impact coordinates.
+    """
+    return load_impacts(
+        select(ArrowScore.x, ArrowScore.y).where(
+            ArrowScore.arrow_id == arrow_id, ArrowScore.x.is_not(None)
+        )
+    )
+
+
+def quiver_impacts(quiver_id):
+    """
+    Load the recorded impact coordinates of every arrow in a quiver.
+
+    Args:
+        quiver_id (int): The ID of the quiver.
+
+    Returns:
+        numpy.ndarray: An ``(n, 2)`` array of impact coordinates.
+    """
+    return load_impacts(
+        select(ArrowScore.x, ArrowScore.y)
+        .join(Arrow, Arrow.id == ArrowScore.arrow_id)
+        .where(Arrow.quiver_id == quiver_id, ArrowScore.x.is_not(None))
+    )
+
+
+def _hull_candidates(points):
+    """
+    Discard points that cannot lie on the convex hull (Akl-Toussaint filter).
+
+    The extreme points along x, y and both diagonals span a convex polygon;
+    anything strictly inside it is not a hull vertex. For typical shot groups
+    this leaves only a few dozen points.
+
+    Args:
+        points (numpy.ndarray): An ``(n, 2)`` array of points.
+
+    Returns:
+        numpy.ndarray: The points that may be hull vertices.
+    """
+    x, y = points[:, 0], points[:, 1]
+    extremes = np.unique(
+        np.array(
+            [
+                np.argmin(x), np.argmax(x), np.argmin(y), np.argmax(y),
+                np.argmin(x + y), np.argmax(x + y), np.argmin(x - y), np.argmax(x - y),
+            ]
+        )
+    )
+    polygon = points[extremes]
+    if len(polygon) < 3:
+        return points
+    centre = polygon.mean(axis=0)
+    order = np.argsort(np.arctan2(polygon[:, 1] - centre[1], polygon[:, 0] - centre[0]))
+    polygon = polygon[order]
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    # cross product of each edge with the vector to each point: (edges, points)
+    rel_x = x[None, :] - polygon[:, 0, None]
+    rel_y = y[None, :] - polygon[:, 1, None]
+    cross = edges[:, 0, None] * rel_y - edges[:, 1, None] * rel_x
+    inside = np.all(cross > 0, axis=0)
+    return points[~inside]
+
+
+def _convex_hull(points):
+    """
+    Return the vertices of the convex hull (Andrew's monotone chain).
+
+    Args:
+        points (numpy.ndarray): An ``(n, 2)`` array of points.
+
+    Returns:
+        numpy.ndarray: The hull vertices in counter-clockwise order.
+    """
+    points = np.unique(points, axis=0)
+    if len(points) < 3:
+        return points
+    points = points.tolist()
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in points[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+
+def extreme_spread(points):
+    """
+    Return the largest distance between any two impacts.
+
+    Only hull vertices can be the farthest pair, so the pairwise distances are
+    computed over the (small) hull rather than over every shot.
+
+    Args:
+        points (numpy.ndarray): An ``(n, 2)`` array of impact coordinates.
+
+    Returns:
+        float: The extreme spread, 0.0 for fewer than two shots.
+    """
+    if len(points) < 2:
+        return 0.0
+    hull = _convex_hull(_hull_candidates(points))
+    diffs = hull[:, None, :] - hull[None, :, :]
+    return float(np.sqrt((diffs**2).sum(axis=-1).max()))
+
+
+def grouping(points, confidence=0.95):
+    """
+    Compute grouping statistics for a set of impacts.
+
+    Args:
+        points (numpy.ndarray): An ``(n, 2)`` array of impact coordinates.
+        confidence (float): The probability mass the covariance ellipse covers.
+
+    Returns:
+        dict: The shot count, centroid, mean radius, extreme spread, CEP50
+        (median distance from the centroid), the sample covariance matrix and
+        the covariance ellipse (semi-axes and the major axis angle in degrees,
+        in [0, 180)).
+        Statistics that need more shots than are available are None.
+    """
+    count = len(points)
+    result = {
+        "count": count,
+        "centroid": None,
+        "mean_radius": None,
+        "extreme_spread": None,
+        "cep50": None,
+        "covariance": None,
+        "ellipse": None,
+    }
+    if count == 0:
+        return result
+
+    centroid = points.mean(axis=0)
+    radii = np.hypot(points[:, 0] - centroid[0], points[:, 1] - centroid[1])
+    result.update(
+        centroid={"x": float(centroid[0]), "y": float(centroid[1])},
+        mean_radius=float(radii.mean()),
+        extreme_spread=extreme_spread(points),
+        cep50=float(np.median(radii)),
+    )
+    if count < 2:
+        return result
+
+    covariance = np.cov(points, rowvar=False)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    eigenvalues = np.clip(eigenvalues, 0.0, None)
+    # chi-square quantile with two degrees of freedom
+    scale = math.sqrt(-2.0 * math.log(1.0 - confidence))
+    major = eigenvectors[:, 1]
+    result.update(
+        covariance=covariance.tolist(),
+        ellipse={
+            "confidence": confidence,
+            "major": float(scale * math.sqrt(eigenvalues[1])),
+            "minor": float(scale * math.sqrt(eigenvalues[0])),
+            "angle": float(math.degrees(math.atan2(major[1], major[0])) % 180.0),
+        },
+    )
+    return result
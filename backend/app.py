@@ -2,49 +2,206 @@
 This module defines the Flask application for the QuiverStats backend.
 
 It includes routes for managing quivers, arrows, and arrow scores, as well as
-database initialization and configuration.
+database initialization and configuration. The routes live on the ``api``
+blueprint, and :func:`create_app` builds a configured application around it;
+``backend.app.app`` is a default application, created from the environment
+on first access.
+
+Worker start-up is kept short: the NumPy-backed modules (analytics,
+bootstrap, heatmap and scoring) are imported inside the routes that use them,
+and Flask-Migrate only when the app is loaded by the ``flask`` command.
 """
 
+# pylint: disable=import-outside-toplevel
+
+import time
+
+_import_started = time.perf_counter()
+
+# pylint: disable=wrong-import-position
+import io
 import os  # 1. access environment vars
-from dotenv import load_dotenv  # 2. read .env file
-from flask import Flask, jsonify, request, abort  # 3. core Flask imports
-from flask_cors import CORS  # 5. CORS support
-from flask_migrate import Migrate
+import click
+from flask import (  # 2. core Flask imports
+    Blueprint,
+    Flask,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    abort,
+    stream_with_context,
+)
+from flask_cors import CORS  # 3. CORS support
+from sqlalchemy import Float, cast, select
 from backend.extensions import db  # Import db from extensions
-from backend.models import Quiver, Arrow, ArrowScore  # Import models here
+from backend.engine import configure_engines, install_pragmas
+from backend.cache import stats_cache
+from backend.metrics import (
+    metrics,
+    cache_collector,
+    write_buffer_collector,
+    event_hub_collector,
+    replica_collector,
+    startup_collector,
+    PROMETHEUS_MIMETYPE,
+)
+from backend.writebehind import write_buffer
+from backend.events import event_hub, scores_created, arrow_event
+from backend.replica import REPLICA, replica_router
+from backend.models import (  # Import models here
+    Quiver,
+    Arrow,
+    ArrowScore,
+    ArrowStats,
+    ArrowHeatmap,
+    DailyRollup,
+    utcnow,
+)
+from backend.stats import (
+    empty_stats,
+    record_scores,
+    forget_scores,
+    stats_to_dict,
+    rank_arrows,
+)
+from backend.ingest import is_score, shot_error, parse_timestamp, bulk_insert_scores
+from backend.pagination import list_response, NDJSON_MIMETYPE
+from backend import serialization
+from backend.versioning import touch, etag_for, not_modified, tagged
+from backend.deletion import purge_quiver, purge_arrow
+from backend.trend import BUCKETS, score_trend
+from backend.rollup import DEFAULT_BATCH_SIZE, DEFAULT_LAG, run_rollup, forget_rolled_up
+from backend.archive import FORMATS, ArchiveError, export_archive, import_archive
+from backend.dashboard import SORTS, dashboard
+
+# 4. Every route and CLI command is registered on this blueprint
+api = Blueprint("api", __name__, cli_group=None)
 
-# 6. Load variables from .env into os.environ
-load_dotenv()
+# The default application, see __getattr__
+_app = None
 
-# 7. Create Flask app instance
-app = Flask(__name__)
 
-# 8. Enable CORS on all routes
-CORS(app)
+def create_app(config=None):
+    """
+    Create and configure a QuiverStats application.
+
+    Settings not given fall back to the environment (and a ``.env`` file):
+    ``DATABASE_URL`` for the database and the optional
+    ``DATABASE_REPLICA_URL`` for a read replica (see ``backend.replica``).
+    Engine and pool settings are described in ``backend.engine``.
 
-# 9. Configure database connection
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ["DATABASE_URL"]
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    Args:
+        config (Mapping | None): App config values, applied before any
+            extension is initialized.
 
-# 10. Initialize extensions
-db.init_app(app)  # Initialize db with the app
-migrate = Migrate(app, db)
+    Returns:
+        flask.Flask: The application.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
 
+    # 5. Enable CORS on all routes
+    CORS(app, expose_headers=["X-Next-After"])
 
-@app.route("/api/quivers", methods=["GET"])
+    # 6. Configure the database connection, reading .env only when needed
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config.update(config or {})
+    if "SQLALCHEMY_DATABASE_URI" not in app.config:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.environ["DATABASE_URL"]
+        if os.environ.get("DATABASE_REPLICA_URL"):
+            app.config.setdefault(
+                "SQLALCHEMY_BINDS", {REPLICA: os.environ["DATABASE_REPLICA_URL"]}
+            )
+    configure_engines(app)
+    # Processes the comparison endpoint spreads bootstrap resampling over
+    app.config.setdefault("BOOTSTRAP_WORKERS", 1)
+
+    # 7. Initialize extensions
+    serialization.init_app(app)
+    db.init_app(app)  # Initialize db with the app
+    with app.app_context():
+        install_pragmas(app, db.engines.values())
+    stats_cache.init_app(app)
+    metrics.init_app(app)
+    metrics.add_collector(cache_collector(stats_cache))
+    write_buffer.init_app(app)
+    metrics.add_collector(write_buffer_collector(write_buffer))
+    event_hub.init_app(app)
+    metrics.add_collector(event_hub_collector(event_hub))
+    replica_router.init_app(app)
+    metrics.add_collector(replica_collector(replica_router))
+    if click.get_current_context(silent=True) is not None:
+        # only the flask command needs the migration commands (and Alembic)
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+
+    # 8. Register the routes and CLI commands
+    app.register_blueprint(api)
+    app.shell_context_processor(make_shell_context)
+
+    startup = time.perf_counter() - started
+    if _app is None:
+        # the first application also pays for importing the backend
+        startup += _import_seconds
+    app.extensions["startup_seconds"] = startup
+    metrics.add_collector(startup_collector(startup))
+    return app
+
+
+@api.route("/api/quivers", methods=["GET"])
 def list_quivers():
     """
     Retrieve a list of all quivers from the database and return them as a JSON response.
 
+    Supports keyset pagination through the ``limit`` and ``after`` query
+    parameters and NDJSON streaming (see ``backend.pagination``).
+
     Returns:
         flask.Response: A JSON response containing a list of quivers, where each quiver is
         represented as a dictionary with 'id' and 'name' keys.
     """
-    quivers = Quiver.query.all()
-    return jsonify([{"id": q.id, "name": q.name} for q in quivers])
+    return list_response(select(Quiver.id, Quiver.name), Quiver.id)
 
 
-@app.route("/api/quivers", methods=["POST"])
+@api.route("/api/dashboard", methods=["GET"])
+def get_dashboard():
+    """
+    Summarize every quiver for the dashboard in one request.
+
+    The optional query parameters are ``sort`` (one of ``id``, ``name``,
+    ``arrows``, ``shots``, ``mean`` and ``last_activity``; default ``id``),
+    ``order`` (``asc`` or ``desc``), ``limit`` (default 50, at most 500) and
+    ``offset``. See ``backend.dashboard`` for how the figures are computed.
+
+    Returns:
+        flask.Response: A JSON response containing the total number of quivers
+        and, per quiver on the page, its arrow count, shot count, mean score
+        and last-activity time.
+    """
+    sort = request.args.get("sort", "id")
+    if sort not in SORTS:
+        abort(400, f"sort must be one of: {', '.join(SORTS)}")
+    order = request.args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        abort(400, "order must be asc or desc")
+    limit = request.args.get("limit", 50, type=int)
+    if not 1 <= limit <= 500:
+        abort(400, "limit must be between 1 and 500")
+    offset = request.args.get("offset", 0, type=int)
+    if offset < 0:
+        abort(400, "offset must not be negative")
+    payload = dashboard(sort, order == "desc", limit, offset)
+    return jsonify(
+        {"sort": sort, "order": order, "limit": limit, "offset": offset, **payload}
+    )
+
+
+@api.route("/api/quivers", methods=["POST"])
 def create_quiver():
     """
     Create a new quiver with the provided name.
@@ -62,31 +219,82 @@ def create_quiver():
     return jsonify({"id": q.id, "name": q.name}), 201
 
 
-@app.route("/api/quivers/<int:quiver_id>", methods=["GET"])
+@api.route("/api/quivers/<int:quiver_id>", methods=["GET"])
 def get_quiver(quiver_id):
     """
     Retrieve a specific quiver by its ID, including its associated arrows.
 
+    The optional ``expand`` query parameter is a comma-separated list of
+    ``arrows``, ``scores`` and ``stats``. Arrows are always included; ``scores``
+    adds each arrow's scores and ``stats`` its summary statistics. Each
+    expansion costs one column-projected query for the whole quiver, so the
+    number of queries does not depend on how many arrows the quiver has.
+
+    The response carries a weak ETag from the quiver's version; a matching
+    ``If-None-Match`` gets a 304 before any arrow or score is read.
+
     Args:
         quiver_id (int): The ID of the quiver to retrieve.
 
     Returns:
         flask.Response: A JSON response containing the quiver's details.
     """
+    expand = {part for part in request.args.get("expand", "").split(",") if part}
+    unknown = expand - {"arrows", "scores", "stats"}
+    if unknown:
+        abort(400, f"Cannot expand {', '.join(sorted(unknown))}")
+
     q = db.session.get(Quiver, quiver_id)
     if q is None:
         abort(404)
+    etag = etag_for(q)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
-    return jsonify(
-        {
-            "id": q.id,
-            "name": q.name,
-            "arrows": [{"id": a.id, "name": a.name} for a in q.arrows],
+    arrows = [
+        {"id": row.id, "name": row.name}
+        for row in db.session.execute(
+            select(Arrow.id, Arrow.name)
+            .where(Arrow.quiver_id == q.id)
+            .order_by(Arrow.id)
+        )
+    ]
+    if "scores" in expand:
+        scores = {a["id"]: [] for a in arrows}
+        for row in db.session.execute(
+            select(
+                ArrowScore.arrow_id,
+                ArrowScore.id,
+                cast(ArrowScore.score, Float).label("score"),
+                ArrowScore.x,
+                ArrowScore.y,
+            )
+            .join(Arrow, Arrow.id == ArrowScore.arrow_id)
+            .where(Arrow.quiver_id == q.id)
+            .order_by(ArrowScore.arrow_id, ArrowScore.id)
+        ):
+            scores[row.arrow_id].append(
+                {"id": row.id, "score": row.score, "x": row.x, "y": row.y}
+            )
+        for a in arrows:
+            a["scores"] = scores[a["id"]]
+    if "stats" in expand:
+        stats = {
+            s.arrow_id: s
+            for s in db.session.scalars(
+                select(ArrowStats)
+                .join(Arrow, Arrow.id == ArrowStats.arrow_id)
+                .where(Arrow.quiver_id == q.id)
+            )
         }
-    )
+        for a in arrows:
+            a["stats"] = stats_to_dict(a["id"], stats.get(a["id"]))
+
+    return tagged(jsonify({"id": q.id, "name": q.name, "arrows": arrows}), etag)
 
 
-@app.route("/api/quivers/<int:quiver_id>", methods=["PUT"])
+@api.route("/api/quivers/<int:quiver_id>", methods=["PUT"])
 def rename_quiver(quiver_id):
     """
     Update the name of a specific quiver.
@@ -103,14 +311,16 @@ def rename_quiver(quiver_id):
     data = request.get_json() or {}
     if "name" in data:
         q.name = data["name"]
+        touch(q)
         db.session.commit()
+        event_hub.publish(q.id, "quiver_updated", {"id": q.id, "name": q.name})
     return jsonify({"id": q.id, "name": q.name})
 
 
-@app.route("/api/quivers/<int:quiver_id>", methods=["DELETE"])
+@api.route("/api/quivers/<int:quiver_id>", methods=["DELETE"])
 def delete_quiver(quiver_id):
     """
-    Delete a specific quiver by its ID.
+    Delete a specific quiver by its ID, with its arrows and their scores.
 
     Args:
         quiver_id (int): The ID of the quiver to delete.
@@ -121,19 +331,24 @@ def delete_quiver(quiver_id):
     q = db.session.get(Quiver, quiver_id)
     if q is None:
         abort(404)
-    db.session.delete(q)
+    purge_quiver(q)
     db.session.commit()
+    event_hub.publish(quiver_id, "quiver_deleted", {"id": quiver_id})
     return jsonify({"message": "deleted"}), 204
 
 
 # —————————— Arrow CRUD ——————————
 
 
-@app.route("/api/quivers/<int:quiver_id>/arrows", methods=["GET"])
+@api.route("/api/quivers/<int:quiver_id>/arrows", methods=["GET"])
 def list_arrows(quiver_id):
     """
     Retrieve all arrows associated with a specific quiver.
 
+    Supports keyset pagination through the ``limit`` and ``after`` query
+    parameters and NDJSON streaming (see ``backend.pagination``), and
+    conditional requests against the quiver's version.
+
     Args:
         quiver_id (int): The ID of the quiver whose arrows are to be retrieved.
 
@@ -143,12 +358,18 @@ def list_arrows(quiver_id):
     q = db.session.get(Quiver, quiver_id)
     if q is None:
         abort(404)
-    return jsonify(
-        [{"id": a.id, "name": a.name, "quiver_id": a.quiver_id} for a in q.arrows]
+    etag = etag_for(q)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    response = list_response(
+        select(Arrow.id, Arrow.name, Arrow.quiver_id).where(Arrow.quiver_id == q.id),
+        Arrow.id,
     )
+    return tagged(response, etag)
 
 
-@app.route("/api/quivers/<int:quiver_id>/arrows", methods=["POST"])
+@api.route("/api/quivers/<int:quiver_id>/arrows", methods=["POST"])
 def create_arrow(quiver_id):
     """
     Create a new arrow within a specific quiver.
@@ -168,11 +389,14 @@ def create_arrow(quiver_id):
         abort(400, "Name is required")
     a = Arrow(name=name, quiver=q)
     db.session.add(a)
+    empty_stats(a)
+    touch(q)
     db.session.commit()
+    event_hub.publish(*arrow_event("arrow_created", a))
     return jsonify({"id": a.id, "name": a.name, "quiver_id": a.quiver_id}), 201
 
 
-@app.route("/api/arrows/<int:arrow_id>", methods=["PUT"])
+@api.route("/api/arrows/<int:arrow_id>", methods=["PUT"])
 def rename_arrow(arrow_id):
     """
     Update the name of a specific arrow.
@@ -189,14 +413,16 @@ def rename_arrow(arrow_id):
     data = request.get_json() or {}
     if "name" in data:
         a.name = data["name"]
+        touch(a)
         db.session.commit()
+        event_hub.publish(*arrow_event("arrow_updated", a))
     return jsonify({"id": a.id, "name": a.name, "quiver_id": a.quiver_id})
 
 
-@app.route("/api/arrows/<int:arrow_id>", methods=["DELETE"])
+@api.route("/api/arrows/<int:arrow_id>", methods=["DELETE"])
 def delete_arrow(arrow_id):
     """
-    Delete a specific arrow by its ID.
+    Delete a specific arrow by its ID, with its scores.
 
     Args:
         arrow_id (int): The ID of the arrow to delete.
@@ -207,19 +433,26 @@ def delete_arrow(arrow_id):
     a = db.session.get(Arrow, arrow_id)
     if a is None:
         abort(404)
-    db.session.delete(a)
+    deleted = arrow_event("arrow_deleted", a)
+    touch(a.quiver)
+    purge_arrow(a)
     db.session.commit()
+    event_hub.publish(*deleted)
     return jsonify({"message": "deleted"}), 204
 
 
-# —————————— Score Endpoints (unchanged) ——————————
+# —————————— Score Endpoints ——————————
 
 
-@app.route("/api/arrows/<int:arrow_id>/scores", methods=["GET"])
+@api.route("/api/arrows/<int:arrow_id>/scores", methods=["GET"])
 def list_scores(arrow_id):
     """
     Retrieve all scores associated with a specific arrow.
 
+    Supports keyset pagination through the ``limit`` and ``after`` query
+    parameters and NDJSON streaming (see ``backend.pagination``), and
+    conditional requests against the arrow's version.
+
     Args:
         arrow_id (int): The ID of the arrow whose scores are to be retrieved.
 
@@ -229,34 +462,280 @@ def list_scores(arrow_id):
     a = db.session.get(Arrow, arrow_id)
     if a is None:
         abort(404)
-    return jsonify([{"id": s.id, "score": float(s.score)} for s in a.scores])
+    etag = etag_for(a)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    response = list_response(
+        select(
+            ArrowScore.id,
+            cast(ArrowScore.score, Float).label("score"),
+            ArrowScore.x,
+            ArrowScore.y,
+            ArrowScore.shot_at,
+        ).where(ArrowScore.arrow_id == a.id),
+        ArrowScore.id,
+    )
+    return tagged(response, etag)
 
 
-@app.route("/api/arrows/<int:arrow_id>/scores", methods=["POST"])
+@api.route("/api/arrows/<int:arrow_id>/scores", methods=["POST"])
 def create_score(arrow_id):
     """
     Create a new score for a specific arrow.
 
+    The body may carry the impact offsets ``x`` and ``y`` from the target
+    centre alongside the score, and the ISO 8601 ``shot_at`` time of the shot
+    (the current time by default).
+
+    With ``WRITE_BEHIND`` enabled the score is queued instead of committed
+    here, and the response is ``202 Accepted`` with a ``provisional_id`` in
+    place of the ID (see ``backend.writebehind``).
+
     Args:
         arrow_id (int): The ID of the arrow to which the score belongs.
 
     Returns:
         flask.Response: A JSON response containing the created score's details.
     """
+    from backend.heatmap import record_impacts
+
     a = db.session.get(Arrow, arrow_id)
     if a is None:
         abort(404)
     data = request.get_json() or {}
-    score = data.get("score")
-    if score is None:
-        abort(400, "Score is required")
-    s = ArrowScore(arrow=a, score=score)
+    score, x, y = data.get("score"), data.get("x"), data.get("y")
+    error = shot_error(score, x, y, data.get("shot_at"))
+    if error:
+        abort(400, error)
+    if write_buffer.enabled:
+        row = {
+            "arrow_id": a.id,
+            "score": score,
+            "x": x,
+            "y": y,
+            "shot_at": parse_timestamp(data.get("shot_at")) or utcnow(),
+        }
+        provisional_id = write_buffer.submit(a, row)
+        return (
+            jsonify(
+                {
+                    "id": None,
+                    "provisional_id": provisional_id,
+                    "arrow_id": a.id,
+                    "score": float(score),
+                    "x": x,
+                    "y": y,
+                    "shot_at": row["shot_at"].isoformat(),
+                }
+            ),
+            202,
+        )
+    s = ArrowScore(
+        arrow=a, score=score, x=x, y=y, shot_at=parse_timestamp(data.get("shot_at"))
+    )
     db.session.add(s)
+    record_scores(a, [score])
+    record_impacts(a, [x], [y])
+    touch(a)
+    db.session.commit()
+    created = {
+        "id": s.id,
+        "score": float(s.score),
+        "x": s.x,
+        "y": s.y,
+        "shot_at": s.shot_at.isoformat(),
+    }
+    event_hub.publish(
+        a.quiver_id, "scores_created", {"arrow_id": a.id, "scores": [created]}
+    )
+    return jsonify({**created, "arrow_id": a.id}), 201
+
+
+@api.route("/api/arrows/<int:arrow_id>/scores/batch", methods=["POST"])
+def create_scores_batch(arrow_id):
+    """
+    Create many scores for a specific arrow in a single transaction.
+
+    The request body is ``{"scores": [9, 10, ...]}``, where each entry may
+    also be an object ``{"score": 9, "x": 1.5, "y": -2.0, "shot_at": ...}``
+    carrying impact coordinates and an ISO 8601 timestamp. Every entry is
+    validated before anything is written; the scores are then inserted with
+    one bulk statement and committed once.
+
+    Args:
+        arrow_id (int): The ID of the arrow to which the scores belong.
+
+    Returns:
+        flask.Response: A JSON response containing the new score IDs, in the
+        order the scores were given.
+    """
+    a = db.session.get(Arrow, arrow_id)
+    if a is None:
+        abort(404)
+    data = request.get_json() or {}
+    scores = data.get("scores")
+    if not isinstance(scores, list) or not scores:
+        abort(400, "Scores are required")
+    rows = []
+    for i, entry in enumerate(scores):
+        if not isinstance(entry, dict):
+            entry = {"score": entry}
+        error = shot_error(
+            entry.get("score"), entry.get("x"), entry.get("y"), entry.get("shot_at")
+        )
+        if error:
+            abort(400, f"{error} (index {i})")
+        rows.append(
+            {
+                "arrow_id": a.id,
+                "score": entry["score"],
+                "x": entry.get("x"),
+                "y": entry.get("y"),
+                "shot_at": parse_timestamp(entry.get("shot_at")),
+            }
+        )
+    ids = bulk_insert_scores({a.id: a}, rows)
+    touch(a)
+    created = scores_created({a.id: a}, rows, ids)
+    db.session.commit()
+    event_hub.publish_all(created)
+    return jsonify({"arrow_id": a.id, "count": len(ids), "ids": ids}), 201
+
+
+@api.route("/api/quivers/<int:quiver_id>/scores/batch", methods=["POST"])
+def create_quiver_scores_batch(quiver_id):
+    """
+    Create scores for several arrows of a specific quiver in a single transaction.
+
+    The request body is ``{"scores": [{"arrow_id": 1, "score": 9}, ...]}``.
+    Every entry must name an arrow of this quiver and carry a numeric score,
+    and may carry ``x``/``y`` impact coordinates and a ``shot_at`` timestamp;
+    nothing is written unless all entries are valid.
+
+    Args:
+        quiver_id (int): The ID of the quiver whose arrows the scores belong to.
+
+    Returns:
+        flask.Response: A JSON response containing the new score IDs, in the
+        order the scores were given.
+    """
+    q = db.session.get(Quiver, quiver_id)
+    if q is None:
+        abort(404)
+    data = request.get_json() or {}
+    scores = data.get("scores")
+    if not isinstance(scores, list) or not scores:
+        abort(400, "Scores are required")
+    arrows = {a.id: a for a in q.arrows}
+    rows = []
+    for i, entry in enumerate(scores):
+        if not isinstance(entry, dict) or entry.get("arrow_id") not in arrows:
+            abort(400, f"Entry at index {i} must name an arrow of this quiver")
+        error = shot_error(
+            entry.get("score"), entry.get("x"), entry.get("y"), entry.get("shot_at")
+        )
+        if error:
+            abort(400, f"{error} (index {i})")
+        rows.append(
+            {
+                "arrow_id": entry["arrow_id"],
+                "score": entry["score"],
+                "x": entry.get("x"),
+                "y": entry.get("y"),
+                "shot_at": parse_timestamp(entry.get("shot_at")),
+            }
+        )
+    ids = bulk_insert_scores(arrows, rows)
+    touch(*{arrows[row["arrow_id"]] for row in rows})
+    created = scores_created(arrows, rows, ids)
+    db.session.commit()
+    event_hub.publish_all(created)
+    return jsonify({"quiver_id": q.id, "count": len(ids), "ids": ids}), 201
+
+
+@api.route("/api/arrows/<int:arrow_id>/impacts", methods=["POST"])
+def create_impacts(arrow_id):
+    """
+    Score raw impact coordinates for a specific arrow and store them.
+
+    The request body is ``{"face": "122cm", "impacts": [[x, y], ...]}``, where
+    each impact may also be an object ``{"x": 30.5, "y": 58.0, "shot_at": ...}``.
+    ``face`` names one of the known target faces or describes a custom one
+    (see :func:`backend.scoring.get_face`), and ``origin`` says whether the
+    coordinates run from the face's top-left corner, as the frontend records
+    them (the default), or are offsets from its centre. All impacts are scored
+    in one vectorized pass and stored, with their coordinates converted to
+    centre offsets, in one bulk insert.
+
+    Args:
+        arrow_id (int): The ID of the arrow that was shot.
+
+    Returns:
+        flask.Response: A JSON response containing the new score IDs and the
+        scores awarded, in the order the impacts were given, and how many of
+        them hit the X ring.
+    """
+    from backend.scoring import ORIGINS, get_face, centre_offsets, score_impacts
+
+    a = db.session.get(Arrow, arrow_id)
+    if a is None:
+        abort(404)
+    data = request.get_json() or {}
+    try:
+        face = get_face(data.get("face"))
+    except ValueError as exc:
+        abort(400, str(exc))
+    origin = data.get("origin", "corner")
+    if origin not in ORIGINS:
+        abort(400, f"origin must be one of {', '.join(ORIGINS)}")
+    impacts = data.get("impacts")
+    if not isinstance(impacts, list) or not impacts:
+        abort(400, "Impacts are required")
+    xs, ys, shot_ats = [], [], []
+    for i, entry in enumerate(impacts):
+        if isinstance(entry, dict):
+            x, y, shot_at = entry.get("x"), entry.get("y"), entry.get("shot_at")
+        elif isinstance(entry, list) and len(entry) == 2:
+            (x, y), shot_at = entry, None
+        else:
+            abort(400, f"Impact at index {i} must be an [x, y] pair or an object")
+        if not (is_score(x) and is_score(y)):
+            abort(400, f"x and y must be numbers (index {i})")
+        try:
+            shot_ats.append(parse_timestamp(shot_at))
+        except ValueError:
+            abort(400, f"shot_at must be an ISO 8601 timestamp (index {i})")
+        xs.append(x)
+        ys.append(y)
+    dx, dy = centre_offsets(face, xs, ys, origin)
+    scores, x_hits = score_impacts(face, dx, dy)
+    scores = scores.tolist()
+    rows = [
+        {"arrow_id": a.id, "score": score, "x": x, "y": y, "shot_at": shot_at}
+        for score, x, y, shot_at in zip(scores, dx.tolist(), dy.tolist(), shot_ats)
+    ]
+    ids = bulk_insert_scores({a.id: a}, rows)
+    touch(a)
+    created = scores_created({a.id: a}, rows, ids)
     db.session.commit()
-    return jsonify({"id": s.id, "arrow_id": a.id, "score": float(s.score)}), 201
+    event_hub.publish_all(created)
+    return (
+        jsonify(
+            {
+                "arrow_id": a.id,
+                "face": face.to_dict(),
+                "count": len(ids),
+                "ids": ids,
+                "scores": scores,
+                "x_count": int(x_hits.sum()),
+            }
+        ),
+        201,
+    )
 
 
-@app.route("/api/arrows/scores/<int:score_id>", methods=["DELETE"])
+@api.route("/api/arrows/scores/<int:score_id>", methods=["DELETE"])
 def delete_score(score_id):
     """
     Delete a specific score by its ID.
@@ -267,16 +746,453 @@ def delete_score(score_id):
     Returns:
         flask.Response: A JSON response indicating successful deletion.
     """
+    from backend.heatmap import forget_impacts
+
     s = db.session.get(ArrowScore, score_id)
     if s is None:
         abort(404)
     db.session.delete(s)
+    forget_scores(s.arrow, [s.score])
+    forget_impacts(s.arrow, [s.x], [s.y])
+    forget_rolled_up(s)
+    touch(s.arrow)
+    quiver_id, arrow_id = s.arrow.quiver_id, s.arrow_id
     db.session.commit()
+    event_hub.publish(
+        quiver_id, "scores_deleted", {"arrow_id": arrow_id, "ids": [score_id]}
+    )
     return jsonify({"message": "deleted"}), 204
 
 
+@api.route("/api/arrows/<int:arrow_id>/stats", methods=["GET"])
+def get_arrow_stats(arrow_id):
+    """
+    Retrieve summary statistics for a specific arrow's scores.
+
+    The values come from the arrow's running aggregate, so the scores
+    themselves are never read. Supports conditional requests against the
+    arrow's version.
+
+    Args:
+        arrow_id (int): The ID of the arrow whose statistics are to be retrieved.
+
+    Returns:
+        flask.Response: A JSON response containing count, sum, sum of squares,
+        mean, variance, min, max and a per-ring histogram.
+    """
+    a = db.session.get(Arrow, arrow_id)
+    if a is None:
+        abort(404)
+    etag = etag_for(a)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    payload = stats_cache.get_or_compute(
+        ("stats", a.id, a.version),
+        [("arrow", a.id)],
+        lambda: stats_to_dict(a.id, db.session.get(ArrowStats, a.id)),
+    )
+    return tagged(jsonify(payload), etag)
+
+
+@api.route("/api/quivers/<int:quiver_id>/ranking", methods=["GET"])
+def get_quiver_ranking(quiver_id):
+    """
+    Rank the arrows of a specific quiver and flag the ones that stand out.
+
+    The optional ``threshold`` query parameter (default 2.0) is the absolute
+    z-score above which an arrow is flagged as an outlier.
+
+    Args:
+        quiver_id (int): The ID of the quiver whose arrows are ranked.
+
+    Returns:
+        flask.Response: A JSON response containing the quiver's pooled mean and
+        standard deviation and, per arrow, its rank, mean, standard deviation,
+        shot count, z-score and outlier flag.
+    """
+    threshold = request.args.get("threshold", 2.0, type=float)
+    if threshold <= 0:
+        abort(400, "threshold must be positive")
+    q = db.session.get(Quiver, quiver_id)
+    if q is None:
+        abort(404)
+    etag = etag_for(q)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    payload = stats_cache.get_or_compute(
+        ("ranking", q.id, q.version, threshold),
+        [("quiver", q.id)],
+        lambda: rank_arrows(q.id, threshold),
+    )
+    return tagged(jsonify(payload), etag)
+
+
+@api.route("/api/quivers/<int:quiver_id>/comparison", methods=["GET"])
+def get_quiver_comparison(quiver_id):
+    """
+    Compare the arrows of a specific quiver with bootstrap confidence intervals.
+
+    The optional query parameters are ``resamples`` (default 2000),
+    ``confidence`` (default 0.95) and ``seed`` (default 0); the same
+    parameters always give the same intervals, so results are cached until the
+    quiver changes. See ``backend.bootstrap`` for the method.
+
+    Args:
+        quiver_id (int): The ID of the quiver whose arrows are compared.
+
+    Returns:
+        flask.Response: A JSON response containing, per arrow, its mean and
+        confidence interval and, per pair of arrows, the difference of their
+        means, its interval, p-values and whether it is significant after the
+        Holm adjustment.
+    """
+    from backend.bootstrap import DEFAULT_RESAMPLES, MAX_RESAMPLES, compare_arrows
+
+    confidence = _confidence_arg()
+    resamples = request.args.get("resamples", DEFAULT_RESAMPLES, type=int)
+    if not 1 <= resamples <= MAX_RESAMPLES:
+        abort(400, f"resamples must be between 1 and {MAX_RESAMPLES}")
+    seed = request.args.get("seed", 0, type=int)
+    if seed < 0:
+        abort(400, "seed must not be negative")
+    q = db.session.get(Quiver, quiver_id)
+    if q is None:
+        abort(404)
+    etag = etag_for(q)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    payload = stats_cache.get_or_compute(
+        ("comparison", q.id, q.version, resamples, confidence, seed),
+        [("quiver", q.id)],
+        lambda: compare_arrows(
+            q.id, resamples, confidence, seed, current_app.config["BOOTSTRAP_WORKERS"]
+        ),
+    )
+    return tagged(jsonify(payload), etag)
+
+
+def _confidence_arg():
+    """
+    Read the ``confidence`` query parameter used by the analytics endpoints.
+
+    Returns:
+        float: The requested confidence level, 0.95 by default.
+    """
+    confidence = request.args.get("confidence", 0.95, type=float)
+    if not 0.0 < confidence < 1.0:
+        abort(400, "confidence must be between 0 and 1")
+    return confidence
+
+
+@api.route("/api/arrows/<int:arrow_id>/grouping", methods=["GET"])
+def get_arrow_grouping(arrow_id):
+    """
+    Retrieve shot-grouping analytics for a specific arrow.
+
+    Only scores with recorded impact coordinates are included.
+
+    Args:
+        arrow_id (int): The ID of the arrow to analyse.
+
+    Returns:
+        flask.Response: A JSON response containing the centroid, mean radius,
+        extreme spread, CEP50 and covariance ellipse of the arrow's group.
+    """
+    from backend.analytics import arrow_impacts, grouping
+
+    confidence = _confidence_arg()
+    a = db.session.get(Arrow, arrow_id)
+    if a is None:
+        abort(404)
+    etag = etag_for(a)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    result = stats_cache.get_or_compute(
+        ("grouping", "arrow", a.id, a.version, confidence),
+        [("arrow", a.id)],
+        lambda: grouping(arrow_impacts(a.id), confidence),
+    )
+    return tagged(jsonify({"arrow_id": a.id, **result}), etag)
+
+
+@api.route("/api/quivers/<int:quiver_id>/grouping", methods=["GET"])
+def get_quiver_grouping(quiver_id):
+    """
+    Retrieve shot-grouping analytics over every arrow of a specific quiver.
+
+    Only scores with recorded impact coordinates are included.
+
+    Args:
+        quiver_id (int): The ID of the quiver to analyse.
+
+    Returns:
+        flask.Response: A JSON response containing the centroid, mean radius,
+        extreme spread, CEP50 and covariance ellipse of the quiver's group.
+    """
+    from backend.analytics import quiver_impacts, grouping
+
+    confidence = _confidence_arg()
+    q = db.session.get(Quiver, quiver_id)
+    if q is None:
+        abort(404)
+    etag = etag_for(q)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    result = stats_cache.get_or_compute(
+        ("grouping", "quiver", q.id, q.version, confidence),
+        [("quiver", q.id)],
+        lambda: grouping(quiver_impacts(q.id), confidence),
+    )
+    return tagged(jsonify({"quiver_id": q.id, **result}), etag)
+
+
+@api.route("/api/arrows/<int:arrow_id>/heatmap", methods=["GET"])
+def get_arrow_heatmap(arrow_id):
+    """
+    Retrieve the 2D histogram of a specific arrow's impact positions.
+
+    Only scores with recorded impact coordinates are included. The grid is
+    maintained as scores are added and deleted, so the response size and cost
+    depend on the grid resolution, not on the number of shots.
+
+    Args:
+        arrow_id (int): The ID of the arrow.
+
+    Returns:
+        flask.Response: A JSON response containing the grid geometry and the
+        base64-encoded cell counts (see ``backend.heatmap``).
+    """
+    from backend.heatmap import arrow_heatmap, heatmap_to_dict
+
+    a = db.session.get(Arrow, arrow_id)
+    if a is None:
+        abort(404)
+    etag = etag_for(a)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    result = stats_cache.get_or_compute(
+        ("heatmap", "arrow", a.id, a.version),
+        [("arrow", a.id)],
+        lambda: heatmap_to_dict(*arrow_heatmap(a.id)),
+    )
+    return tagged(jsonify({"arrow_id": a.id, **result}), etag)
+
+
+@api.route("/api/quivers/<int:quiver_id>/heatmap", methods=["GET"])
+def get_quiver_heatmap(quiver_id):
+    """
+    Retrieve the 2D histogram of impact positions over every arrow of a quiver.
+
+    The grid is the sum of the arrows' grids.
+
+    Args:
+        quiver_id (int): The ID of the quiver.
+
+    Returns:
+        flask.Response: A JSON response containing the grid geometry and the
+        base64-encoded cell counts (see ``backend.heatmap``).
+    """
+    from backend.heatmap import quiver_heatmap, heatmap_to_dict
+
+    q = db.session.get(Quiver, quiver_id)
+    if q is None:
+        abort(404)
+    etag = etag_for(q)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    result = stats_cache.get_or_compute(
+        ("heatmap", "quiver", q.id, q.version),
+        [("quiver", q.id)],
+        lambda: heatmap_to_dict(*quiver_heatmap(q.id)),
+    )
+    return tagged(jsonify({"quiver_id": q.id, **result}), etag)
+
+
+@api.route("/api/quivers/<int:quiver_id>/events", methods=["GET"])
+def stream_quiver_events(quiver_id):
+    """
+    Stream a quiver's committed changes as Server-Sent Events.
+
+    Events are ``scores_created`` (``arrow_id`` and the new ``scores``),
+    ``scores_deleted`` (``arrow_id`` and the score ``ids``), ``arrow_created``,
+    ``arrow_updated``, ``arrow_deleted``, ``quiver_updated`` and
+    ``quiver_deleted``, which also ends the stream. A ``reset`` event means
+    changes were missed and the client should refetch. Clients reconnecting
+    with ``Last-Event-ID`` (or ``last_event_id``) receive the recent events
+    they missed. The optional ``timeout`` query parameter (seconds) closes the
+    stream after that long, for clients that long-poll.
+
+    The stream holds no database connection while open (see
+    ``backend.events``).
+
+    Args:
+        quiver_id (int): The ID of the quiver to follow.
+
+    Returns:
+        flask.Response: A ``text/event-stream`` response.
+    """
+    q = db.session.get(Quiver, quiver_id)
+    if q is None:
+        abort(404)
+    timeout = request.args.get("timeout")
+    if timeout is not None:
+        try:
+            timeout = float(timeout)
+        except ValueError:
+            abort(400, "timeout must be a number of seconds")
+        if not 0 <= timeout < float("inf"):
+            abort(400, "timeout must be a number of seconds")
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+        "last_event_id"
+    )
+    sub = event_hub.subscribe(q.id, last_event_id)
+    return Response(
+        event_hub.stream(sub, timeout),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.route("/api/arrows/<int:arrow_id>/trend", methods=["GET"])
+def get_arrow_trend(arrow_id):
+    """
+    Retrieve per-bucket score aggregates and a moving average for an arrow.
+
+    The ``bucket`` query parameter is ``day`` (default), ``week`` or
+    ``month``; ``window`` is the number of buckets the moving average spans
+    (default 7). Only scores with a ``shot_at`` timestamp are included.
+
+    Args:
+        arrow_id (int): The ID of the arrow to analyse.
+
+    Returns:
+        flask.Response: A JSON response containing one point per bucket, in
+        time order.
+    """
+    bucket = request.args.get("bucket", "day")
+    if bucket not in BUCKETS:
+        abort(400, f"bucket must be one of: {', '.join(BUCKETS)}")
+    window = request.args.get("window", 7, type=int)
+    if window < 1:
+        abort(400, "window must be a positive integer")
+    a = db.session.get(Arrow, arrow_id)
+    if a is None:
+        abort(404)
+    etag = etag_for(a)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    points = stats_cache.get_or_compute(
+        ("trend", a.id, a.version, bucket, window),
+        [("arrow", a.id)],
+        lambda: score_trend(a.id, bucket, window),
+    )
+    return tagged(
+        jsonify({"arrow_id": a.id, "bucket": bucket, "window": window, "points": points}),
+        etag,
+    )
+
+
+# —————————— Archive Export / Import ——————————
+
+ARCHIVE_MIMETYPES = {"ndjson": NDJSON_MIMETYPE, "csv": "text/csv"}
+
+
+def _archive_format(default):
+    """
+    Read the ``format`` query parameter of the archive endpoints.
+
+    Args:
+        default (str): The format used when none is given.
+
+    Returns:
+        str: One of ``backend.archive.FORMATS``.
+    """
+    fmt = request.args.get("format", default)
+    if fmt not in FORMATS:
+        abort(400, f"format must be one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+@api.route("/api/export", methods=["GET"])
+def export_data():
+    """
+    Stream every quiver, arrow and score as an NDJSON or CSV archive.
+
+    ``format`` selects ``ndjson`` (default) or ``csv``; ``quiver_id`` limits
+    the archive to one quiver. See ``backend.archive`` for the record layout.
+
+    Returns:
+        flask.Response: The streamed archive, as an attachment.
+    """
+    fmt = _archive_format("ndjson")
+    quiver_id = request.args.get("quiver_id", type=int)
+    if quiver_id is not None and db.session.get(Quiver, quiver_id) is None:
+        abort(404)
+    response = Response(
+        stream_with_context(export_archive(fmt, quiver_id)),
+        mimetype=ARCHIVE_MIMETYPES[fmt],
+    )
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=quiverstats-archive.{fmt}"
+    )
+    return response
+
+
+@api.route("/api/import", methods=["POST"])
+def import_data():
+    """
+    Load an NDJSON or CSV archive, as produced by the export, in one transaction.
+
+    The body is the archive itself. ``format`` defaults to ``csv`` for a
+    ``text/csv`` body and to ``ndjson`` otherwise. Every record gets a new ID,
+    so importing never overwrites existing data.
+
+    Returns:
+        flask.Response: A JSON response with the number of quivers, arrows and
+        scores imported.
+    """
+    fmt = _archive_format("csv" if request.mimetype == "text/csv" else "ndjson")
+    try:
+        counts = import_archive(io.TextIOWrapper(request.stream, encoding="utf-8"), fmt)
+    except (ArchiveError, UnicodeDecodeError) as exc:
+        db.session.rollback()
+        abort(400, str(exc))
+    db.session.commit()
+    return jsonify(counts), 201
+
+
+@api.route("/api/_cache", methods=["GET"])
+def get_cache_info():
+    """
+    Report the size and hit/miss/eviction counters of the stats cache.
+
+    Returns:
+        flask.Response: A JSON response containing the cache counters.
+    """
+    return jsonify(stats_cache.info())
+
+
+@api.route("/api/_metrics", methods=["GET"])
+def get_metrics():
+    """
+    Expose per-route latency, query-count and database-time histograms, plus
+    the stats cache counters, in the Prometheus text format.
+
+    Returns:
+        flask.Response: A plain-text Prometheus exposition.
+    """
+    return Response(metrics.render(), mimetype=PROMETHEUS_MIMETYPE)
+
+
 # auto load models when in flask shell
-@app.shell_context_processor
 def make_shell_context():
     """
     Provide a shell context for Flask CLI.
@@ -284,9 +1200,163 @@ def make_shell_context():
     Returns:
         dict: A dictionary containing the database instance and models.
     """
-    return {"db": db, "Quiver": Quiver, "Arrow": Arrow, "ArrowScore": ArrowScore}
+    return {
+        "db": db,
+        "Quiver": Quiver,
+        "Arrow": Arrow,
+        "ArrowScore": ArrowScore,
+        "ArrowStats": ArrowStats,
+        "ArrowHeatmap": ArrowHeatmap,
+        "DailyRollup": DailyRollup,
+    }
+
+
+@api.cli.command("export")
+@click.option(
+    "--format", "fmt", type=click.Choice(FORMATS), default="ndjson", show_default=True
+)
+@click.option("--quiver-id", type=int, help="Export only this quiver.")
+@click.option(
+    "--output", "-o", type=click.File("w"), default="-", help="Defaults to stdout."
+)
+def export_command(fmt, quiver_id, output):
+    """
+    Write every quiver, arrow and score to an NDJSON or CSV archive.
+
+    Args:
+        fmt (str): The archive format.
+        quiver_id (int | None): Limit the archive to one quiver.
+        output (io.TextIOBase): Where the archive is written.
+    """
+    for chunk in export_archive(fmt, quiver_id):
+        output.write(chunk)
+
+
+@api.cli.command("import")
+@click.argument("source", type=click.File("r"))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    help="Defaults to csv for a .csv file and ndjson otherwise.",
+)
+def import_command(source, fmt):
+    """
+    Load an NDJSON or CSV archive (or - for stdin) in one transaction.
+
+    Args:
+        source (io.TextIOBase): The archive.
+        fmt (str | None): The archive format.
+    """
+    if fmt is None:
+        fmt = "csv" if source.name.endswith(".csv") else "ndjson"
+    try:
+        counts = import_archive(source, fmt)
+    except ArchiveError as exc:
+        db.session.rollback()
+        raise click.ClickException(str(exc)) from exc
+    db.session.commit()
+    click.echo(
+        f"Imported {counts['quivers']} quivers, {counts['arrows']} arrows "
+        f"and {counts['scores']} scores."
+    )
+
+
+@api.cli.command("rollup")
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    show_default=True,
+    help="Scores folded per transaction.",
+)
+@click.option(
+    "--lag",
+    default=DEFAULT_LAG,
+    show_default=True,
+    help="Seconds a score must have been recorded before it is folded in.",
+)
+def rollup_command(batch_size, lag):
+    """
+    Fold the scores recorded since the last run into the daily rollup table.
+
+    Scores are folded in once an earlier run has seen them at least ``lag``
+    seconds ago, so run the command periodically.
+
+    Args:
+        batch_size (int): The number of score IDs processed per transaction.
+        lag (float): Seconds a score ID must have been seen before it is
+            folded in.
+    """
+    rolled, watermark = run_rollup(batch_size, lag)
+    click.echo(f"Rolled up {rolled} scores; watermark is now score {watermark}.")
+
+
+@api.cli.command("compare")
+@click.argument("quiver_id", type=int)
+@click.option("--resamples", type=int, help="Resamples per arrow; defaults to 2000.")
+@click.option("--confidence", default=0.95, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+@click.option("--workers", type=int, help="Worker processes; defaults to the CPU count.")
+def compare_command(quiver_id, resamples, confidence, seed, workers):
+    """
+    Print bootstrap confidence intervals and significant differences for a quiver.
+
+    A pair is listed when its Holm-adjusted p-value is below ``1 - confidence``.
+
+    Args:
+        quiver_id (int): The ID of the quiver whose arrows are compared.
+        resamples (int | None): The number of bootstrap resamples per arrow.
+        confidence (float): The coverage of the intervals.
+        seed (int): The base seed.
+        workers (int | None): The number of worker processes.
+    """
+    from backend.bootstrap import DEFAULT_RESAMPLES, compare_arrows, default_workers
+
+    if not 0.0 < confidence < 1.0:
+        raise click.BadParameter(
+            "confidence must be between 0 and 1", param_hint="'--confidence'"
+        )
+    if db.session.get(Quiver, quiver_id) is None:
+        raise click.ClickException(f"Quiver {quiver_id} does not exist.")
+    result = compare_arrows(
+        quiver_id,
+        resamples or DEFAULT_RESAMPLES,
+        confidence,
+        seed,
+        workers or default_workers(),
+    )
+    for arrow in result["arrows"]:
+        if arrow["ci"] is None:
+            click.echo(f"{arrow['name']}: no scores")
+            continue
+        low, high = arrow["ci"]
+        click.echo(
+            f"{arrow['name']}: mean {arrow['mean']:.3f} [{low:.3f}, {high:.3f}]"
+            f" over {arrow['count']} shots"
+        )
+    names = {arrow["arrow_id"]: arrow["name"] for arrow in result["arrows"]}
+    significant = [pair for pair in result["pairs"] if pair["significant"]]
+    click.echo(f"{len(significant)} of {len(result['pairs'])} pairs differ significantly.")
+    for pair in significant:
+        click.echo(
+            f"  {names[pair['arrow_id']]} - {names[pair['other_id']]}:"
+            f" {pair['difference']:+.3f} (adjusted p = {pair['p_adjusted']:.4f})"
+        )
+
+
+_import_seconds = time.perf_counter() - _import_started
+
+
+def __getattr__(name):
+    """Create the default application on first access to ``app``."""
+    global _app  # pylint: disable=global-statement
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-# 15. Run the app when `python app.py` is executed
+# 9. Run the app when `python app.py` is executed
 if __name__ == "__main__":
-    app.run()
+    create_app().run()
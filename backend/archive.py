@@ -0,0 +1,506 @@
+"""
+Streaming export and bulk import of QuiverStats archives.
+
+An archive is the full quiver, arrow and score graph as a stream of records,
+parents before children, in one of two formats:
+
+* ``ndjson``: one JSON object per line, each with a ``type`` of ``quiver``,
+  ``arrow`` or ``score`` and that type's fields;
+* ``csv``: one row per record under a single header, :data:`CSV_FIELDS`,
+  with the fields a type does not use left empty.
+
+Export reads every table through a server-side cursor (``yield_per``) and
+emits text in chunks, so memory stays flat however large the archive is.
+Import assigns fresh IDs and remaps the references as it goes, so an archive
+can be loaded into a database that already holds data. Scores are written in
+large batches with ``COPY`` on PostgreSQL and executemany inserts elsewhere,
+and the arrow_stats and arrow_heatmap rows of the new arrows are computed in
+bulk at the end rather than by per-row bookkeeping.
+"""
+
+import csv
+import io
+import json
+
+from sqlalchemy import (
+    Float, Integer, String, case, cast, func, insert, literal, null, select,
+)
+
+from backend.extensions import db
+from backend.ingest import insert_returning_ids, parse_timestamp, shot_error
+from backend.models import Arrow, ArrowHeatmap, ArrowScore, ArrowStats, Quiver
+
+FORMATS = ("ndjson", "csv")
+CSV_FIELDS = (
+    "type",
+    "id",
+    "quiver_id",
+    "arrow_id",
+    "name",
+    "created_at",
+    "score",
+    "x",
+    "y",
+    "shot_at",
+)
+
+# Rows fetched per round-trip, and records per emitted text chunk
+EXPORT_CHUNK_SIZE = 5000
+
+# Scores written per bulk statement during import
+IMPORT_BATCH_SIZE = 10_000
+
+SCORE_COLUMNS = ("arrow_id", "score", "x", "y", "shot_at")
+
+
+class ArchiveError(ValueError):
+    """Raised when an archive being imported is malformed."""
+
+
+def _selects(quiver_id=None):
+    """
+    Build the queries reading the archive, parents first.
+
+    Each query returns its columns in :data:`CSV_FIELDS` order, with NULL for
+    the fields its record type does not use, so CSV rows can be written as
+    fetched. The score and timestamps are converted to float and text in SQL:
+    building Decimal and datetime objects only to serialize them again
+    dominated the export time.
+
+    Args:
+        quiver_id (int | None): Limit the export to one quiver.
+
+    Returns:
+        list[tuple[str, Select]]: The record type and query of each table.
+    """
+    quivers = select(
+        literal("quiver"),
+        Quiver.id,
+        null(),
+        null(),
+        Quiver.name,
+        cast(Quiver.created_at, String),
+        null(),
+        null(),
+        null(),
+        null(),
+    ).order_by(Quiver.id)
+    arrows = select(
+        literal("arrow"),
+        Arrow.id,
+        Arrow.quiver_id,
+        null(),
+        Arrow.name,
+        null(),
+        null(),
+        null(),
+        null(),
+        null(),
+    ).order_by(Arrow.id)
+    scores = select(
+        literal("score"),
+        ArrowScore.id,
+        null(),
+        ArrowScore.arrow_id,
+        null(),
+        null(),
+        cast(ArrowScore.score, Float),
+        ArrowScore.x,
+        ArrowScore.y,
+        cast(ArrowScore.shot_at, String),
+    ).order_by(ArrowScore.id)
+    if quiver_id is not None:
+        quivers = quivers.where(Quiver.id == quiver_id)
+        arrows = arrows.where(Arrow.quiver_id == quiver_id)
+        scores = scores.join(Arrow).where(Arrow.quiver_id == quiver_id)
+    return [("quiver", quivers), ("arrow", arrows), ("score", scores)]
+
+
+# Fields written per record type in NDJSON, as positions in CSV_FIELDS
+_NDJSON_FIELDS = {
+    "quiver": (0, 1, 4, 5),
+    "arrow": (0, 1, 2, 4),
+}
+
+
+def _ndjson_lines(kind, rows):
+    """
+    Serialize fetched rows as NDJSON lines.
+
+    Scores make up nearly all of an archive and have a fixed shape of
+    numbers and a timestamp, so their lines are formatted directly, which
+    is about twice as fast as going through ``json.dumps``.
+
+    Args:
+        kind (str): The record type.
+        rows (list[tuple]): Rows in :data:`CSV_FIELDS` order.
+
+    Returns:
+        str: The lines, each ending in a newline.
+    """
+    if kind != "score":
+        positions = _NDJSON_FIELDS[kind]
+        return "".join(
+            json.dumps({CSV_FIELDS[i]: row[i] for i in positions}) + "\n"
+            for row in rows
+        )
+    return "".join(
+        '{"type": "score", "id": %d, "arrow_id": %d, "score": %r, '
+        '"x": %s, "y": %s, "shot_at": %s}\n'
+        % (
+            row[1],
+            row[3],
+            row[6],
+            "null" if row[7] is None else repr(row[7]),
+            "null" if row[8] is None else repr(row[8]),
+            "null" if row[9] is None else f'"{row[9]}"',
+        )
+        for row in rows
+    )
+
+
+def export_archive(fmt, quiver_id=None):
+    """
+    Serialize the archive as text, chunk by chunk.
+
+    Args:
+        fmt (str): One of :data:`FORMATS`.
+        quiver_id (int | None): Limit the export to one quiver.
+
+    Yields:
+        str: Consecutive pieces of the archive, one per fetched chunk of rows.
+    """
+    conn = db.session.connection()
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(CSV_FIELDS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    for kind, stmt in _selects(quiver_id):
+        result = conn.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        for rows in result.partitions():
+            if fmt == "csv":
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield _ndjson_lines(kind, rows)
+
+
+def _read(stream, fmt):
+    """
+    Parse archive text into records.
+
+    Args:
+        stream (Iterable[str]): The archive, line by line.
+        fmt (str): One of :data:`FORMATS`.
+
+    Yields:
+        tuple[int, dict]: The line number and the record, with empty CSV
+        fields dropped.
+
+    Raises:
+        ArchiveError: If a line cannot be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items() if v not in ("", None)}
+        return
+    for line_num, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ArchiveError(f"Invalid JSON on line {line_num}") from exc
+        if not isinstance(record, dict):
+            raise ArchiveError(f"Line {line_num} is not a JSON object")
+        yield line_num, record
+
+
+def _copy_scores(rows):
+    """
+    Load score rows with PostgreSQL's ``COPY ... FROM STDIN``.
+
+    Works with both psycopg2 (``copy_expert``) and psycopg 3 (``copy``).
+
+    Args:
+        rows (list[tuple]): Rows in :data:`SCORE_COLUMNS` order.
+    """
+    buffer = io.StringIO()
+    # None is written as an unquoted empty field, which COPY reads as NULL
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    sql = (
+        f"COPY {ArrowScore.__tablename__} ({', '.join(SCORE_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def _insert_scores(rows, dialect):
+    """
+    Write score rows with the dialect's fastest bulk path.
+
+    PostgreSQL uses ``COPY``. SQLite gets a plain DB-API executemany, skipping
+    SQLAlchemy's per-row parameter processing, with timestamps rendered in the
+    text format SQLAlchemy stores them in, so they compare correctly with
+    rows written through the ORM. Other databases use a Core executemany.
+
+    Args:
+        rows (list[tuple]): Rows in :data:`SCORE_COLUMNS` order.
+        dialect (str): The name of the database dialect.
+    """
+    if dialect == "postgresql":
+        _copy_scores(rows)
+    elif dialect == "sqlite":
+        db.session.connection().exec_driver_sql(
+            f"INSERT INTO {ArrowScore.__tablename__} ({', '.join(SCORE_COLUMNS)}) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (a, s, x, y, t.isoformat(" ", "microseconds") if t else None)
+                for a, s, x, y, t in rows
+            ],
+        )
+    else:
+        db.session.execute(
+            insert(ArrowScore.__table__), [dict(zip(SCORE_COLUMNS, row)) for row in rows]
+        )
+
+
+def _ring(score, dialect):
+    """
+    Build the SQL expression for the histogram ring of a score.
+
+    Args:
+        score (ColumnElement): The score column.
+        dialect (str): The name of the database dialect.
+
+    Returns:
+        ColumnElement: The score rounded down, as ``backend.stats.ring_of``.
+    """
+    if dialect == "sqlite":
+        # SQLite has no FLOOR; casting truncates towards zero, so step negative
+        # fractions down one more
+        truncated = cast(score, Integer)
+        return case((score < truncated, truncated - 1), else_=truncated)
+    return func.floor(score)
+
+
+def _number(value):
+    """
+    Convert a numeric field read from CSV, where every value is a string.
+
+    Args:
+        value: The field's value, or None if it is missing.
+
+    Returns:
+        The value as a float if it was a string, otherwise unchanged.
+
+    Raises:
+        ValueError: If the string is not a number.
+    """
+    return float(value) if isinstance(value, str) else value
+
+
+class _Importer:
+    """
+    Accumulates archive records and writes them in batches.
+
+    Quivers and arrows are buffered until the first child record needs their
+    new IDs; scores are flushed every ``batch_size`` rows. The arrow_stats rows
+    of the new arrows are computed with one aggregate query at the end, and
+    their heatmaps from one pass over the imported coordinates.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.dialect = db.session.get_bind().dialect.name
+        self.quiver_ids = {}
+        self.arrow_ids = {}
+        self.quivers = []
+        self.arrows = []
+        self.scores = []
+        self.score_count = 0
+
+    def add(self, line_num, record):
+        kind = record.get("type")
+        try:
+            if kind == "score":
+                if self.arrows:
+                    self._flush_arrows()
+                arrow_id = self.arrow_ids.get(str(record.get("arrow_id")))
+                if arrow_id is None:
+                    raise ValueError(
+                        f"arrow {record.get('arrow_id')} is not in the archive"
+                    )
+                score, x, y = (
+                    _number(record.get(key)) for key in ("score", "x", "y")
+                )
+                error = shot_error(score, x, y, record.get("shot_at"))
+                if error is not None:
+                    raise ValueError(error)
+                self.scores.append(
+                    (
+                        arrow_id,
+                        float(score),
+                        float(x) if x is not None else None,
+                        float(y) if y is not None else None,
+                        parse_timestamp(record.get("shot_at")),
+                    )
+                )
+                if len(self.scores) >= self.batch_size:
+                    self._flush_scores()
+            elif kind == "quiver":
+                self.quivers.append(
+                    (
+                        record["id"],
+                        {
+                            "name": record["name"],
+                            "created_at": parse_timestamp(record.get("created_at")),
+                        },
+                    )
+                )
+            elif kind == "arrow":
+                self._flush_quivers()
+                quiver_id = self.quiver_ids.get(str(record.get("quiver_id")))
+                if quiver_id is None:
+                    raise ValueError(
+                        f"quiver {record.get('quiver_id')} is not in the archive"
+                    )
+                self.arrows.append(
+                    (record["id"], {"quiver_id": quiver_id, "name": record["name"]})
+                )
+            else:
+                raise ValueError(f"unknown record type {kind!r}")
+        except KeyError as exc:
+            raise ArchiveError(f"Line {line_num}: missing field {exc}") from exc
+        except (TypeError, ValueError) as exc:
+            raise ArchiveError(f"Line {line_num}: {exc}") from exc
+
+    def _flush_quivers(self):
+        if not self.quivers:
+            return
+        new_ids = insert_returning_ids(Quiver, [values for _, values in self.quivers])
+        for (old_id, _), new_id in zip(self.quivers, new_ids):
+            self.quiver_ids[str(old_id)] = new_id
+        self.quivers = []
+
+    def _flush_arrows(self):
+        self._flush_quivers()
+        if not self.arrows:
+            return
+        new_ids = insert_returning_ids(Arrow, [values for _, values in self.arrows])
+        for (old_id, _), new_id in zip(self.arrows, new_ids):
+            self.arrow_ids[str(old_id)] = new_id
+        self.arrows = []
+
+    def _flush_scores(self):
+        if not self.scores:
+            return
+        _insert_scores(self.scores, self.dialect)
+        self.score_count += len(self.scores)
+        self.scores = []
+
+    def _stats_rows(self):
+        """Aggregate the imported scores into one arrow_stats row per new arrow."""
+        new_ids = set(self.arrow_ids.values())
+        rows = {
+            arrow_id: {
+                "arrow_id": arrow_id,
+                "count": 0,
+                "total": 0.0,
+                "total_sq": 0.0,
+                "min_score": None,
+                "max_score": None,
+                "histogram": {},
+            }
+            for arrow_id in new_ids
+        }
+        if not self.score_count:
+            return list(rows.values())
+        score = cast(ArrowScore.score, Float)
+        ring = _ring(ArrowScore.score, self.dialect)
+        # new arrows only have the imported scores, and their IDs span a range
+        per_ring = db.session.execute(
+            select(
+                ArrowScore.arrow_id,
+                ring,
+                func.count(),
+                func.sum(score),
+                func.sum(score * score),
+                func.min(score),
+                func.max(score),
+            )
+            .where(ArrowScore.arrow_id.between(min(new_ids), max(new_ids)))
+            .group_by(ArrowScore.arrow_id, ring)
+        )
+        for arrow_id, ring_value, count, total, total_sq, low, high in per_ring:
+            row = rows.get(arrow_id)
+            if row is None:
+                continue
+            row["count"] += count
+            row["total"] += total
+            row["total_sq"] += total_sq
+            if row["min_score"] is None or low < row["min_score"]:
+                row["min_score"] = low
+            if row["max_score"] is None or high > row["max_score"]:
+                row["max_score"] = high
+            row["histogram"][str(int(ring_value))] = count
+        return list(rows.values())
+
+    def finish(self):
+        self._flush_arrows()
+        self._flush_scores()
+        if self.arrow_ids:
+            # imported here so that loading the app does not load NumPy
+            from backend.heatmap import build_heatmaps
+
+            db.session.execute(insert(ArrowStats.__table__), self._stats_rows())
+            heatmaps = build_heatmaps(self.arrow_ids.values())
+            if heatmaps:
+                db.session.execute(insert(ArrowHeatmap.__table__), heatmaps)
+        return {
+            "quivers": len(self.quiver_ids),
+            "arrows": len(self.arrow_ids),
+            "scores": self.score_count,
+        }
+
+
+def import_archive(stream, fmt, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Load an archive, giving every quiver, arrow and score a new ID.
+
+    The rows join the current transaction; the caller commits, or rolls back
+    on :class:`ArchiveError`. References are resolved against records earlier
+    in the archive, so parents must precede their children, as they do in
+    exports.
+
+    Args:
+        stream (Iterable[str]): The archive, line by line.
+        fmt (str): One of :data:`FORMATS`.
+        batch_size (int): Scores written per bulk statement.
+
+    Returns:
+        dict: The number of quivers, arrows and scores imported.
+
+    Raises:
+        ArchiveError: If the archive is malformed or refers to a record it
+            does not contain.
+    """
+    importer = _Importer(batch_size)
+    for line_num, record in _read(stream, fmt):
+        importer.add(line_num, record)
+    return importer.finish()
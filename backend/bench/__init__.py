@@ -0,0 +1,8 @@
+"""
+Endpoint micro-benchmarks for the QuiverStats backend.
+
+``seed`` bulk-loads a synthetic archive of quivers, arrows and scores, and
+``runner`` times every API route against it through the Flask test client,
+records the SQL query count of each call and compares the results with a
+stored baseline.
+"""
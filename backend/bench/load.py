@@ -0,0 +1,536 @@
+"""
+Multi-worker load test for the QuiverStats API.
+
+Seeds a local database, starts the app under a multi-worker WSGI server on
+localhost and drives it with concurrent simulated archers. Each archer is a
+thread sending one request at a time over a fresh connection, picking the
+route from a weighted mix: by default mostly single score submissions, with
+quiver pages, dashboards, listings and statistics read alongside. Per route
+it reports throughput, p50/p95/p99 latency and the error rate as JSON and,
+when an earlier report is given, the change against it.
+
+The server is gunicorn with sync workers when it is installed, and otherwise
+a minimal pre-forking server built on Werkzeug's (see :func:`serve`). Either
+way each worker process keeps its own caches and connection pool, as in a
+deployment.
+
+Usage (from the repository root)::
+
+    python -m backend.bench.load --workers 4 --clients 32 --duration 30 \\
+        --mix create_score=60,get_quiver=30,get_dashboard=10 \\
+        --output load_results.json --baseline load_baseline.json
+
+Without ``--database-url`` the run uses a temporary SQLite file.
+"""
+
+import argparse
+import http.client
+import importlib
+import importlib.util
+import json
+import logging
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Scores per end, as submitted by the batch route
+END_SIZE = 6
+
+
+def _quiver(rng, dataset):
+    return rng.choice(dataset["quiver_ids"])
+
+
+def _arrow(rng, dataset):
+    return rng.choice(rng.choice(dataset["arrow_ids"]))
+
+
+def _shot(rng):
+    """A shot at the 122cm face, scored from where it landed."""
+    x, y = round(rng.gauss(0.0, 10.0), 2), round(rng.gauss(0.0, 10.0), 2)
+    return {"score": max(0, 10 - int(math.hypot(x, y) // 6.1)), "x": x, "y": y}
+
+
+# name -> (default weight, builds (method, path, JSON body) from (rng, dataset))
+OPERATIONS = {
+    "create_score": (
+        40,
+        lambda rng, ds: ("POST", f"/api/arrows/{_arrow(rng, ds)}/scores", _shot(rng)),
+    ),
+    "create_scores_batch": (
+        5,
+        lambda rng, ds: (
+            "POST",
+            f"/api/arrows/{_arrow(rng, ds)}/scores/batch",
+            {"scores": [_shot(rng) for _ in range(END_SIZE)]},
+        ),
+    ),
+    "get_quiver": (
+        20,
+        lambda rng, ds: ("GET", f"/api/quivers/{_quiver(rng, ds)}?expand=stats", None),
+    ),
+    "get_dashboard": (10, lambda rng, ds: ("GET", "/api/dashboard", None)),
+    "list_scores": (
+        10,
+        lambda rng, ds: ("GET", f"/api/arrows/{_arrow(rng, ds)}/scores?limit=100", None),
+    ),
+    "get_arrow_stats": (
+        10,
+        lambda rng, ds: ("GET", f"/api/arrows/{_arrow(rng, ds)}/stats", None),
+    ),
+    "get_quiver_ranking": (
+        5,
+        lambda rng, ds: ("GET", f"/api/quivers/{_quiver(rng, ds)}/ranking", None),
+    ),
+}
+
+DEFAULT_MIX = {name: weight for name, (weight, _) in OPERATIONS.items()}
+
+
+def parse_mix(text):
+    """
+    Parse a route mix such as ``create_score=60,get_quiver=40``.
+
+    Args:
+        text (str): Comma-separated ``name=weight`` pairs, naming entries of
+            :data:`OPERATIONS`.
+
+    Returns:
+        dict[str, float]: The weight of each route.
+
+    Raises:
+        argparse.ArgumentTypeError: If a name is unknown or a weight is not
+            a positive number.
+    """
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"unknown route {name!r}; choose from {', '.join(OPERATIONS)}"
+            )
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            mix[name] = -1.0
+        if mix[name] <= 0:
+            raise argparse.ArgumentTypeError(f"the weight of {name} must be positive")
+    if not mix:
+        raise argparse.ArgumentTypeError("the mix names no routes")
+    return mix
+
+
+def percentile(values, q):
+    """
+    Take the nearest-rank percentile of sorted values.
+
+    Args:
+        values (list[float]): The values, in ascending order.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float | None: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def _send(host, port, method, path, body=None, timeout=30.0):
+    """Send one request over a new connection and return the response status."""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def prepare(database_url, quivers, arrows_per_quiver, scores_per_arrow, random_seed=0):
+    """
+    Create the schema in an empty database and seed it.
+
+    Args:
+        database_url (str): The database to seed.
+        quivers (int): The number of quivers.
+        arrows_per_quiver (int): The number of arrows in each quiver.
+        scores_per_arrow (int): The number of scores for each arrow.
+        random_seed (int): Seed for the random generator.
+
+    Returns:
+        dict: The dataset, as returned by :func:`backend.bench.seed.seed`.
+
+    Raises:
+        ValueError: If the database already holds quivers.
+    """
+    from backend.app import create_app
+    from backend.bench.seed import seed
+    from backend.extensions import db
+    from backend.models import Quiver
+    from backend.rollup import run_rollup
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url})
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Quiver.id).first() is not None:
+            raise ValueError("the load-test database must be empty")
+        dataset = seed(quivers, arrows_per_quiver, scores_per_arrow, random_seed)
+        run_rollup(lag=0)
+        db.session.remove()
+        # the server processes open their own connections
+        for engine in db.engines.values():
+            engine.dispose()
+    return dataset
+
+
+def serve(host, port, workers):
+    """
+    Serve the app from pre-forked Werkzeug workers, the fallback without gunicorn.
+
+    The listening socket is opened once and shared by ``workers`` forked
+    processes, each handling one request at a time, as gunicorn's sync
+    workers do. Runs until terminated.
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on.
+        workers (int): The number of worker processes.
+    """
+    from werkzeug.serving import make_server
+
+    from backend.app import create_app
+
+    app = create_app()
+    # load what the app imports lazily once, before forking
+    for module in ("analytics", "bootstrap", "heatmap", "scoring"):
+        importlib.import_module(f"backend.{module}")
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, app)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            os.kill(child, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    for child in children:
+        os.waitpid(child, 0)
+
+
+def pick_server(server="auto"):
+    """
+    Resolve the server to run the app under.
+
+    Args:
+        server (str): ``gunicorn``, ``werkzeug`` or ``auto`` (gunicorn if
+            it is installed).
+
+    Returns:
+        str: ``gunicorn`` or ``werkzeug``.
+    """
+    if server == "auto":
+        return "gunicorn" if importlib.util.find_spec("gunicorn") else "werkzeug"
+    return server
+
+
+@contextmanager
+def running_server(database_url, workers, server="werkzeug", host="127.0.0.1",
+                   startup_timeout=30.0):
+    """
+    Start the app in a server process and stop it when the block exits.
+
+    Args:
+        database_url (str): The database the app uses.
+        workers (int): The number of worker processes.
+        server (str): ``gunicorn`` or ``werkzeug``.
+        host (str): The interface to listen on.
+        startup_timeout (float): Seconds to wait for the first response.
+
+    Yields:
+        tuple[str, int]: The host and port the app is served on.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer in time.
+    """
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        port = sock.getsockname()[1]
+    if server == "gunicorn":
+        command = [
+            sys.executable, "-m", "gunicorn", "--workers", str(workers),
+            "--bind", f"{host}:{port}", "backend.app:create_app()",
+        ]
+    else:
+        command = [
+            sys.executable, "-c",
+            f"from backend.bench.load import serve; serve({host!r}, {port}, {workers})",
+        ]
+    env = {**os.environ, "DATABASE_URL": database_url}
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(
+            command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if process.poll() is not None:
+                    log.seek(0)
+                    output = log.read().decode(errors="replace")[-2000:]
+                    raise RuntimeError(f"the {server} server exited:\n{output}")
+                try:
+                    if _send(host, port, "GET", "/api/quivers?limit=1") == 200:
+                        break
+                except (OSError, http.client.HTTPException):
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"the {server} server did not answer in time")
+                time.sleep(0.1)
+            yield host, port
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def _archer(address, dataset, mix, deadline, random_seed, records):
+    """Send requests from the mix until the deadline, recording each outcome."""
+    rng = random.Random(random_seed)
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = OPERATIONS[name][1](rng, dataset)
+        start = time.perf_counter()
+        try:
+            outcome = _send(*address, method, path, body)
+        except (OSError, http.client.HTTPException) as exc:
+            outcome = type(exc).__name__
+        records.append((name, time.perf_counter() - start, outcome))
+
+
+def drive(address, dataset, mix, clients, duration, random_seed=0):
+    """
+    Send the route mix from concurrent simulated archers for a while.
+
+    Args:
+        address (tuple[str, int]): The host and port of the server.
+        dataset (dict): The seeded quiver and arrow IDs.
+        mix (dict[str, float]): The weight of each route in :data:`OPERATIONS`.
+        clients (int): The number of concurrent archers.
+        duration (float): Seconds to keep sending requests.
+        random_seed (int): Seed for the archers' random choices.
+
+    Returns:
+        tuple[list[tuple], float]: The ``(route, seconds, status or error
+        name)`` of every request, and the seconds the run took.
+    """
+    records = [[] for _ in range(clients)]
+    start = time.monotonic()
+    threads = [
+        threading.Thread(
+            target=_archer,
+            args=(address, dataset, mix, start + duration, random_seed + i, records[i]),
+            daemon=True,
+        )
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [r for client in records for r in client], time.monotonic() - start
+
+
+def _summary(records, elapsed):
+    """Summarize the records of one route (or of all routes)."""
+    failures = Counter(
+        str(outcome) for _, _, outcome in records
+        if not isinstance(outcome, int) or outcome >= 400
+    )
+    latencies = sorted(
+        seconds * 1000 for _, seconds, outcome in records
+        if isinstance(outcome, int) and outcome < 400
+    )
+    errors = sum(failures.values())
+
+    def ms(value):
+        return None if value is None else round(value, 3)
+
+    return {
+        "requests": len(records),
+        "errors": errors,
+        "error_rate": round(errors / len(records), 5) if records else 0.0,
+        "errors_by_kind": dict(sorted(failures.items())),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+def summarize(records, elapsed):
+    """
+    Report throughput, latency percentiles and errors per route.
+
+    Responses with a 4xx or 5xx status and failed connections count as
+    errors; throughput and latencies cover the successful requests.
+
+    Args:
+        records (list[tuple]): The request records from :func:`drive`.
+        elapsed (float): The seconds the run took.
+
+    Returns:
+        dict: ``routes`` (the summary of each route, by name) and ``total``.
+    """
+    by_route = {}
+    for record in records:
+        by_route.setdefault(record[0], []).append(record)
+    return {
+        "routes": {
+            name: _summary(by_route[name], elapsed) for name in sorted(by_route)
+        },
+        "total": _summary(records, elapsed),
+    }
+
+
+def compare(report, baseline):
+    """
+    Describe the change in each route's throughput, p95 latency and errors.
+
+    Args:
+        report (dict): The summary of this run, as from :func:`summarize`.
+        baseline (dict): The summary of an earlier run.
+
+    Returns:
+        list[str]: One line per route found in both runs, then the total.
+    """
+    pairs = [
+        (name, result, baseline["routes"][name])
+        for name, result in report["routes"].items()
+        if name in baseline["routes"]
+    ]
+    pairs.append(("total", report["total"], baseline["total"]))
+    lines = []
+    for name, new, old in pairs:
+        p95 = [f"{v:.2f}" if v is not None else "-" for v in (old["p95_ms"], new["p95_ms"])]
+        lines.append(
+            f"{name}: {old['throughput_rps']:.1f} -> {new['throughput_rps']:.1f} req/s, "
+            f"p95 {p95[0]} -> {p95[1]} ms, "
+            f"errors {old['error_rate']:.2%} -> {new['error_rate']:.2%}"
+        )
+    return lines
+
+
+def main(argv=None):
+    """
+    Run the load test from the command line.
+
+    Args:
+        argv (list[str] | None): Command-line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4, help="server processes")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent archers")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX,
+        help=f"route=weight pairs from: {', '.join(OPERATIONS)}",
+    )
+    parser.add_argument(
+        "--server", choices=("auto", "gunicorn", "werkzeug"), default="auto"
+    )
+    parser.add_argument("--quivers", type=int, default=20)
+    parser.add_argument("--arrows", type=int, default=12, help="arrows per quiver")
+    parser.add_argument("--scores", type=int, default=1000, help="scores per arrow")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="an empty local database to seed")
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--baseline", help="compare against this results file")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'load.db')}"
+
+    try:
+        dataset = prepare(
+            args.database_url, args.quivers, args.arrows, args.scores, args.seed
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    server = pick_server(args.server)
+    with running_server(args.database_url, args.workers, server) as address:
+        records, elapsed = drive(
+            address, dataset, args.mix, args.clients, args.duration, args.seed
+        )
+
+    report = {
+        "config": {
+            "server": server,
+            "workers": args.workers,
+            "clients": args.clients,
+            "duration": args.duration,
+            "mix": args.mix,
+            "database": args.database_url.split(":", 1)[0],
+            "quivers": args.quivers,
+            "arrows_per_quiver": args.arrows,
+            "scores_per_arrow": args.scores,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        **summarize(records, elapsed),
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    for name, result in [*report["routes"].items(), ("total", report["total"])]:
+        latencies = " ".join(
+            f"{result[key] or 0.0:8.2f}" for key in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        print(
+            f"{name:20} {result['throughput_rps']:8.1f} req/s {latencies} ms "
+            f"(p50 p95 p99) {result['error_rate']:7.2%} errors"
+        )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            for line in compare(report, json.load(fh)):
+                print(line)
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+"""
+Benchmark runner for the QuiverStats API.
+
+Seeds a fresh database, calls every route of the Flask app through the test
+client, and records the latency and SQL query count of each call. Results are
+written as JSON and, when a baseline is given, compared against it: the run
+fails if a route's median latency grows past the allowed factor or it issues
+more queries than before.
+
+Usage (from the repository root)::
+
+    python -m backend.bench.runner --quivers 100 --arrows 50 --scores 2000 \\
+        --output bench_results.json --baseline backend/bench/baseline.json
+
+Without ``--database-url`` the run uses a temporary SQLite file.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class Scenario:
+    """
+    One benchmarked call of an API route.
+
+    Attributes:
+        name (str): The name results are reported under.
+        rule (str): The URL rule of the route being exercised.
+        method (str): The HTTP method.
+        request (Callable[[dict], tuple[str, dict | str | None]]): Builds the
+            URL and the JSON (or, as a str, raw) body for one call, given the
+            run context; may create throwaway rows through the client first,
+            outside the timed section.
+        status (int): The expected response status.
+    """
+
+    def __init__(self, name, rule, method, request, status=200):
+        self.name = name
+        self.rule = rule
+        self.method = method
+        self.request = request
+        self.status = status
+
+
+def _throwaway_quiver(ctx):
+    """Create a quiver with scored arrows for destructive calls and return its ID."""
+    client = ctx["client"]
+    quiver_id = client.post("/api/quivers", json={"name": "bench"}).get_json()["id"]
+    _throwaway_arrow(ctx, quiver_id)
+    _throwaway_arrow(ctx, quiver_id)
+    return quiver_id
+
+
+def _throwaway_arrow(ctx, quiver_id=None):
+    """Create an arrow with a batch of scores for destructive calls and return its ID."""
+    client = ctx["client"]
+    quiver_id = quiver_id or ctx["quiver_ids"][0]
+    rv = client.post(f"/api/quivers/{quiver_id}/arrows", json={"name": "bench"})
+    arrow_id = rv.get_json()["id"]
+    scores = [7] * ctx["batch_size"]
+    client.post(f"/api/arrows/{arrow_id}/scores/batch", json={"scores": scores})
+    return arrow_id
+
+
+def scenarios():
+    """
+    List the benchmarked calls, covering every API route at least once.
+
+    Returns:
+        list[Scenario]: The scenarios, in the order they are run.
+    """
+
+    def quiver(ctx):
+        return ctx["quiver_ids"][len(ctx["quiver_ids"]) // 2]
+
+    def arrow(ctx):
+        return ctx["arrow_ids"][len(ctx["arrow_ids"]) // 2][0]
+
+    def score_batch(ctx):
+        return [{"score": 9, "x": 1.5, "y": -2.0}] * ctx["batch_size"]
+
+    def impacts(ctx):
+        return [[61 + (i % 40) * 0.75, 61 - (i % 25) * 1.5] for i in range(ctx["batch_size"])]
+
+    def quiver_batch(ctx):
+        ids = ctx["arrow_ids"][len(ctx["arrow_ids"]) // 2]
+        return [
+            {"arrow_id": ids[i % len(ids)], "score": 8}
+            for i in range(ctx["batch_size"])
+        ]
+
+    def import_archive(ctx):
+        records = [
+            {"type": "quiver", "id": 1, "name": "bench"},
+            {"type": "arrow", "id": 1, "quiver_id": 1, "name": "bench"},
+        ] + [
+            {"type": "score", "id": i, "arrow_id": 1, "score": 9, "x": 1.5, "y": -2.0}
+            for i in range(ctx["batch_size"])
+        ]
+        return "/api/import", "".join(json.dumps(r) + "\n" for r in records)
+
+    def delete_score(ctx):
+        rv = ctx["client"].post(f"/api/arrows/{arrow(ctx)}/scores", json={"score": 5})
+        return f"/api/arrows/scores/{rv.get_json()['id']}", None
+
+    return [
+        Scenario("GET /api/quivers", "/api/quivers", "GET",
+                 lambda ctx: ("/api/quivers", None)),
+        Scenario("GET /api/quivers?limit=50", "/api/quivers", "GET",
+                 lambda ctx: ("/api/quivers?limit=50", None)),
+        Scenario("GET /api/dashboard", "/api/dashboard", "GET",
+                 lambda ctx: ("/api/dashboard", None)),
+        Scenario("GET /api/dashboard?sort=mean&order=desc", "/api/dashboard", "GET",
+                 lambda ctx: ("/api/dashboard?sort=mean&order=desc", None)),
+        Scenario("POST /api/quivers", "/api/quivers", "POST",
+                 lambda ctx: ("/api/quivers", {"name": "bench"}), 201),
+        Scenario("GET /api/quivers/<id>", "/api/quivers/<int:quiver_id>", "GET",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}", None)),
+        Scenario("GET /api/quivers/<id>?expand=scores,stats",
+                 "/api/quivers/<int:quiver_id>", "GET",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}?expand=scores,stats", None)),
+        Scenario("PUT /api/quivers/<id>", "/api/quivers/<int:quiver_id>", "PUT",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}", {"name": "renamed"})),
+        Scenario("DELETE /api/quivers/<id>", "/api/quivers/<int:quiver_id>", "DELETE",
+                 lambda ctx: (f"/api/quivers/{_throwaway_quiver(ctx)}", None), 204),
+        Scenario("GET /api/quivers/<id>/arrows", "/api/quivers/<int:quiver_id>/arrows",
+                 "GET", lambda ctx: (f"/api/quivers/{quiver(ctx)}/arrows", None)),
+        Scenario("POST /api/quivers/<id>/arrows", "/api/quivers/<int:quiver_id>/arrows",
+                 "POST",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}/arrows", {"name": "bench"}),
+                 201),
+        Scenario("PUT /api/arrows/<id>", "/api/arrows/<int:arrow_id>", "PUT",
+                 lambda ctx: (f"/api/arrows/{arrow(ctx)}", {"name": "renamed"})),
+        Scenario("DELETE /api/arrows/<id>", "/api/arrows/<int:arrow_id>", "DELETE",
+                 lambda ctx: (f"/api/arrows/{_throwaway_arrow(ctx)}", None), 204),
+        Scenario("GET /api/arrows/<id>/scores", "/api/arrows/<int:arrow_id>/scores",
+                 "GET", lambda ctx: (f"/api/arrows/{arrow(ctx)}/scores", None)),
+        Scenario("GET /api/arrows/<id>/scores?limit=100",
+                 "/api/arrows/<int:arrow_id>/scores", "GET",
+                 lambda ctx: (f"/api/arrows/{arrow(ctx)}/scores?limit=100", None)),
+        Scenario("POST /api/arrows/<id>/scores", "/api/arrows/<int:arrow_id>/scores",
+                 "POST",
+                 lambda ctx: (f"/api/arrows/{arrow(ctx)}/scores", {"score": 9}), 201),
+        Scenario("POST /api/arrows/<id>/scores/batch",
+                 "/api/arrows/<int:arrow_id>/scores/batch", "POST",
+                 lambda ctx: (f"/api/arrows/{arrow(ctx)}/scores/batch",
+                              {"scores": score_batch(ctx)}), 201),
+        Scenario("POST /api/arrows/<id>/impacts",
+                 "/api/arrows/<int:arrow_id>/impacts", "POST",
+                 lambda ctx: (f"/api/arrows/{arrow(ctx)}/impacts",
+                              {"face": "122cm", "impacts": impacts(ctx)}), 201),
+        Scenario("POST /api/quivers/<id>/scores/batch",
+                 "/api/quivers/<int:quiver_id>/scores/batch", "POST",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}/scores/batch",
+                              {"scores": quiver_batch(ctx)}), 201),
+        Scenario("DELETE /api/arrows/scores/<id>", "/api/arrows/scores/<int:score_id>",
+                 "DELETE", delete_score, 204),
+        Scenario("GET /api/arrows/<id>/stats", "/api/arrows/<int:arrow_id>/stats",
+                 "GET", lambda ctx: (f"/api/arrows/{arrow(ctx)}/stats", None)),
+        Scenario("GET /api/quivers/<id>/ranking", "/api/quivers/<int:quiver_id>/ranking",
+                 "GET", lambda ctx: (f"/api/quivers/{quiver(ctx)}/ranking", None)),
+        Scenario("GET /api/quivers/<id>/comparison",
+                 "/api/quivers/<int:quiver_id>/comparison", "GET",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}/comparison", None)),
+        Scenario("GET /api/arrows/<id>/grouping", "/api/arrows/<int:arrow_id>/grouping",
+                 "GET", lambda ctx: (f"/api/arrows/{arrow(ctx)}/grouping", None)),
+        Scenario("GET /api/quivers/<id>/grouping",
+                 "/api/quivers/<int:quiver_id>/grouping", "GET",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}/grouping", None)),
+        Scenario("GET /api/arrows/<id>/heatmap", "/api/arrows/<int:arrow_id>/heatmap",
+                 "GET", lambda ctx: (f"/api/arrows/{arrow(ctx)}/heatmap", None)),
+        Scenario("GET /api/quivers/<id>/heatmap",
+                 "/api/quivers/<int:quiver_id>/heatmap", "GET",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}/heatmap", None)),
+        Scenario("GET /api/quivers/<id>/events?timeout=0",
+                 "/api/quivers/<int:quiver_id>/events", "GET",
+                 lambda ctx: (f"/api/quivers/{quiver(ctx)}/events?timeout=0", None)),
+        Scenario("GET /api/arrows/<id>/trend", "/api/arrows/<int:arrow_id>/trend",
+                 "GET", lambda ctx: (f"/api/arrows/{arrow(ctx)}/trend", None)),
+        Scenario("GET /api/arrows/<id>/trend?bucket=week&window=4",
+                 "/api/arrows/<int:arrow_id>/trend", "GET",
+                 lambda ctx: (
+                     f"/api/arrows/{arrow(ctx)}/trend?bucket=week&window=4", None
+                 )),
+        Scenario("GET /api/export?quiver_id=<id>", "/api/export", "GET",
+                 lambda ctx: (f"/api/export?quiver_id={quiver(ctx)}", None)),
+        Scenario("GET /api/export?format=csv&quiver_id=<id>", "/api/export", "GET",
+                 lambda ctx: (f"/api/export?format=csv&quiver_id={quiver(ctx)}", None)),
+        Scenario("POST /api/import", "/api/import", "POST", import_archive, 201),
+        Scenario("GET /api/_cache", "/api/_cache", "GET",
+                 lambda ctx: ("/api/_cache", None)),
+        Scenario("GET /api/_metrics", "/api/_metrics", "GET",
+                 lambda ctx: ("/api/_metrics", None)),
+    ]
+
+
+def uncovered_routes(app, scenario_list):
+    """
+    Find API routes that no scenario exercises.
+
+    Args:
+        app (flask.Flask): The application.
+        scenario_list (list[Scenario]): The scenarios to be run.
+
+    Returns:
+        list[str]: ``"METHOD rule"`` for every route without a scenario.
+    """
+    covered = {(s.method, s.rule) for s in scenario_list}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static":
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return missing
+
+
+@contextmanager
+def _count_queries(engine):
+    """Count the statements sent to the database while the block runs."""
+    counter = [0]
+
+    def before_cursor_execute(*args):
+        counter[0] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def run_benchmarks(app, dataset, repeat=20, batch_size=100):
+    """
+    Time every scenario against a seeded database.
+
+    The stats cache is cleared before each call, so the timings measure the
+    computation behind a route rather than a cache hit.
+
+    Args:
+        app (flask.Flask): The application, bound to the seeded database.
+        dataset (dict): The result of :func:`backend.bench.seed.seed`.
+        repeat (int): The number of timed calls per scenario.
+        batch_size (int): The number of scores sent per batch call.
+
+    Returns:
+        dict: Per scenario, the call count, median/p95/max latency in
+        milliseconds and the SQL query count per call.
+    """
+    from backend.cache import stats_cache
+    from backend.extensions import db
+
+    scenario_list = scenarios()
+    missing = uncovered_routes(app, scenario_list)
+    if missing:
+        raise RuntimeError(f"Routes without a benchmark: {', '.join(missing)}")
+
+    client = app.test_client()
+    ctx = {**dataset, "client": client, "batch_size": batch_size}
+    results = {}
+    with app.app_context():
+        engine = db.engine
+    for scenario in scenario_list:
+        timings, queries = [], []
+        for _ in range(repeat):
+            url, body = scenario.request(ctx)
+            # a str body is sent as is, anything else as JSON
+            payload = {"data": body} if isinstance(body, str) else {"json": body}
+            stats_cache.clear()
+            with _count_queries(engine) as counter:
+                start = time.perf_counter()
+                rv = client.open(url, method=scenario.method, **payload)
+                rv.get_data()
+                timings.append((time.perf_counter() - start) * 1000.0)
+            if rv.status_code != scenario.status:
+                raise RuntimeError(
+                    f"{scenario.name} returned {rv.status_code}, "
+                    f"expected {scenario.status}"
+                )
+            queries.append(counter[0])
+        timings.sort()
+        results[scenario.name] = {
+            "calls": repeat,
+            "median_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+            "max_ms": round(timings[-1], 3),
+            "queries": max(queries),
+        }
+    return results
+
+
+def compare(results, baseline, latency_tolerance=2.0, latency_slack_ms=1.0):
+    """
+    Check benchmark results against a baseline.
+
+    Args:
+        results (dict): The ``routes`` section of the current run.
+        baseline (dict): The ``routes`` section of the baseline run.
+        latency_tolerance (float): Allowed growth factor of the median latency.
+        latency_slack_ms (float): Absolute latency growth always allowed, so
+            sub-millisecond routes do not fail on timer noise.
+
+    Returns:
+        list[str]: One message per regression; empty if there are none.
+    """
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        if current["queries"] > base["queries"]:
+            regressions.append(
+                f"{name}: {current['queries']} queries, baseline {base['queries']}"
+            )
+        allowed = base["median_ms"] * latency_tolerance + latency_slack_ms
+        if current["median_ms"] > allowed:
+            regressions.append(
+                f"{name}: median {current['median_ms']:.2f} ms, "
+                f"allowed {allowed:.2f} ms (baseline {base['median_ms']:.2f} ms)"
+            )
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite from the command line.
+
+    Args:
+        argv (list[str] | None): Command-line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The process exit status; 1 if a regression was found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quivers", type=int, default=20)
+    parser.add_argument("--arrows", type=int, default=12, help="arrows per quiver")
+    parser.add_argument("--scores", type=int, default=1000, help="scores per arrow")
+    parser.add_argument("--repeat", type=int, default=20, help="calls per route")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="an empty database to seed")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--latency-tolerance", type=float, default=2.0)
+    parser.add_argument(
+        "--write-baseline", action="store_true",
+        help="store this run as the new baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from backend.app import create_app
+    from backend.bench.seed import seed
+    from backend.extensions import db
+    from backend.models import Quiver
+    from backend.rollup import run_rollup
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url})
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Quiver.id).first() is not None:
+            parser.error("the benchmark database must be empty")
+        start = time.perf_counter()
+        dataset = seed(args.quivers, args.arrows, args.scores, args.seed)
+        seed_seconds = time.perf_counter() - start
+        # the seeded archive is history, so roll it up as a deployment would
+        run_rollup(lag=0)
+        db.session.remove()
+
+    routes = run_benchmarks(app, dataset, args.repeat, args.batch_size)
+    report = {
+        "dataset": {
+            "quivers": args.quivers,
+            "arrows_per_quiver": args.arrows,
+            "scores_per_arrow": args.scores,
+            "seed_seconds": round(seed_seconds, 3),
+            "database": args.database_url.split(":", 1)[0],
+        },
+        "repeat": args.repeat,
+        "routes": routes,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    for name, result in routes.items():
+        print(f"{name:50} {result['median_ms']:9.2f} ms {result['queries']:4} queries")
+
+    status = 0
+    if args.write_baseline:
+        with open(args.baseline or DEFAULT_BASELINE, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(routes, baseline["routes"], args.latency_tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Synthetic dataset loader for the QuiverStats benchmarks.
+
+Generates quivers, arrows and scores with NumPy and writes them with
+executemany Core inserts in large chunks, filling in the arrow_stats and
+arrow_heatmap aggregates directly, so seeding millions of scores takes seconds
+rather than going through the API one shot at a time.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+from backend.extensions import db
+from backend.heatmap import DTYPE, bin_impacts
+from backend.models import Arrow, ArrowHeatmap, ArrowScore, ArrowStats, Quiver
+from backend.scoring import FACES, score_impacts
+
+# Rows per executemany call when writing scores
+CHUNK_SIZE = 50_000
+
+# The 122cm ten-ring face the frontend draws
+FACE = FACES["122cm"]
+
+# Shots are spread over the year before this date
+SEASON_END = datetime(2025, 1, 1)
+SEASON_SECONDS = 365 * 24 * 3600
+
+
+def seed(quivers, arrows_per_quiver, scores_per_arrow, random_seed=0):
+    """
+    Populate an empty database with a synthetic archive and commit it.
+
+    Each arrow gets its own aim offset and spread, so rankings and grouping
+    analytics have something to find.
+
+    Args:
+        quivers (int): The number of quivers.
+        arrows_per_quiver (int): The number of arrows in each quiver.
+        scores_per_arrow (int): The number of scores for each arrow.
+        random_seed (int): Seed for the random generator.
+
+    Returns:
+        dict: The dataset size and the IDs of the created quivers and arrows,
+        keyed ``quiver_ids`` and ``arrow_ids`` (arrows grouped per quiver).
+    """
+    rng = np.random.default_rng(random_seed)
+    # timestamps come from their own stream so they do not shift the shot data
+    clock = np.random.default_rng(random_seed + 1)
+    conn = db.session.connection()
+
+    quiver_ids = list(
+        db.session.execute(
+            insert(Quiver).returning(Quiver.id, sort_by_parameter_order=True),
+            [{"name": f"Quiver {i + 1}"} for i in range(quivers)],
+        ).scalars()
+    )
+
+    arrow_ids = []
+    for quiver_id in quiver_ids:
+        arrow_ids.append(
+            list(
+                db.session.execute(
+                    insert(Arrow).returning(Arrow.id, sort_by_parameter_order=True),
+                    [
+                        {"quiver_id": quiver_id, "name": f"Arrow {i + 1}"}
+                        for i in range(arrows_per_quiver)
+                    ],
+                ).scalars()
+            )
+        )
+
+    pending, stats_rows, heatmap_rows = [], [], []
+    for arrow_id in (a for ids in arrow_ids for a in ids):
+        offset = rng.normal(0.0, 4.0, size=2)
+        spread = rng.uniform(4.0, 12.0)
+        x = rng.normal(offset[0], spread, size=scores_per_arrow).round(2)
+        y = rng.normal(offset[1], spread, size=scores_per_arrow).round(2)
+        scores, _ = score_impacts(FACE, x, y)
+        offsets = np.sort(clock.uniform(-SEASON_SECONDS, 0, size=scores_per_arrow))
+        pending.extend(
+            {
+                "arrow_id": arrow_id,
+                "score": int(s),
+                "x": float(px),
+                "y": float(py),
+                "shot_at": SEASON_END + timedelta(seconds=float(t)),
+            }
+            for s, px, py, t in zip(scores, x, y, offsets)
+        )
+        counts = np.bincount(scores, minlength=FACE.rings + 1)
+        stats_rows.append(
+            {
+                "arrow_id": arrow_id,
+                "count": int(scores.size),
+                "total": float(scores.sum()),
+                "total_sq": float((scores.astype(float) ** 2).sum()),
+                "min_score": float(scores.min()) if scores.size else None,
+                "max_score": float(scores.max()) if scores.size else None,
+                "histogram": {str(r): int(c) for r, c in enumerate(counts) if c},
+            }
+        )
+        if scores.size:
+            cells, outside = bin_impacts(x, y)
+            heatmap_rows.append(
+                {
+                    "arrow_id": arrow_id,
+                    "counts": cells.astype(DTYPE).tobytes(),
+                    "outside": outside,
+                }
+            )
+        if len(pending) >= CHUNK_SIZE:
+            conn.execute(ArrowScore.__table__.insert(), pending)
+            pending = []
+    if pending:
+        conn.execute(ArrowScore.__table__.insert(), pending)
+    if stats_rows:
+        conn.execute(ArrowStats.__table__.insert(), stats_rows)
+    if heatmap_rows:
+        conn.execute(ArrowHeatmap.__table__.insert(), heatmap_rows)
+    db.session.commit()
+
+    return {
+        "quivers": quivers,
+        "arrows_per_quiver": arrows_per_quiver,
+        "scores_per_arrow": scores_per_arrow,
+        "quiver_ids": quiver_ids,
+        "arrow_ids": arrow_ids,
+    }
@@ -0,0 +1,211 @@
+"""
+Per-row serialization benchmark for the score listing.
+
+Seeds one arrow with many scores and renders ``GET /api/arrows/<id>/scores``
+through :func:`backend.pagination.list_response` with each way the listing
+has been produced, reporting the cost per row:
+
+* ``orm``: full ``ArrowScore`` objects converted to dicts, encoded by Flask's
+  default JSON provider;
+* ``columns``: projected columns, with ``score`` converted from ``Decimal``
+  and ``shot_at`` formatted in Python, encoded by Flask's default provider;
+* ``cast-stdlib``: the current route, with ``score`` cast to a float in SQL
+  and rows passed to the standard library provider as they are;
+* ``cast-orjson``: the current route with the orjson provider (when orjson
+  is installed).
+
+Usage (from the repository root)::
+
+    python -m backend.bench.serialization --rows 20000 --repeat 5
+
+Without ``--database-url`` the run uses a temporary SQLite file.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Float, cast, select
+
+from backend.extensions import db
+from backend.models import ArrowScore
+from backend.pagination import list_response
+from backend.serialization import OrjsonProvider, StdlibProvider, orjson
+
+
+class _FlaskDefault(DefaultJSONProvider):
+    """Flask's default provider, with NDJSON lines encoded as they once were."""
+
+    def encode(self, obj):
+        return json.dumps(obj).encode()
+
+
+def _hydrated(row):
+    """Convert a row holding an ``ArrowScore`` object, as the route once did."""
+    s = row.ArrowScore
+    return {
+        "id": s.id,
+        "score": float(s.score),
+        "x": s.x,
+        "y": s.y,
+        "shot_at": s.shot_at.isoformat() if s.shot_at else None,
+    }
+
+
+def _converted(row):
+    """Convert a column-projected row in Python, as the route once did."""
+    return {
+        "id": row.id,
+        "score": float(row.score),
+        "x": row.x,
+        "y": row.y,
+        "shot_at": row.shot_at.isoformat() if row.shot_at else None,
+    }
+
+
+def pipelines(app):
+    """
+    List the ways of rendering the score listing that are compared.
+
+    Args:
+        app (flask.Flask): The application the providers are created for.
+
+    Returns:
+        dict[str, tuple]: ``(provider, columns, to_dict)`` per pipeline name;
+        a ``to_dict`` of None passes the rows on as they are.
+    """
+    columns = (
+        ArrowScore.id,
+        ArrowScore.score,
+        ArrowScore.x,
+        ArrowScore.y,
+        ArrowScore.shot_at,
+    )
+    cast_columns = (
+        ArrowScore.id,
+        cast(ArrowScore.score, Float).label("score"),
+        ArrowScore.x,
+        ArrowScore.y,
+        ArrowScore.shot_at,
+    )
+    found = {
+        "orm": (_FlaskDefault(app), (ArrowScore,), _hydrated),
+        "columns": (_FlaskDefault(app), columns, _converted),
+        "cast-stdlib": (StdlibProvider(app), cast_columns, None),
+    }
+    if orjson is not None:
+        found["cast-orjson"] = (OrjsonProvider(app), cast_columns, None)
+    return found
+
+
+def render(app, pipeline, arrow_id, ndjson=False):
+    """
+    Render one arrow's score listing with a pipeline.
+
+    Args:
+        app (flask.Flask): The application.
+        pipeline (tuple): A ``(provider, columns, to_dict)`` entry of
+            :func:`pipelines`.
+        arrow_id (int): The arrow whose scores are listed.
+        ndjson (bool): Stream NDJSON instead of a JSON array.
+
+    Returns:
+        bytes: The response body.
+    """
+    provider, columns, to_dict = pipeline
+    query = "?format=ndjson" if ndjson else ""
+    saved, app.json = app.json, provider
+    try:
+        with app.test_request_context(f"/api/arrows/{arrow_id}/scores{query}"):
+            stmt = select(*columns).where(ArrowScore.arrow_id == arrow_id)
+            extra = {} if to_dict is None else {"to_dict": to_dict}
+            body = list_response(stmt, ArrowScore.id, **extra).get_data()
+            db.session.remove()
+    finally:
+        app.json = saved
+    return body
+
+
+def run(app, arrow_id, rows, repeat=5, ndjson=False):
+    """
+    Time every pipeline over one arrow's scores.
+
+    Args:
+        app (flask.Flask): The application, with the arrow seeded.
+        arrow_id (int): The arrow whose scores are listed.
+        rows (int): The number of scores the arrow has.
+        repeat (int): Renders per pipeline; the median is reported.
+        ndjson (bool): Stream NDJSON instead of a JSON array.
+
+    Returns:
+        dict: Per pipeline, the median milliseconds per render and
+        microseconds per row.
+    """
+    results = {}
+    for name, pipeline in pipelines(app).items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render(app, pipeline, arrow_id, ndjson)
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        results[name] = {
+            "median_ms": round(median * 1000, 3),
+            "us_per_row": round(median * 1e6 / max(rows, 1), 3),
+        }
+    return results
+
+
+def main(argv=None):
+    """
+    Run the serialization benchmark from the command line.
+
+    Args:
+        argv (list[str] | None): Command-line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=20_000, help="scores listed")
+    parser.add_argument("--repeat", type=int, default=5, help="renders per pipeline")
+    parser.add_argument("--ndjson", action="store_true", help="stream NDJSON")
+    parser.add_argument("--database-url", help="an empty database to seed")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    from backend.app import create_app
+    from backend.bench.seed import seed
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url})
+    with app.app_context():
+        db.create_all()
+        arrow_id = seed(1, 1, args.rows)["arrow_ids"][0][0]
+        db.session.remove()
+        results = run(app, arrow_id, args.rows, args.repeat, args.ndjson)
+
+    for name, result in results.items():
+        print(
+            f"{name:12} {result['median_ms']:10.2f} ms {result['us_per_row']:8.3f} us/row"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"rows": args.rows, "pipelines": results}, fh, indent=2)
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
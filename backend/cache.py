@@ -0,0 +1,249 @@
+"""
+In-process memoization of computed views for the QuiverStats backend.
+
+Expensive read results (arrow statistics, quiver rankings, grouping analytics)
+are kept in a bounded LRU cache with a time-to-live. Each entry is tagged with
+the quivers and arrows it was computed from, and SQLAlchemy session listeners
+drop exactly those entries once a transaction that changed one of them
+commits.
+
+The cache is per process: a write only invalidates the worker that handled
+it. The routes therefore include the version of the quiver or arrow (see
+``backend.versioning``) in every key, so once a write committed by any worker
+has bumped it, every worker misses and recomputes instead of serving the old
+value under the new ETag.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from backend.extensions import db
+from backend.models import Arrow, ArrowHeatmap, ArrowScore, ArrowStats, Quiver
+
+# session.info key collecting the scopes touched by the current transaction
+_PENDING_KEY = "stats_cache_scopes"
+
+# Callbacks told about the scopes of every committed transaction
+_commit_listeners = []
+
+
+class StatsCache:
+    """
+    A thread-safe LRU cache with size- and TTL-based eviction.
+
+    Attributes:
+        maxsize (int): The maximum number of entries kept.
+        ttl (float): Seconds an entry stays valid after it is stored.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to compute the value.
+        evictions (int): Entries dropped to stay within ``maxsize``.
+        expirations (int): Entries dropped because their TTL ran out.
+        invalidations (int): Entries dropped because their data changed.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_scope = {}
+        self._generations = {}
+        self._lock = threading.RLock()
+        self.hits = self.misses = 0
+        self.evictions = self.expirations = self.invalidations = 0
+
+    def init_app(self, app):
+        """
+        Configure the cache from the app and listen for committed changes.
+
+        Reads ``STATS_CACHE_SIZE`` (entries, 0 disables the cache) and
+        ``STATS_CACHE_TTL`` (seconds) from the app config.
+
+        Args:
+            app (flask.Flask): The application.
+        """
+        self.maxsize = app.config.setdefault("STATS_CACHE_SIZE", self.maxsize)
+        self.ttl = app.config.setdefault("STATS_CACHE_TTL", self.ttl)
+        app.extensions["stats_cache"] = self
+        if not event.contains(db.session, "after_flush", _collect_scopes):
+            event.listen(db.session, "after_flush", _collect_scopes)
+            event.listen(db.session, "after_commit", _invalidate_committed)
+            event.listen(db.session, "after_rollback", _discard_pending)
+
+    def get_or_compute(self, key, scopes, compute):
+        """
+        Return a cached value, computing and storing it on a miss.
+
+        Args:
+            key (Hashable): Identifies the value, including any parameters.
+            scopes (Iterable[tuple]): The ``("quiver", id)`` / ``("arrow", id)``
+                scopes the value depends on.
+            compute (Callable[[], Any]): Produces the value on a miss.
+
+        Returns:
+            Any: The cached or freshly computed value.
+        """
+        scopes = tuple(scopes)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, _ = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop(key)
+                self.expirations += 1
+            self.misses += 1
+            generations = [self._generations.get(scope, 0) for scope in scopes]
+
+        value = compute()
+
+        with self._lock:
+            # a commit that invalidated one of the scopes while we computed
+            # means the value may already be stale, so do not store it
+            if self.maxsize <= 0 or generations != [
+                self._generations.get(scope, 0) for scope in scopes
+            ]:
+                return value
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, now + self.ttl, scopes)
+            for scope in scopes:
+                self._by_scope.setdefault(scope, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def invalidate(self, scopes):
+        """
+        Drop every entry that depends on any of the given scopes.
+
+        Args:
+            scopes (Iterable[tuple]): The changed ``("quiver", id)`` /
+                ``("arrow", id)`` scopes.
+        """
+        with self._lock:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+                for key in list(self._by_scope.get(scope, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._by_scope.clear()
+            self._generations.clear()
+            self.hits = self.misses = 0
+            self.evictions = self.expirations = self.invalidations = 0
+
+    def info(self):
+        """
+        Report the cache size and counters.
+
+        Returns:
+            dict: The current size, limits and hit/miss/eviction counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key):
+        """Remove one entry and its scope index references (lock held)."""
+        _, _, scopes = self._entries.pop(key)
+        for scope in scopes:
+            keys = self._by_scope.get(scope)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_scope[scope]
+
+
+stats_cache = StatsCache()
+
+
+def _scopes_of(session, obj):
+    """
+    Work out which cache scopes a changed row affects.
+
+    Args:
+        session (Session): The flushing session.
+        obj: A new, changed or deleted ORM object.
+
+    Returns:
+        set[tuple]: The affected ``("quiver", id)`` / ``("arrow", id)`` scopes.
+    """
+    if isinstance(obj, Quiver):
+        return {("quiver", obj.id)}
+    if isinstance(obj, Arrow):
+        return {("arrow", obj.id), ("quiver", obj.quiver_id)}
+    if isinstance(obj, (ArrowScore, ArrowStats, ArrowHeatmap)):
+        scopes = {("arrow", obj.arrow_id)}
+        arrow = session.get(Arrow, obj.arrow_id)
+        if arrow is not None:
+            scopes.add(("quiver", arrow.quiver_id))
+        return scopes
+    return set()
+
+
+def mark_changed(session, scopes):
+    """
+    Queue scopes changed outside the ORM unit of work for invalidation.
+
+    Bulk Core statements do not show up in the session's new, dirty or deleted
+    collections, so code issuing them reports what it changed here; the
+    entries are dropped once the transaction commits.
+
+    Args:
+        session (Session): The session the statements run in.
+        scopes (Iterable[tuple]): The changed ``("quiver", id)`` /
+            ``("arrow", id)`` scopes.
+    """
+    session.info.setdefault(_PENDING_KEY, set()).update(scopes)
+
+
+def on_committed(callback):
+    """
+    Call back with the scopes changed by every transaction that commits.
+
+    Args:
+        callback (Callable[[set[tuple]], None]): Receives the changed
+            ``("quiver", id)`` / ``("arrow", id)`` scopes.
+    """
+    if callback not in _commit_listeners:
+        _commit_listeners.append(callback)
+
+
+def _collect_scopes(session, flush_context):
+    """Remember the scopes touched by a flush until the transaction ends."""
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        pending |= _scopes_of(session, obj)
+
+
+def _invalidate_committed(session):
+    """Invalidate the scopes changed by a transaction once it commits."""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        stats_cache.invalidate(pending)
+        for callback in _commit_listeners:
+            callback(pending)
+
+
+def _discard_pending(session):
+    """Forget the scopes of a transaction that was rolled back."""
+    session.info.pop(_PENDING_KEY, None)
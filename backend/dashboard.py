@@ -0,0 +1,89 @@
+"""
+Archive-wide dashboard summary for the QuiverStats backend.
+
+Every quiver's arrow count, shot count, mean score and last activity come from
+one aggregate query over quivers, arrows and their ArrowStats rows, so the
+dashboard needs a single round trip whatever the size of the archive. Shot
+counts and means are read from the running aggregates and the last shot of
+each arrow is a max lookup on the ``(arrow_id, shot_at)`` index, so the query
+never scans the scores themselves.
+"""
+
+from sqlalchemy import func, select
+
+from backend.extensions import db
+from backend.models import Arrow, ArrowScore, ArrowStats, Quiver
+
+# Columns the dashboard can be sorted by
+SORTS = ("id", "name", "arrows", "shots", "mean", "last_activity")
+
+
+def dashboard(sort="id", descending=False, limit=50, offset=0):
+    """
+    Summarize a page of quivers.
+
+    Sorting by anything but ``id`` has to aggregate every quiver before the
+    page can be cut, but still only touches one row per quiver and arrow.
+    Quivers without scores sort last for ``mean``, in either direction; ties
+    are broken by quiver ID.
+
+    Args:
+        sort (str): One of :data:`SORTS`.
+        descending (bool): Sort in descending order.
+        limit (int): The maximum number of quivers returned.
+        offset (int): The number of quivers skipped.
+
+    Returns:
+        dict: The total number of quivers and, for each quiver on the page,
+        its ID, name, arrow count, shot count, mean score (None without
+        scores) and last activity: the time of its latest timestamped shot,
+        or its creation time if it has none.
+    """
+    last_shot = (
+        select(func.max(ArrowScore.shot_at))
+        .where(ArrowScore.arrow_id == Arrow.id)
+        .correlate(Arrow)
+        .scalar_subquery()
+    )
+    shots = func.coalesce(func.sum(ArrowStats.count), 0)
+    columns = {
+        "id": Quiver.id,
+        "name": Quiver.name,
+        "arrows": func.count(Arrow.id),
+        "shots": shots,
+        "mean": func.sum(ArrowStats.total) / func.nullif(shots, 0),
+        "last_activity": func.coalesce(
+            func.max(last_shot), Quiver.created_at, type_=db.DateTime
+        ),
+    }
+    key = columns[sort]
+    order = key.desc() if descending else key.asc()
+    if sort == "mean":
+        order = order.nulls_last()
+    stmt = (
+        select(*(column.label(name) for name, column in columns.items()))
+        .outerjoin(Arrow, Arrow.quiver_id == Quiver.id)
+        .outerjoin(ArrowStats, ArrowStats.arrow_id == Arrow.id)
+        .group_by(Quiver.id)
+        .order_by(order, Quiver.id.desc() if descending else Quiver.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    rows = db.session.execute(stmt).all()
+    total = db.session.scalar(select(func.count()).select_from(Quiver))
+    return {
+        "total": total,
+        "quivers": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "arrows": row.arrows,
+                "shots": int(row.shots),
+                "mean": float(row.mean) if row.mean is not None else None,
+                "last_activity": (
+                    row.last_activity.isoformat() if row.last_activity else None
+                ),
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,67 @@
+"""
+Set-based deletion of quivers and arrows for the QuiverStats backend.
+
+A quiver or arrow is removed together with everything beneath it by a few
+``DELETE ... WHERE`` statements, one per table, instead of loading every child
+row into the session. The foreign keys also cascade in the database, but
+SQLite only enforces that when ``PRAGMA foreign_keys`` is on, so the children
+are deleted explicitly, deepest table first.
+
+Core statements bypass the session's change tracking, so the affected cache
+scopes are queued for invalidation here; the caller commits.
+"""
+
+from sqlalchemy import delete, select
+
+from backend.cache import mark_changed
+from backend.extensions import db
+from backend.models import (
+    Arrow,
+    ArrowHeatmap,
+    ArrowScore,
+    ArrowStats,
+    DailyRollup,
+    Quiver,
+)
+
+
+def _delete_arrows_where(criterion):
+    """
+    Delete the scores, aggregates and rows of the arrows matching a criterion.
+
+    Args:
+        criterion: A SQL expression selecting the arrows to delete.
+    """
+    arrow_ids = select(Arrow.id).where(criterion).scalar_subquery()
+    for model in (ArrowScore, ArrowStats, ArrowHeatmap, DailyRollup):
+        table = model.__table__
+        db.session.execute(delete(table).where(table.c.arrow_id.in_(arrow_ids)))
+    db.session.execute(delete(Arrow.__table__).where(criterion))
+
+
+def purge_quiver(quiver):
+    """
+    Delete a quiver with all of its arrows, their scores and their statistics.
+
+    Args:
+        quiver (Quiver): The quiver to delete.
+    """
+    arrow_ids = db.session.scalars(select(Arrow.id).where(Arrow.quiver_id == quiver.id))
+    mark_changed(
+        db.session, [("quiver", quiver.id), *(("arrow", a) for a in arrow_ids)]
+    )
+    _delete_arrows_where(Arrow.quiver_id == quiver.id)
+    db.session.execute(delete(Quiver.__table__).where(Quiver.id == quiver.id))
+    db.session.expunge(quiver)
+
+
+def purge_arrow(arrow):
+    """
+    Delete an arrow with all of its scores and its statistics.
+
+    Args:
+        arrow (Arrow): The arrow to delete.
+    """
+    mark_changed(db.session, [("arrow", arrow.id), ("quiver", arrow.quiver_id)])
+    _delete_arrows_where(Arrow.id == arrow.id)
+    db.session.expunge(arrow)
@@ -0,0 +1,103 @@
+"""
+Database engine and connection-pool settings for the QuiverStats backend.
+
+Server databases such as PostgreSQL get an explicitly sized connection pool
+that recycles connections before the server or a proxy drops them and checks
+each one out with a liveness ping, so a worker survives a database restart.
+SQLite connections are switched to write-ahead logging, which lets readers
+run alongside the single writer, with ``synchronous=NORMAL`` (durable at each
+WAL checkpoint rather than each commit), a busy timeout so concurrent writers
+wait instead of failing, and memory-mapped reads.
+
+Every setting can be overridden through the app config: ``DB_POOL_SIZE``,
+``DB_MAX_OVERFLOW``, ``DB_POOL_RECYCLE`` (seconds), ``SQLITE_JOURNAL_MODE``,
+``SQLITE_SYNCHRONOUS``, ``SQLITE_BUSY_TIMEOUT`` (milliseconds) and
+``SQLITE_MMAP_SIZE`` (bytes). Options given in ``SQLALCHEMY_ENGINE_OPTIONS``
+or in a dict entry of ``SQLALCHEMY_BINDS`` take precedence.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULTS = {
+    "DB_POOL_SIZE": 10,
+    "DB_MAX_OVERFLOW": 20,
+    "DB_POOL_RECYCLE": 1800,
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT": 5000,
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+}
+
+
+def engine_options(url, config):
+    """
+    Build the engine options for a database URL.
+
+    Args:
+        url (str): The database URL.
+        config (Mapping): The app config, for the pool settings.
+
+    Returns:
+        dict: Keyword arguments for ``sqlalchemy.create_engine``.
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        # pragmas are applied per connection by sqlite_pragmas
+        return {}
+    return {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": True,
+    }
+
+
+def configure_engines(app):
+    """
+    Fill in the engine options of the app's database and its binds.
+
+    Call before ``db.init_app``, which creates the engines.
+
+    Args:
+        app (flask.Flask): The application, with ``SQLALCHEMY_DATABASE_URI``
+            (and any ``SQLALCHEMY_BINDS``) set.
+    """
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    options = engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **options,
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+    }
+    binds = app.config.get("SQLALCHEMY_BINDS", {})
+    for key, bind in binds.items():
+        bind = {"url": bind} if isinstance(bind, str) else bind
+        binds[key] = {**engine_options(bind["url"], app.config), **bind}
+
+
+def install_pragmas(app, engines):
+    """
+    Apply the SQLite pragmas to every new connection of the SQLite engines.
+
+    Args:
+        app (flask.Flask): The application, for the pragma settings.
+        engines (Iterable[sqlalchemy.engine.Engine]): The app's engines.
+    """
+    pragmas = (
+        f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+    )
+
+    def sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", sqlite_pragmas)
@@ -0,0 +1,403 @@
+"""
+Live change notifications for the QuiverStats backend.
+
+``GET /api/quivers/<id>/events`` is a Server-Sent Events stream of the
+quiver's committed changes: new and deleted scores, and created, renamed and
+deleted arrows. The write routes describe each change while the transaction is
+open and hand it to the in-process :class:`EventHub` once it has committed;
+the hub serializes every event once and appends the same bytes to the queue of
+each subscriber of that quiver, without touching the database.
+
+A subscriber that is waiting for events is a thread blocked on its own
+condition variable, woken only by a publish or by the heartbeat timer, so idle
+streams cost no CPU. Each subscriber's queue is bounded: one that falls too
+far behind is sent a ``reset`` event and disconnected, and should refetch what
+it shows and reconnect. The hub keeps the latest events of each quiver, so a
+client reconnecting with ``Last-Event-ID`` gets what it missed, or a ``reset``
+if those events are gone.
+
+The hub is per process: with several workers, a stream sees the writes
+handled by its own worker.
+"""
+
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from werkzeug.exceptions import ServiceUnavailable
+
+# Quivers whose recent events are kept for reconnecting clients
+MAX_BACKLOG_QUIVERS = 1024
+
+KEEPALIVE = b": keepalive\n\n"
+
+
+class TooManySubscribers(ServiceUnavailable):
+    """Raised when a stream is opened while the hub is at its subscriber limit."""
+
+
+class Subscription:
+    """
+    One open event stream: a bounded queue of encoded frames.
+
+    Attributes:
+        quiver_id (int): The quiver whose events are delivered.
+        maxsize (int): The most frames queued before the subscriber is dropped.
+        closed (bool): Set once no further frames will be queued.
+    """
+
+    def __init__(self, quiver_id, maxsize):
+        self.quiver_id = quiver_id
+        self.maxsize = maxsize
+        self.closed = False
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def push(self, frame, close=False):
+        """
+        Queue one frame, dropping the subscriber if its queue is full.
+
+        Args:
+            frame (bytes): The encoded event.
+            close (bool): Close the subscription after this frame.
+
+        Returns:
+            bool: False if the subscription is (now) closed.
+        """
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._frames) >= self.maxsize:
+                self._frames.clear()
+                self._frames.append(_frame(None, "reset", {"reason": "overflow"}))
+                close = True
+            else:
+                self._frames.append(frame)
+            self.closed = close
+            self._cond.notify()
+            return not close
+
+    def close(self):
+        """Stop the stream once the frames already queued are delivered."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def take(self, timeout):
+        """
+        Wait for frames and return everything queued.
+
+        Args:
+            timeout (float): Seconds to wait when the queue is empty.
+
+        Returns:
+            list[bytes]: The queued frames, oldest first; empty on timeout.
+        """
+        with self._cond:
+            if not self._frames and not self.closed:
+                self._cond.wait(timeout)
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+
+
+class EventHub:
+    """
+    In-process publish/subscribe of per-quiver change events.
+
+    Attributes:
+        queue_size (int): Frames a subscriber may fall behind by.
+        backlog (int): Recent events kept per quiver for reconnecting clients.
+        heartbeat (float): Seconds between keepalive comments on a quiet stream.
+        max_subscribers (int): The most streams open at once.
+        published (int): Events published since start.
+        overflows (int): Subscribers dropped for falling behind.
+    """
+
+    def __init__(self, queue_size=256, backlog=100, heartbeat=15.0, max_subscribers=1000):
+        self.queue_size = queue_size
+        self.backlog = backlog
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        """Set up the empty state of a freshly started hub."""
+        self.published = self.overflows = 0
+        self._subscribers = {}
+        self._count = 0
+        # per quiver: (recent (sequence, frame) pairs, last sequence no longer kept)
+        self._backlogs = OrderedDict()
+        # the last sequence of any quiver whose backlog was dropped entirely
+        self._forgotten = 0
+        self._sequence = itertools.count(1)
+        self._epoch = uuid.uuid4().hex[:8]
+
+    def init_app(self, app):
+        """
+        Configure the hub from the app.
+
+        Reads ``EVENTS_QUEUE_SIZE``, ``EVENTS_BACKLOG``, ``EVENTS_HEARTBEAT``
+        (seconds) and ``EVENTS_MAX_SUBSCRIBERS`` from the app config.
+
+        Args:
+            app (flask.Flask): The application.
+        """
+        self.queue_size = app.config.setdefault("EVENTS_QUEUE_SIZE", self.queue_size)
+        self.backlog = app.config.setdefault("EVENTS_BACKLOG", self.backlog)
+        self.heartbeat = app.config.setdefault("EVENTS_HEARTBEAT", self.heartbeat)
+        self.max_subscribers = app.config.setdefault(
+            "EVENTS_MAX_SUBSCRIBERS", self.max_subscribers
+        )
+        app.extensions["event_hub"] = self
+
+    def reset(self):
+        """
+        Close every stream, forget the kept events and reset the counters.
+
+        Event IDs handed out before the reset are answered with a ``reset``
+        event, as after a restart.
+        """
+        with self._lock:
+            subs = [sub for group in self._subscribers.values() for sub in group]
+            self._start()
+        for sub in subs:
+            sub.close()
+
+    def subscribe(self, quiver_id, last_event_id=None):
+        """
+        Open a subscription to a quiver's events.
+
+        Args:
+            quiver_id (int): The quiver to follow.
+            last_event_id (str | None): The ID of the last event the client
+                saw; the events after it are queued straight away, or a
+                ``reset`` event if they are no longer kept.
+
+        Returns:
+            Subscription: The new subscription.
+
+        Raises:
+            TooManySubscribers: If ``max_subscribers`` streams are already open.
+        """
+        sub = Subscription(quiver_id, self.queue_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers(
+                    "Too many event streams are open; try again later", retry_after=5
+                )
+            if last_event_id is not None:
+                self._replay(sub, last_event_id)
+            self._subscribers.setdefault(quiver_id, set()).add(sub)
+            self._count += 1
+        return sub
+
+    def unsubscribe(self, sub):
+        """
+        Close a subscription and stop delivering to it.
+
+        Args:
+            sub (Subscription): The subscription returned by :meth:`subscribe`.
+        """
+        sub.close()
+        with self._lock:
+            subs = self._subscribers.get(sub.quiver_id)
+            if subs is None or sub not in subs:
+                return
+            subs.discard(sub)
+            self._count -= 1
+            if not subs:
+                del self._subscribers[sub.quiver_id]
+
+    def publish(self, quiver_id, event, data):
+        """
+        Deliver one committed change to the quiver's subscribers.
+
+        A ``quiver_deleted`` event also ends every stream of the quiver.
+
+        Args:
+            quiver_id (int): The quiver that changed.
+            event (str): The event type.
+            data (dict): The JSON-serializable event payload.
+        """
+        final = event == "quiver_deleted"
+        with self._lock:
+            sequence = next(self._sequence)
+            frame = _frame(f"{self._epoch}-{sequence}", event, data)
+            self.published += 1
+            if final:
+                self._drop_backlog(quiver_id)
+            else:
+                self._remember(quiver_id, sequence, frame)
+            subs = tuple(self._subscribers.get(quiver_id, ()))
+        for sub in subs:
+            if not sub.push(frame, close=final) and not final:
+                with self._lock:
+                    self.overflows += 1
+                self.unsubscribe(sub)
+
+    def publish_all(self, events):
+        """
+        Publish several events in order.
+
+        Args:
+            events (Iterable[tuple]): ``(quiver_id, event, data)`` triples.
+        """
+        for quiver_id, event, data in events:
+            self.publish(quiver_id, event, data)
+
+    def stream(self, sub, timeout=None):
+        """
+        Yield a subscription's frames as the body of an event-stream response.
+
+        Quiet streams get a keepalive comment every ``heartbeat`` seconds,
+        which is also how a disconnected client is noticed. The subscription
+        is closed when the generator finishes or is closed.
+
+        Args:
+            sub (Subscription): The subscription to drain.
+            timeout (float | None): End the stream after this many seconds;
+                None keeps it open until the client goes away.
+
+        Yields:
+            bytes: Encoded Server-Sent Events.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            yield f"retry: {int(self.heartbeat * 1000)}\n\n".encode()
+            while True:
+                wait = self.heartbeat
+                if deadline is not None:
+                    wait = max(0.0, min(wait, deadline - time.monotonic()))
+                frames = sub.take(wait)
+                if frames:
+                    yield b"".join(frames)
+                if sub.closed or (deadline is not None and time.monotonic() >= deadline):
+                    return
+                if not frames:
+                    yield KEEPALIVE
+        finally:
+            self.unsubscribe(sub)
+
+    def info(self):
+        """
+        Report the number of open streams and the counters.
+
+        Returns:
+            dict: Open subscribers, quivers followed and event counters.
+        """
+        with self._lock:
+            return {
+                "subscribers": self._count,
+                "quivers": len(self._subscribers),
+                "published": self.published,
+                "overflows": self.overflows,
+            }
+
+    def _remember(self, quiver_id, sequence, frame):
+        """Add a frame to a quiver's backlog (lock held)."""
+        entry = self._backlogs.get(quiver_id)
+        if entry is None:
+            entry = self._backlogs[quiver_id] = [deque(), 0]
+            while len(self._backlogs) > MAX_BACKLOG_QUIVERS:
+                self._drop_backlog(next(iter(self._backlogs)))
+        else:
+            self._backlogs.move_to_end(quiver_id)
+        recent = entry[0]
+        recent.append((sequence, frame))
+        while len(recent) > self.backlog:
+            entry[1] = recent.popleft()[0]
+
+    def _drop_backlog(self, quiver_id):
+        """Forget a quiver's backlog entirely (lock held)."""
+        entry = self._backlogs.pop(quiver_id, None)
+        if entry is not None:
+            last = entry[0][-1][0] if entry[0] else entry[1]
+            self._forgotten = max(self._forgotten, last)
+
+    def _replay(self, sub, last_event_id):
+        """Queue the events a reconnecting client missed (lock held)."""
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self._epoch or not sequence.isdigit():
+            # the events were published by another process, or before a restart
+            sub.push(_frame(None, "reset", {"reason": "unknown"}))
+            return
+        seen = int(sequence)
+        entry = self._backlogs.get(sub.quiver_id)
+        missed = entry[0] if entry else ()
+        floor = entry[1] if entry else self._forgotten
+        if seen < floor:
+            sub.push(_frame(None, "reset", {"reason": "expired"}))
+            return
+        for number, frame in missed:
+            if number > seen:
+                sub.push(frame)
+
+
+def _frame(event_id, event, data):
+    """Encode one Server-Sent Event."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event}", f"data: {json.dumps(data, separators=(',', ':'))}"]
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def scores_created(arrows, rows, ids):
+    """
+    Describe newly inserted scores as ``scores_created`` events, one per arrow.
+
+    Call before committing, while the arrows' attributes are still loaded.
+
+    Args:
+        arrows (dict[int, Arrow]): The target arrows, keyed by ID.
+        rows (list[dict]): The inserted scores, as passed to
+            :func:`backend.ingest.bulk_insert_scores`.
+        ids (list[int]): The new score IDs, in the order of ``rows``.
+
+    Returns:
+        list[tuple]: ``(quiver_id, event, data)`` triples for
+        :meth:`EventHub.publish_all`.
+    """
+    by_arrow = {}
+    for score_id, row in zip(ids, rows):
+        by_arrow.setdefault(row["arrow_id"], []).append(
+            {
+                "id": score_id,
+                "score": float(row["score"]),
+                "x": row["x"],
+                "y": row["y"],
+                "shot_at": row["shot_at"].isoformat() if row["shot_at"] else None,
+            }
+        )
+    return [
+        (
+            arrows[arrow_id].quiver_id,
+            "scores_created",
+            {"arrow_id": arrow_id, "scores": scores},
+        )
+        for arrow_id, scores in by_arrow.items()
+    ]
+
+
+def arrow_event(event, arrow):
+    """
+    Describe a created, renamed or deleted arrow.
+
+    Args:
+        event (str): ``arrow_created``, ``arrow_updated`` or ``arrow_deleted``.
+        arrow (Arrow): The arrow, with its attributes loaded.
+
+    Returns:
+        tuple: A ``(quiver_id, event, data)`` triple for :meth:`EventHub.publish`.
+    """
+    return (
+        arrow.quiver_id,
+        event,
+        {"id": arrow.id, "name": arrow.name, "quiver_id": arrow.quiver_id},
+    )
+
+
+event_hub = EventHub()
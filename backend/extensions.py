@@ -1,9 +1,12 @@
 """
 This module initializes shared extensions for the Flask application.
 
-It includes the SQLAlchemy database instance.
+It includes the SQLAlchemy database instance, whose sessions can route reads
+to a replica (see ``backend.replica``).
 """
 
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from backend.replica import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
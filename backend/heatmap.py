@@ -0,0 +1,239 @@
+"""
+Impact heatmaps for the QuiverStats backend.
+
+Every arrow with recorded impacts owns one ArrowHeatmap row: a
+``GRID_SIZE`` x ``GRID_SIZE`` histogram of its impact positions over the
+square ``[-EXTENT, EXTENT)`` around the target centre. The helpers in this
+module fold new and deleted impacts into that grid inside the caller's
+transaction, the same way ``backend.stats`` maintains ArrowStats, so serving a
+heatmap costs one row read per arrow however many shots it holds. A quiver's
+heatmap is the sum of its arrows' grids.
+
+Cells are stored row-major, rows running along y and columns along x, as
+little-endian uint32 counts.
+"""
+
+import base64
+import itertools
+
+import numpy as np
+from sqlalchemy import select
+
+from backend.extensions import db
+from backend.models import Arrow, ArrowHeatmap, ArrowScore
+
+# Cells along each axis of the grid
+GRID_SIZE = 64
+# Half the width of the covered square: the 122cm face, in target units
+EXTENT = 61.0
+
+CELLS = GRID_SIZE * GRID_SIZE
+DTYPE = np.dtype("<u4")
+
+
+def bin_impacts(x, y):
+    """
+    Count impacts per grid cell.
+
+    Args:
+        x (array-like): Horizontal offsets from the target centre.
+        y (array-like): Vertical offsets from the target centre.
+
+    Returns:
+        tuple[numpy.ndarray, int]: The flat per-cell counts, ``CELLS`` long,
+        and the number of impacts outside the grid.
+    """
+    cells, inside = _cells(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    counts = np.bincount(cells[inside], minlength=CELLS)
+    return counts, int(inside.size - np.count_nonzero(inside))
+
+
+def _cells(x, y):
+    """Return the flat cell index of each impact and a mask of those on the grid."""
+    scale = GRID_SIZE / (2 * EXTENT)
+    col = np.floor((x + EXTENT) * scale)
+    row = np.floor((y + EXTENT) * scale)
+    inside = (col >= 0) & (col < GRID_SIZE) & (row >= 0) & (row < GRID_SIZE)
+    cells = np.where(inside, row * GRID_SIZE + col, 0).astype(np.int64)
+    return cells, inside
+
+
+def _locked_heatmap(arrow):
+    """
+    Fetch an arrow's heatmap row for update, creating an empty one if missing.
+
+    Args:
+        arrow (Arrow): The arrow whose heatmap is needed.
+
+    Returns:
+        ArrowHeatmap: The heatmap row, locked for the current transaction.
+    """
+    heatmap = db.session.get(ArrowHeatmap, arrow.id, with_for_update=True)
+    if heatmap is None:
+        heatmap = ArrowHeatmap(
+            arrow_id=arrow.id, counts=bytes(CELLS * DTYPE.itemsize), outside=0
+        )
+        db.session.add(heatmap)
+    return heatmap
+
+
+def _apply(arrow, x, y, sign):
+    """Add (sign 1) or remove (sign -1) impacts from an arrow's heatmap."""
+    x = [value for value in x if value is not None]
+    y = [value for value in y if value is not None]
+    if not x:
+        return None
+    counts, outside = bin_impacts(x, y)
+    heatmap = _locked_heatmap(arrow)
+    grid = np.frombuffer(heatmap.counts, dtype=DTYPE).astype(np.int64)
+    grid += sign * counts
+    heatmap.counts = np.maximum(grid, 0).astype(DTYPE).tobytes()
+    heatmap.outside = max(0, (heatmap.outside or 0) + sign * outside)
+    return heatmap
+
+
+def record_impacts(arrow, x, y):
+    """
+    Fold newly inserted impacts into an arrow's heatmap.
+
+    Scores without coordinates (None) are skipped.
+
+    Args:
+        arrow (Arrow): The arrow the scores were added to.
+        x (Iterable[float | None]): The horizontal offsets of the new scores.
+        y (Iterable[float | None]): The vertical offsets of the new scores.
+
+    Returns:
+        ArrowHeatmap | None: The updated heatmap (not yet committed), or None
+        if none of the scores had coordinates.
+    """
+    return _apply(arrow, x, y, 1)
+
+
+def forget_impacts(arrow, x, y):
+    """
+    Remove deleted impacts from an arrow's heatmap.
+
+    Args:
+        arrow (Arrow): The arrow the scores were removed from.
+        x (Iterable[float | None]): The horizontal offsets of the deleted scores.
+        y (Iterable[float | None]): The vertical offsets of the deleted scores.
+
+    Returns:
+        ArrowHeatmap | None: The updated heatmap (not yet committed), or None
+        if none of the scores had coordinates.
+    """
+    return _apply(arrow, x, y, -1)
+
+
+def build_heatmaps(arrow_ids):
+    """
+    Compute heatmap rows from scratch for arrows whose IDs span a range.
+
+    Reads every impact of those arrows in one select and bins them all in one
+    vectorized pass; used after bulk loads that bypass :func:`record_impacts`.
+
+    Args:
+        arrow_ids (Iterable[int]): The arrows to build heatmaps for.
+
+    Returns:
+        list[dict]: One arrow_heatmap row per arrow that has impacts.
+    """
+    ids = np.unique(np.fromiter(arrow_ids, dtype=np.int64))
+    if not ids.size:
+        return []
+    result = db.session.execute(
+        select(ArrowScore.arrow_id, ArrowScore.x, ArrowScore.y).where(
+            ArrowScore.arrow_id.between(int(ids[0]), int(ids[-1])),
+            ArrowScore.x.is_not(None),
+        )
+    )
+    flat = np.fromiter(itertools.chain.from_iterable(result), dtype=float)
+    impacts = flat.reshape(-1, 3)
+    owners = impacts[:, 0].astype(np.int64)
+    # the ID range may also cover arrows that were not asked for
+    position = np.minimum(np.searchsorted(ids, owners), ids.size - 1)
+    known = ids[position] == owners
+    position, impacts = position[known], impacts[known]
+    cells, inside = _cells(impacts[:, 1], impacts[:, 2])
+    grids = np.bincount(
+        position[inside] * CELLS + cells[inside], minlength=ids.size * CELLS
+    ).reshape(ids.size, CELLS)
+    outside = np.bincount(position[~inside], minlength=ids.size)
+    present = np.bincount(position, minlength=ids.size)
+    return [
+        {
+            "arrow_id": int(arrow_id),
+            "counts": grids[i].astype(DTYPE).tobytes(),
+            "outside": int(outside[i]),
+        }
+        for i, arrow_id in enumerate(ids)
+        if present[i]
+    ]
+
+
+def arrow_heatmap(arrow_id):
+    """
+    Read an arrow's heatmap.
+
+    Args:
+        arrow_id (int): The ID of the arrow.
+
+    Returns:
+        tuple[numpy.ndarray, int]: The ``(GRID_SIZE, GRID_SIZE)`` grid of
+        counts and the number of impacts outside it.
+    """
+    heatmap = db.session.get(ArrowHeatmap, arrow_id)
+    if heatmap is None:
+        return np.zeros((GRID_SIZE, GRID_SIZE), dtype=DTYPE), 0
+    grid = np.frombuffer(heatmap.counts, dtype=DTYPE).reshape(GRID_SIZE, GRID_SIZE)
+    return grid, heatmap.outside
+
+
+def quiver_heatmap(quiver_id):
+    """
+    Sum the heatmaps of every arrow in a quiver.
+
+    Args:
+        quiver_id (int): The ID of the quiver.
+
+    Returns:
+        tuple[numpy.ndarray, int]: The ``(GRID_SIZE, GRID_SIZE)`` grid of
+        counts and the number of impacts outside it.
+    """
+    rows = db.session.execute(
+        select(ArrowHeatmap.counts, ArrowHeatmap.outside)
+        .join(Arrow, Arrow.id == ArrowHeatmap.arrow_id)
+        .where(Arrow.quiver_id == quiver_id)
+    ).all()
+    grid = np.zeros(CELLS, dtype=np.uint64)
+    for counts, _ in rows:
+        grid += np.frombuffer(counts, dtype=DTYPE)
+    outside = sum(row.outside for row in rows)
+    return grid.astype(DTYPE).reshape(GRID_SIZE, GRID_SIZE), outside
+
+
+def heatmap_to_dict(grid, outside):
+    """
+    Serialize a heatmap into the shape returned by the heatmap endpoints.
+
+    The counts are base64-encoded little-endian uint32 values, row-major, so
+    the payload size depends on the grid resolution only.
+
+    Args:
+        grid (numpy.ndarray): The ``(GRID_SIZE, GRID_SIZE)`` grid of counts.
+        outside (int): Impacts that fell outside the grid.
+
+    Returns:
+        dict: The grid geometry, totals and encoded counts.
+    """
+    return {
+        "size": GRID_SIZE,
+        "extent": EXTENT,
+        "dtype": "<u4",
+        "count": int(grid.sum()),
+        "outside": outside,
+        "counts": base64.b64encode(
+            np.ascontiguousarray(grid, dtype=DTYPE)
+        ).decode("ascii"),
+    }
@@ -0,0 +1,149 @@
+"""
+Bulk score ingestion for the QuiverStats backend.
+
+Scores arriving in batches are written with a single executemany-style Core
+INSERT instead of one ORM object and one flush per shot, and the affected
+arrows' aggregates are updated once per arrow rather than once per score.
+"""
+
+import math
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from backend.extensions import db
+from backend.models import ArrowScore, utcnow
+from backend.stats import record_scores
+
+
+def is_score(value):
+    """
+    Check whether a value from a request body is an acceptable score.
+
+    Args:
+        value: The decoded JSON value.
+
+    Returns:
+        bool: True if the value is a finite (non-boolean) number.
+    """
+    return (
+        not isinstance(value, bool)
+        and isinstance(value, (int, float))
+        and math.isfinite(value)
+    )
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp from a request body into naive UTC.
+
+    Timestamps without an offset are taken to be UTC already.
+
+    Args:
+        value (str | None): The decoded value.
+
+    Returns:
+        datetime.datetime | None: The timestamp, or None if none was given.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 string.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def shot_error(score, x=None, y=None, shot_at=None):
+    """
+    Explain why a shot from a request body cannot be stored.
+
+    Args:
+        score: The decoded score value.
+        x: The decoded horizontal offset, or None.
+        y: The decoded vertical offset, or None.
+        shot_at: The decoded ISO 8601 timestamp of the shot, or None.
+
+    Returns:
+        str | None: A message for the client, or None if the shot is valid.
+    """
+    if score is None:
+        return "Score is required"
+    if not is_score(score):
+        return "Score must be a number"
+    if (x is None) != (y is None):
+        return "x and y must be given together"
+    if x is not None and not (is_score(x) and is_score(y)):
+        return "x and y must be numbers"
+    try:
+        parse_timestamp(shot_at)
+    except ValueError:
+        return "shot_at must be an ISO 8601 timestamp"
+    return None
+
+
+def insert_returning_ids(model, rows):
+    """
+    Insert many rows in one statement and return their new IDs in order.
+
+    Args:
+        model (type): The mapped class with an integer ``id`` primary key.
+        rows (list[dict]): The column values of the rows.
+
+    Returns:
+        list[int]: The IDs of the new rows, in the order of ``rows``.
+    """
+    if db.session.get_bind().dialect.name == "sqlite":
+        # SQLite cannot order RETURNING rows, so SQLAlchemy would fall back to
+        # one INSERT per row; rowids are handed out in VALUES order inside the
+        # write transaction, so sorting the ids restores the parameter order
+        result = db.session.execute(insert(model).returning(model.id), rows)
+        return sorted(result.scalars())
+    result = db.session.execute(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    )
+    return list(result.scalars())
+
+
+def bulk_insert_scores(arrows, rows):
+    """
+    Insert many scores in one statement and fold them into the aggregates.
+
+    The caller is responsible for validating the rows and for committing; the
+    inserts and aggregate updates join the current transaction.
+
+    Args:
+        arrows (dict[int, Arrow]): The target arrows, keyed by ID.
+        rows (list[dict]): The scores to insert, each with 'arrow_id', 'score',
+            'x', 'y' and 'shot_at' (the coordinates may be None; a missing
+            timestamp is filled in with the current time).
+
+    Returns:
+        list[int]: The IDs of the new scores, in the order of ``rows``.
+    """
+    if not rows:
+        return []
+    # imported here so that loading the app does not load NumPy
+    from backend.heatmap import record_impacts
+
+    now = utcnow()
+    for row in rows:
+        if row.get("shot_at") is None:
+            row["shot_at"] = now
+    ids = insert_returning_ids(ArrowScore, rows)
+
+    rows_by_arrow = {}
+    for row in rows:
+        rows_by_arrow.setdefault(row["arrow_id"], []).append(row)
+    for arrow_id, arrow_rows in rows_by_arrow.items():
+        record_scores(arrows[arrow_id], [row["score"] for row in arrow_rows])
+        record_impacts(
+            arrows[arrow_id],
+            [row["x"] for row in arrow_rows],
+            [row["y"] for row in arrow_rows],
+        )
+    return ids
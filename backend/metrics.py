@@ -0,0 +1,379 @@
+"""
+Request and database instrumentation for the QuiverStats backend.
+
+Flask request hooks time every request, and SQLAlchemy cursor listeners count
+the statements each request sends and the time spent waiting on them. The
+figures are kept per route as cumulative histograms and rendered in the
+Prometheus text exposition format by :meth:`Metrics.render`.
+
+When ``SLOW_REQUEST_THRESHOLD_MS`` is set, any request slower than that is
+logged together with the SQL statements it issued and their timings.
+"""
+
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    A cumulative histogram with labelled series, as exposed to Prometheus.
+
+    Attributes:
+        name (str): The metric name.
+        help (str): The metric description.
+        buckets (tuple[float]): The bucket upper bounds.
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        """
+        Record one observation (the caller holds the metrics lock).
+
+        Args:
+            labels (tuple[tuple[str, str]]): The series labels.
+            value (float): The observed value.
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        """
+        Render the histogram in the Prometheus text format.
+
+        Returns:
+            list[str]: The exposition lines.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f"{self.name}_bucket{_labels(labels, le=_number(bound))} {bucket_count}"
+                )
+            lines.append(f'{self.name}_bucket{_labels(labels, le="+Inf")} {count}')
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+def _number(value):
+    """Format a sample value the way Prometheus expects."""
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels, **extra):
+    """Render a label set, escaping values as the text format requires."""
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(
+            key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for key, value in pairs
+    )
+    return "{" + body + "}"
+
+
+class Metrics:
+    """
+    Per-route latency, query-count and database-time histograms.
+
+    Attributes:
+        slow_threshold (float | None): Seconds after which a request is logged
+            with its SQL statements, or None to disable the slow-request log.
+    """
+
+    def __init__(self):
+        self.slow_threshold = None
+        self._lock = threading.Lock()
+        self.latency = Histogram(
+            "quiverstats_request_duration_seconds",
+            "Time spent handling a request.",
+            LATENCY_BUCKETS,
+        )
+        self.queries = Histogram(
+            "quiverstats_request_db_queries",
+            "SQL statements issued per request.",
+            QUERY_BUCKETS,
+        )
+        self.db_time = Histogram(
+            "quiverstats_request_db_seconds",
+            "Time spent waiting on the database per request.",
+            LATENCY_BUCKETS,
+        )
+        self._collectors = []
+
+    def init_app(self, app):
+        """
+        Install the request hooks and the SQLAlchemy cursor listeners.
+
+        Reads ``SLOW_REQUEST_THRESHOLD_MS`` from the app config.
+
+        Args:
+            app (flask.Flask): The application.
+        """
+        threshold = app.config.setdefault("SLOW_REQUEST_THRESHOLD_MS", None)
+        self.slow_threshold = threshold / 1000.0 if threshold is not None else None
+        app.extensions["metrics"] = self
+        # collectors report on the extensions of the latest app
+        self._collectors = []
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    def add_collector(self, collect):
+        """
+        Register extra samples to include in the exposition.
+
+        Args:
+            collect (Callable[[], list[str]]): Returns exposition lines.
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition document.
+        """
+        with self._lock:
+            lines = self.latency.render() + self.queries.render() + self.db_time.render()
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Forget every observation."""
+        with self._lock:
+            for histogram in (self.latency, self.queries, self.db_time):
+                histogram._series.clear()
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_time = 0.0
+        g.metrics_statements = [] if self.slow_threshold is not None else None
+
+    def _after_request(self, response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        labels = (
+            ("method", request.method),
+            ("route", route),
+            ("status", str(response.status_code)),
+        )
+        with self._lock:
+            self.latency.observe(labels, elapsed)
+            self.queries.observe(labels[:2], g.metrics_queries)
+            self.db_time.observe(labels[:2], g.metrics_db_time)
+
+        if self.slow_threshold is not None and elapsed > self.slow_threshold:
+            statements = "\n".join(
+                f"  {duration * 1000:8.2f} ms  {statement}"
+                for statement, duration in g.metrics_statements
+            )
+            current_app.logger.warning(
+                "Slow request %s %s took %.1f ms, %d queries (%.1f ms in the database)\n%s",
+                request.method,
+                request.full_path.rstrip("?"),
+                elapsed * 1000,
+                g.metrics_queries,
+                g.metrics_db_time * 1000,
+                statements,
+            )
+        return response
+
+
+metrics = Metrics()
+
+
+def cache_collector(cache):
+    """
+    Expose the counters of a :class:`backend.cache.StatsCache` as samples.
+
+    Args:
+        cache (StatsCache): The cache to report on.
+
+    Returns:
+        Callable[[], list[str]]: A collector for :meth:`Metrics.add_collector`.
+    """
+
+    def collect():
+        info = cache.info()
+        lines = [
+            "# HELP quiverstats_stats_cache_entries Entries held by the stats cache.",
+            "# TYPE quiverstats_stats_cache_entries gauge",
+            f"quiverstats_stats_cache_entries {info['size']}",
+        ]
+        for counter in ("hits", "misses", "evictions", "expirations", "invalidations"):
+            name = f"quiverstats_stats_cache_{counter}_total"
+            lines += [
+                f"# HELP {name} Stats cache {counter} since start.",
+                f"# TYPE {name} counter",
+                f"{name} {info[counter]}",
+            ]
+        return lines
+
+    return collect
+
+
+def write_buffer_collector(buffer):
+    """
+    Expose the state of a :class:`backend.writebehind.WriteBuffer` as samples.
+
+    Args:
+        buffer (WriteBuffer): The buffer to report on.
+
+    Returns:
+        Callable[[], list[str]]: A collector for :meth:`Metrics.add_collector`.
+    """
+
+    def collect():
+        info = buffer.info()
+        lines = [
+            "# HELP quiverstats_write_buffer_pending Buffered scores not yet committed.",
+            "# TYPE quiverstats_write_buffer_pending gauge",
+            f"quiverstats_write_buffer_pending {info['pending']}",
+        ]
+        for counter in ("flushed", "batches", "dropped", "retries"):
+            name = f"quiverstats_write_buffer_{counter}_total"
+            lines += [
+                f"# HELP {name} Write buffer {counter} since start.",
+                f"# TYPE {name} counter",
+                f"{name} {info[counter]}",
+            ]
+        return lines
+
+    return collect
+
+
+def event_hub_collector(hub):
+    """
+    Expose the state of a :class:`backend.events.EventHub` as samples.
+
+    Args:
+        hub (EventHub): The hub to report on.
+
+    Returns:
+        Callable[[], list[str]]: A collector for :meth:`Metrics.add_collector`.
+    """
+
+    def collect():
+        info = hub.info()
+        lines = [
+            "# HELP quiverstats_event_subscribers Open event streams.",
+            "# TYPE quiverstats_event_subscribers gauge",
+            f"quiverstats_event_subscribers {info['subscribers']}",
+        ]
+        for counter in ("published", "overflows"):
+            name = f"quiverstats_events_{counter}_total"
+            lines += [
+                f"# HELP {name} Event hub {counter} since start.",
+                f"# TYPE {name} counter",
+                f"{name} {info[counter]}",
+            ]
+        return lines
+
+    return collect
+
+
+def replica_collector(router):
+    """
+    Expose the routing counters of a :class:`backend.replica.ReplicaRouter`.
+
+    Args:
+        router (ReplicaRouter): The router to report on.
+
+    Returns:
+        Callable[[], list[str]]: A collector for :meth:`Metrics.add_collector`.
+    """
+
+    def collect():
+        info = router.info()
+        lines = [
+            "# HELP quiverstats_replica_available Whether reads may use the replica.",
+            "# TYPE quiverstats_replica_available gauge",
+            f"quiverstats_replica_available {int(info['enabled'] and info['available'])}",
+        ]
+        for counter, name, description in (
+            ("replica_reads", "replica_reads", "Read requests routed to the replica"),
+            ("primary_reads", "primary_reads", "Read requests kept on the primary"),
+            ("fallbacks", "replica_fallbacks", "Reads retried on the primary"),
+        ):
+            name = f"quiverstats_{name}_total"
+            lines += [
+                f"# HELP {name} {description}.",
+                f"# TYPE {name} counter",
+                f"{name} {info[counter]}",
+            ]
+        return lines
+
+    return collect
+
+
+def startup_collector(seconds):
+    """
+    Expose how long the application took to start.
+
+    Args:
+        seconds (float): The start-up time measured by ``create_app``.
+
+    Returns:
+        Callable[[], list[str]]: A collector for :meth:`Metrics.add_collector`.
+    """
+
+    def collect():
+        return [
+            "# HELP quiverstats_startup_seconds Time spent importing and creating the app.",
+            "# TYPE quiverstats_startup_seconds gauge",
+            f"quiverstats_startup_seconds {_number(seconds)}",
+        ]
+
+    return collect
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Note when a statement starts, for the request it belongs to."""
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Add a finished statement to the current request's totals."""
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    if not has_request_context() or "metrics_start" not in g:
+        return
+    g.metrics_queries += 1
+    g.metrics_db_time += duration
+    if g.metrics_statements is not None:
+        g.metrics_statements.append((statement, duration))
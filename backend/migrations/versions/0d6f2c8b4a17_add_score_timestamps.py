@@ -0,0 +1,29 @@
+"""Add shot_at timestamps to arrow_score
+
+Revision ID: 0d6f2c8b4a17
+Revises: e5b9a7c31f64
+Create Date: 2025-05-25 16:02:41.583920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d6f2c8b4a17'
+down_revision = 'e5b9a7c31f64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing scores keep a NULL shot_at: when they were shot is unknown
+    with op.batch_alter_table('arrow_score', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shot_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_arrow_score_arrow_id_shot_at', ['arrow_id', 'shot_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('arrow_score', schema=None) as batch_op:
+        batch_op.drop_index('ix_arrow_score_arrow_id_shot_at')
+        batch_op.drop_column('shot_at')
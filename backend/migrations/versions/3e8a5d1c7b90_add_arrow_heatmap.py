@@ -0,0 +1,68 @@
+"""Add the arrow_heatmap impact grid
+
+Revision ID: 3e8a5d1c7b90
+Revises: 7c1e4f9a2d53
+Create Date: 2025-05-28 14:06:37.418520
+
+"""
+from array import array
+import math
+import sys
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8a5d1c7b90'
+down_revision = '7c1e4f9a2d53'
+branch_labels = None
+depends_on = None
+
+# Grid geometry at the time of this revision (see backend.heatmap)
+GRID_SIZE = 64
+EXTENT = 61.0
+
+
+def upgrade():
+    arrow_heatmap = op.create_table('arrow_heatmap',
+    sa.Column('arrow_id', sa.Integer(), nullable=False),
+    sa.Column('counts', sa.LargeBinary(), nullable=False),
+    sa.Column('outside', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['arrow_id'], ['arrow.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('arrow_id')
+    )
+
+    # Backfill one grid per arrow that already has impact coordinates.
+    bind = op.get_bind()
+    scale = GRID_SIZE / (2 * EXTENT)
+    grids, outside = {}, {}
+    for row in bind.execute(sa.text(
+        "SELECT arrow_id, x, y FROM arrow_score WHERE x IS NOT NULL"
+    )):
+        grid = grids.get(row.arrow_id)
+        if grid is None:
+            grid = grids[row.arrow_id] = array('I', bytes(4 * GRID_SIZE * GRID_SIZE))
+            outside[row.arrow_id] = 0
+        col = math.floor((row.x + EXTENT) * scale)
+        cell_row = math.floor((row.y + EXTENT) * scale)
+        if 0 <= col < GRID_SIZE and 0 <= cell_row < GRID_SIZE:
+            grid[cell_row * GRID_SIZE + col] += 1
+        else:
+            outside[row.arrow_id] += 1
+
+    rows = []
+    for arrow_id, grid in grids.items():
+        if sys.byteorder != 'little':
+            grid.byteswap()
+        rows.append({
+            'arrow_id': arrow_id,
+            'counts': grid.tobytes(),
+            'outside': outside[arrow_id],
+        })
+    if rows:
+        op.bulk_insert(arrow_heatmap, rows)
+
+
+def downgrade():
+    op.drop_table('arrow_heatmap')
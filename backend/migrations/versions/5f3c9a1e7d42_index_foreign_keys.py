@@ -0,0 +1,26 @@
+"""Index arrow.quiver_id and arrow_score (arrow_id, id)
+
+Revision ID: 5f3c9a1e7d42
+Revises: ddbe3e00a5c1
+Create Date: 2025-05-21 10:03:17.538120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3c9a1e7d42'
+down_revision = 'ddbe3e00a5c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_arrow_quiver_id', 'arrow', ['quiver_id'], unique=False)
+    op.create_index('ix_arrow_score_arrow_id_id', 'arrow_score', ['arrow_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_arrow_score_arrow_id_id', table_name='arrow_score')
+    op.drop_index('ix_arrow_quiver_id', table_name='arrow')
@@ -0,0 +1,40 @@
+"""Add the arrow_score_daily rollup and its watermark
+
+Revision ID: 7c1e4f9a2d53
+Revises: 0d6f2c8b4a17
+Create Date: 2025-05-27 10:48:15.702244
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4f9a2d53'
+down_revision = '0d6f2c8b4a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('arrow_score_daily',
+    sa.Column('arrow_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('total_sq', sa.Float(), nullable=False),
+    sa.Column('min_score', sa.Float(), nullable=False),
+    sa.Column('max_score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['arrow_id'], ['arrow.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('arrow_id', 'day')
+    )
+    op.create_table('rollup_watermark',
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('last_score_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermark')
+    op.drop_table('arrow_score_daily')
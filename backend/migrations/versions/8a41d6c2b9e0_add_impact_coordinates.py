@@ -0,0 +1,28 @@
+"""Add impact coordinates to arrow_score
+
+Revision ID: 8a41d6c2b9e0
+Revises: 5f3c9a1e7d42
+Create Date: 2025-05-22 14:41:09.120377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a41d6c2b9e0'
+down_revision = '5f3c9a1e7d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('arrow_score', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('x', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('y', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('arrow_score', schema=None) as batch_op:
+        batch_op.drop_column('y')
+        batch_op.drop_column('x')
@@ -0,0 +1,28 @@
+"""Add the pending upper bound to the rollup watermark
+
+Revision ID: 9b2f6e4d1a38
+Revises: 3e8a5d1c7b90
+Create Date: 2025-06-30 09:14:27.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2f6e4d1a38'
+down_revision = '3e8a5d1c7b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('rollup_watermark', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pending_score_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('pending_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('rollup_watermark', schema=None) as batch_op:
+        batch_op.drop_column('pending_at')
+        batch_op.drop_column('pending_score_id')
@@ -0,0 +1,32 @@
+"""Add version counters to quiver and arrow
+
+Revision ID: c47e2b8d1f05
+Revises: 8a41d6c2b9e0
+Create Date: 2025-05-23 11:26:52.904418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e2b8d1f05'
+down_revision = '8a41d6c2b9e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quiver', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('arrow', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('arrow', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('quiver', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,67 @@
+"""Add arrow_stats aggregate table
+
+Revision ID: ddbe3e00a5c1
+Revises: 2b87e3802943
+Create Date: 2025-05-20 09:12:44.215903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ddbe3e00a5c1'
+down_revision = '2b87e3802943'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    arrow_stats = op.create_table('arrow_stats',
+    sa.Column('arrow_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('total_sq', sa.Float(), nullable=False),
+    sa.Column('min_score', sa.Float(), nullable=True),
+    sa.Column('max_score', sa.Float(), nullable=True),
+    sa.Column('histogram', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['arrow_id'], ['arrow.id'], ),
+    sa.PrimaryKeyConstraint('arrow_id')
+    )
+
+    # Backfill one aggregate row per existing arrow from its scores.
+    bind = op.get_bind()
+    totals = {
+        row.arrow_id: row
+        for row in bind.execute(sa.text(
+            "SELECT arrow_id, COUNT(*) AS n, SUM(score) AS total, "
+            "SUM(score * score) AS total_sq, MIN(score) AS low, MAX(score) AS high "
+            "FROM arrow_score GROUP BY arrow_id"
+        ))
+    }
+    # scores are never negative, so truncating to an integer is the ring
+    histograms = {}
+    for row in bind.execute(sa.text(
+        "SELECT arrow_id, CAST(score AS INTEGER) AS ring, COUNT(*) AS n "
+        "FROM arrow_score GROUP BY arrow_id, CAST(score AS INTEGER)"
+    )):
+        histograms.setdefault(row.arrow_id, {})[str(int(row.ring))] = row.n
+
+    rows = []
+    for (arrow_id,) in bind.execute(sa.text("SELECT id FROM arrow")):
+        agg = totals.get(arrow_id)
+        rows.append({
+            'arrow_id': arrow_id,
+            'count': agg.n if agg else 0,
+            'total': float(agg.total) if agg else 0.0,
+            'total_sq': float(agg.total_sq) if agg else 0.0,
+            'min_score': float(agg.low) if agg else None,
+            'max_score': float(agg.high) if agg else None,
+            'histogram': histograms.get(arrow_id, {}),
+        })
+    if rows:
+        op.bulk_insert(arrow_stats, rows)
+
+
+def downgrade():
+    op.drop_table('arrow_stats')
@@ -0,0 +1,44 @@
+"""Cascade deletes along the quiver, arrow and score foreign keys
+
+Revision ID: e5b9a7c31f64
+Revises: c47e2b8d1f05
+Create Date: 2025-05-24 09:14:08.311627
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9a7c31f64'
+down_revision = 'c47e2b8d1f05'
+branch_labels = None
+depends_on = None
+
+# The foreign keys were created unnamed. PostgreSQL names them
+# <table>_<column>_fkey; batch mode on SQLite names the reflected keys with
+# the same convention, so the constraints can be addressed the same way.
+naming_convention = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+foreign_keys = [
+    ('arrow', 'quiver_id', 'quiver'),
+    ('arrow_score', 'arrow_id', 'arrow'),
+    ('arrow_stats', 'arrow_id', 'arrow'),
+]
+
+
+def _replace_foreign_key(table, column, referent, ondelete):
+    name = f'{table}_{column}_fkey'
+    with op.batch_alter_table(table, schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(name, referent, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    for table, column, referent in foreign_keys:
+        _replace_foreign_key(table, column, referent, 'CASCADE')
+
+
+def downgrade():
+    for table, column, referent in reversed(foreign_keys):
+        _replace_foreign_key(table, column, referent, None)
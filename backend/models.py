@@ -1,12 +1,27 @@
 """
 This module defines the database models for the QuiverStats backend.
 
-It includes models for Quiver, Arrow, and ArrowScore, along with their relationships.
+It includes models for Quiver, Arrow, and ArrowScore, along with their relationships,
+the ArrowStats aggregate and ArrowHeatmap grid that are kept in step with each
+arrow's scores, and the DailyRollup table that the ``flask rollup`` command
+maintains.
 """
 
+from datetime import datetime, timezone
+
 from backend.extensions import db
 
 
+def utcnow():
+    """
+    Return the current time as a naive UTC datetime, as stored in the database.
+
+    Returns:
+        datetime.datetime: The current UTC time without tzinfo.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Quiver(db.Model):
     """
     Represents a quiver, which is a collection of arrows.
@@ -14,13 +29,22 @@ class Quiver(db.Model):
     Attributes:
         id (int): The primary key of the quiver.
         name (str): The name of the quiver.
+        created_at (datetime): When the quiver was created (UTC), if known.
+        version (int): Bumped whenever the quiver, its arrows or their scores change.
         arrows (list[Arrow]): The list of arrows associated with the quiver.
     """
 
     __tablename__ = "quiver"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.Text, nullable=False)
-    arrows = db.relationship("Arrow", back_populates="quiver")
+    created_at = db.Column(db.DateTime, nullable=True, default=utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    arrows = db.relationship(
+        "Arrow",
+        back_populates="quiver",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class Arrow(db.Model):
@@ -31,16 +55,36 @@ class Arrow(db.Model):
         id (int): The primary key of the arrow.
         quiver_id (int): The foreign key referencing the associated quiver.
         name (str): The name of the arrow.
+        version (int): Bumped whenever the arrow or its scores change.
         quiver (Quiver): The quiver to which the arrow belongs.
         scores (list[ArrowScore]): The list of scores associated with the arrow.
+        stats (ArrowStats): The running aggregate over the arrow's scores.
     """
 
     __tablename__ = "arrow"
     id = db.Column(db.Integer, primary_key=True)
-    quiver_id = db.Column(db.Integer, db.ForeignKey("quiver.id"), nullable=False)
+    quiver_id = db.Column(
+        db.Integer,
+        db.ForeignKey("quiver.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
     name = db.Column(db.Text, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
     quiver = db.relationship("Quiver", back_populates="arrows")
-    scores = db.relationship("ArrowScore", back_populates="arrow")
+    scores = db.relationship(
+        "ArrowScore",
+        back_populates="arrow",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    stats = db.relationship(
+        "ArrowStats",
+        back_populates="arrow",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
 
 
 class ArrowScore(db.Model):
@@ -51,11 +95,129 @@ class ArrowScore(db.Model):
         id (int): The primary key of the score.
         arrow_id (int): The foreign key referencing the associated arrow.
         score (float): The score value.
+        x (float): The horizontal impact offset from the target centre, if known.
+        y (float): The vertical impact offset from the target centre (downwards
+            positive, as on the SVG target face), if known.
+        shot_at (datetime): When the shot was taken (UTC); None for scores
+            recorded before timestamps were kept.
         arrow (Arrow): The arrow to which the score belongs.
     """
 
     __tablename__ = "arrow_score"
+    # (arrow_id, id) serves both per-arrow lookups and keyset pagination, so a
+    # separate single-column index on arrow_id would be redundant
+    __table_args__ = (
+        db.Index("ix_arrow_score_arrow_id_id", "arrow_id", "id"),
+        db.Index("ix_arrow_score_arrow_id_shot_at", "arrow_id", "shot_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    arrow_id = db.Column(db.Integer, db.ForeignKey("arrow.id"), nullable=False)
+    arrow_id = db.Column(
+        db.Integer, db.ForeignKey("arrow.id", ondelete="CASCADE"), nullable=False
+    )
     score = db.Column(db.Numeric, nullable=False)
+    x = db.Column(db.Float, nullable=True)
+    y = db.Column(db.Float, nullable=True)
+    shot_at = db.Column(db.DateTime, nullable=True, default=utcnow)
     arrow = db.relationship("Arrow", back_populates="scores")
+
+
+class ArrowStats(db.Model):
+    """
+    Represents the running aggregate over all scores of one arrow.
+
+    The row is updated in the same transaction as every score insert or delete,
+    so reading an arrow's statistics never has to scan its scores.
+
+    Attributes:
+        arrow_id (int): The primary key, also the foreign key to the arrow.
+        count (int): The number of scores.
+        total (float): The sum of all scores.
+        total_sq (float): The sum of the squared scores.
+        min_score (float): The lowest score, or None when there are no scores.
+        max_score (float): The highest score, or None when there are no scores.
+        histogram (dict[str, int]): The number of scores per ring, keyed by ring.
+        arrow (Arrow): The arrow the aggregate belongs to.
+    """
+
+    __tablename__ = "arrow_stats"
+    arrow_id = db.Column(
+        db.Integer, db.ForeignKey("arrow.id", ondelete="CASCADE"), primary_key=True
+    )
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    total_sq = db.Column(db.Float, nullable=False, default=0.0)
+    min_score = db.Column(db.Float, nullable=True)
+    max_score = db.Column(db.Float, nullable=True)
+    histogram = db.Column(db.JSON, nullable=False, default=dict)
+    arrow = db.relationship("Arrow", back_populates="stats")
+
+
+class ArrowHeatmap(db.Model):
+    """
+    Represents a fixed-resolution 2D histogram of one arrow's impact positions.
+
+    Like ArrowStats, the row is updated in the same transaction as every score
+    insert or delete that carries coordinates (see ``backend.heatmap``).
+
+    Attributes:
+        arrow_id (int): The primary key, also the foreign key to the arrow.
+        counts (bytes): The impacts per grid cell, row-major little-endian
+            uint32 values.
+        outside (int): Impacts that fell outside the grid.
+    """
+
+    __tablename__ = "arrow_heatmap"
+    arrow_id = db.Column(
+        db.Integer, db.ForeignKey("arrow.id", ondelete="CASCADE"), primary_key=True
+    )
+    counts = db.Column(db.LargeBinary, nullable=False)
+    outside = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyRollup(db.Model):
+    """
+    Represents the aggregate over one arrow's timestamped scores on one day.
+
+    Rows are built incrementally by ``flask rollup`` from the scores above the
+    ``arrow_score_daily`` watermark, and adjusted when a rolled-up score is
+    deleted.
+
+    Attributes:
+        arrow_id (int): The foreign key to the arrow, part of the primary key.
+        day (date): The UTC day of the shots, part of the primary key.
+        count (int): The number of scores.
+        total (float): The sum of the scores.
+        total_sq (float): The sum of the squared scores.
+        min_score (float): The lowest score.
+        max_score (float): The highest score.
+    """
+
+    __tablename__ = "arrow_score_daily"
+    arrow_id = db.Column(
+        db.Integer, db.ForeignKey("arrow.id", ondelete="CASCADE"), primary_key=True
+    )
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    total_sq = db.Column(db.Float, nullable=False)
+    min_score = db.Column(db.Float, nullable=False)
+    max_score = db.Column(db.Float, nullable=False)
+
+
+class RollupWatermark(db.Model):
+    """
+    Represents how far a rollup has processed the scores.
+
+    Attributes:
+        name (str): The name of the rollup table, the primary key.
+        last_score_id (int): The highest score ID already folded into it.
+        pending_score_id (int | None): The highest score ID seen by an earlier
+            run, which a later run may fold in once it is old enough.
+        pending_at (datetime | None): When ``pending_score_id`` was seen (UTC).
+    """
+
+    __tablename__ = "rollup_watermark"
+    name = db.Column(db.Text, primary_key=True)
+    last_score_id = db.Column(db.Integer, nullable=False, default=0)
+    pending_score_id = db.Column(db.Integer, nullable=True)
+    pending_at = db.Column(db.DateTime, nullable=True)
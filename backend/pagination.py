@@ -0,0 +1,132 @@
+"""
+Keyset pagination and NDJSON streaming for the QuiverStats list endpoints.
+
+List routes build a column-projected select ordered by primary key and hand it
+to :func:`list_response`, which applies the ``after``/``limit`` query
+parameters and either returns a JSON array or streams newline-delimited JSON.
+
+Pagination is keyset-based: ``after`` is the last ID the client has seen, so
+each page is an index range scan rather than an ever-growing OFFSET. When a
+page is full, the ``X-Next-After`` response header carries the cursor for the
+next one. Without ``limit`` the whole collection is returned, as before.
+
+Rows are encoded by the app's JSON provider (see ``backend.serialization``).
+When the select's column labels are the output keys, each row's values are
+only zipped with the labels into a dict and encoded as they are fetched, with
+no per-value conversion in Python.
+"""
+
+from flask import Response, abort, current_app, jsonify, request, stream_with_context
+
+from backend.extensions import db
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Rows fetched per round-trip while streaming
+STREAM_CHUNK_SIZE = 1000
+
+
+def _non_negative_int(name):
+    """
+    Read an optional non-negative integer query parameter.
+
+    Args:
+        name (str): The query parameter name.
+
+    Returns:
+        int | None: The parsed value, or None if the parameter is absent.
+    """
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        abort(400, f"{name} must be an integer")
+    if value < 0:
+        abort(400, f"{name} must not be negative")
+    return value
+
+
+def wants_ndjson():
+    """
+    Check whether the client asked for a streamed NDJSON response.
+
+    Streaming is opt-in, either through ``?format=ndjson`` or an ``Accept``
+    header that prefers ``application/x-ndjson`` over JSON.
+
+    Returns:
+        bool: True if the response should be streamed as NDJSON.
+    """
+    if request.args.get("format") == "ndjson":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _dicts(keys, rows, to_dict):
+    """
+    Convert result rows to dicts.
+
+    Args:
+        keys (Iterable[str]): The result's column labels.
+        rows (Iterable[Row]): The rows.
+        to_dict (Callable[[Row], dict] | None): Converts one row, or None to
+            key each row's values by the column labels.
+
+    Returns:
+        Iterator[dict]: One dict per row.
+    """
+    if to_dict is not None:
+        return map(to_dict, rows)
+    keys = tuple(keys)
+    return (dict(zip(keys, row)) for row in rows)
+
+
+def list_response(stmt, id_column, to_dict=None):
+    """
+    Paginate a select by primary key and serialize it as JSON or NDJSON.
+
+    Args:
+        stmt (Select): A column-projected select over the collection.
+        id_column (Column): The primary key column used as the keyset cursor.
+        to_dict (Callable[[Row], dict] | None): Converts one result row to a
+            dict; by default the row's column labels are the keys and its
+            values are encoded as they are.
+
+    Returns:
+        flask.Response: A JSON array, or a streamed NDJSON body.
+    """
+    after = _non_negative_int("after")
+    limit = _non_negative_int("limit")
+    if limit == 0:
+        abort(400, "limit must be positive")
+
+    if after is not None:
+        stmt = stmt.where(id_column > after)
+    stmt = stmt.order_by(id_column)
+
+    if wants_ndjson():
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        stmt = stmt.execution_options(yield_per=STREAM_CHUNK_SIZE)
+        encode = current_app.json.encode
+
+        def generate():
+            result = db.session.execute(stmt)
+            for item in _dicts(result.keys(), result, to_dict):
+                yield encode(item) + b"\n"
+
+        return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+    if limit is None:
+        result = db.session.execute(stmt)
+        return jsonify(list(_dicts(result.keys(), result, to_dict)))
+
+    # fetch one extra row to learn whether another page follows
+    result = db.session.execute(stmt.limit(limit + 1))
+    rows = result.all()
+    response = jsonify(list(_dicts(result.keys(), rows[:limit], to_dict)))
+    if len(rows) > limit:
+        response.headers["X-Next-After"] = str(rows[limit - 1]._mapping[id_column])
+    return response
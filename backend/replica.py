@@ -0,0 +1,213 @@
+"""
+Read-replica routing for the QuiverStats backend.
+
+When ``DATABASE_REPLICA_URL`` is set, the app gets a second engine under the
+``replica`` bind. Queries made while serving ``GET`` and ``HEAD`` requests
+(the listings, statistics, analytics and exports) are sent to it, and
+everything else goes to the primary: write requests, CLI commands and the
+write-behind thread.
+
+A replica lags behind the primary, so reads stay consistent in three ways:
+
+* a session that writes (flushes, or executes an INSERT, UPDATE or DELETE)
+  stays on the primary until it ends;
+* reads of a quiver or arrow that a transaction committed in this process
+  changed within the last ``REPLICA_MAX_LAG`` seconds go to the primary, as
+  do archive-wide reads after any such commit, so clients read their own
+  writes;
+* when a read from the replica fails with an operational error (the replica
+  is down, or its schema is behind), the request is served again from the
+  primary and the replica is skipped for ``REPLICA_RETRY_INTERVAL`` seconds.
+
+``REPLICA_MAX_LAG`` should exceed the replica's usual lag: results computed
+from the replica are cached like any other (see ``backend.cache``). Commits
+made by other processes are not seen, so with several workers a read served
+by another worker may lag by up to the replica's actual delay.
+
+Without a replica every query goes to the primary.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+
+# The bind key of the replica engine
+REPLICA = "replica"
+
+# session.info key set while the session may read from the replica
+_USE_REPLICA = "use_replica"
+
+
+class RoutingSession(Session):
+    """
+    A session that sends its reads to the replica bind while allowed to.
+
+    Reads go to the replica while ``info["use_replica"]`` is set; the first
+    write clears it, keeping the session on the primary from then on.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get(_USE_REPLICA):
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info[_USE_REPLICA] = False
+            else:
+                engine = self._db.engines.get(REPLICA)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    Decides per request whether reads may go to the replica.
+
+    Attributes:
+        max_lag (float): Seconds after a commit during which reads of what it
+            changed stay on the primary.
+        retry_interval (float): Seconds the replica is skipped after a failure.
+        replica_reads (int): Requests routed to the replica.
+        primary_reads (int): Read requests kept on the primary because of a
+            recent write or a failed replica.
+        fallbacks (int): Requests retried on the primary after a replica error.
+    """
+
+    def __init__(self, max_lag=5.0, retry_interval=30.0):
+        self.max_lag = max_lag
+        self.retry_interval = retry_interval
+        self.replica_reads = self.primary_reads = self.fallbacks = 0
+        self.db = None
+        # scope -> monotonic time of its last commit, oldest first
+        self._written = OrderedDict()
+        self._last_write = float("-inf")
+        self._down_until = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """bool: Whether a replica bind is configured."""
+        return self.db is not None and REPLICA in self.db.engines
+
+    def init_app(self, app):
+        """
+        Configure the router from the app and install the request hooks.
+
+        Reads ``REPLICA_MAX_LAG`` and ``REPLICA_RETRY_INTERVAL`` (seconds)
+        from the app config. The replica itself is the ``replica`` entry of
+        ``SQLALCHEMY_BINDS``; the app's ``db`` must be created with
+        :class:`RoutingSession` as its session class.
+
+        Args:
+            app (flask.Flask): The application, already set up with the db.
+        """
+        # imported here: backend.extensions imports this module for the session
+        from backend.cache import on_committed  # pylint: disable=import-outside-toplevel
+
+        self.max_lag = app.config.setdefault("REPLICA_MAX_LAG", self.max_lag)
+        self.retry_interval = app.config.setdefault(
+            "REPLICA_RETRY_INTERVAL", self.retry_interval
+        )
+        self.db = app.extensions["sqlalchemy"]
+        app.extensions["replica_router"] = self
+        app.before_request(self._route)
+        app.teardown_request(self._release)
+        app.register_error_handler(OperationalError, self._fall_back)
+        on_committed(self.record_writes)
+
+    def record_writes(self, scopes):
+        """
+        Note that a transaction changing some quivers and arrows committed.
+
+        Args:
+            scopes (Iterable[tuple]): The changed ``("quiver", id)`` /
+                ``("arrow", id)`` scopes.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._last_write = now
+            for scope in scopes:
+                self._written[scope] = now
+                self._written.move_to_end(scope)
+            expired = now - self.max_lag
+            while self._written and next(iter(self._written.values())) < expired:
+                self._written.popitem(last=False)
+
+    def recently_written(self, scope=None):
+        """
+        Check whether a replica may not have caught up with a commit yet.
+
+        Args:
+            scope (tuple | None): A ``("quiver", id)`` / ``("arrow", id)``
+                scope, or None for anything in the archive.
+
+        Returns:
+            bool: True if the scope was changed within ``max_lag`` seconds.
+        """
+        with self._lock:
+            written = self._last_write if scope is None else self._written.get(scope)
+        return written is not None and time.monotonic() - written < self.max_lag
+
+    def reset(self):
+        """Forget recent writes and replica failures and reset the counters."""
+        with self._lock:
+            self._written.clear()
+            self._last_write = self._down_until = float("-inf")
+            self.replica_reads = self.primary_reads = self.fallbacks = 0
+
+    def info(self):
+        """
+        Report whether a replica is in use and the routing counters.
+
+        Returns:
+            dict: The replica state and counters.
+        """
+        return {
+            "enabled": self.enabled,
+            "available": time.monotonic() >= self._down_until,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+        }
+
+    def _route(self):
+        """Let a read request use the replica unless it must see recent writes."""
+        if request.method not in ("GET", "HEAD") or not self.enabled:
+            return
+        args = request.view_args or {}
+        if "arrow_id" in args:
+            scope = ("arrow", args["arrow_id"])
+        elif "quiver_id" in args:
+            scope = ("quiver", args["quiver_id"])
+        else:
+            scope = None
+        if time.monotonic() < self._down_until or self.recently_written(scope):
+            self.primary_reads += 1
+            return
+        self.db.session.info[_USE_REPLICA] = True
+        self.replica_reads += 1
+
+    def _release(self, exc=None):
+        """Return the request's session to the primary."""
+        self.db.session.info.pop(_USE_REPLICA, None)
+
+    def _fall_back(self, error):
+        """Serve a request again from the primary after the replica failed."""
+        session = self.db.session
+        if not session.info.get(_USE_REPLICA):
+            raise error
+        session.info[_USE_REPLICA] = False
+        session.rollback()
+        self._down_until = time.monotonic() + self.retry_interval
+        self.fallbacks += 1
+        current_app.logger.warning(
+            "Replica read failed, serving from the primary: %s", error.orig
+        )
+        view = current_app.view_functions[request.endpoint]
+        return current_app.ensure_sync(view)(**request.view_args)
+
+
+replica_router = ReplicaRouter()
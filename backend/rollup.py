@@ -0,0 +1,285 @@
+"""
+Materialized daily rollup of arrow scores for the QuiverStats backend.
+
+``flask rollup`` folds timestamped scores into the ``arrow_score_daily``
+table, one row per arrow and UTC day, processing only the scores above a
+stored watermark (the highest score ID already rolled up). Long-range queries
+read the rollup rows and merge in the not-yet-rolled tail above the
+watermark, so their cost grows with the number of days rather than the
+number of shots.
+
+Deleting a score that was already rolled up adjusts its day's row in the same
+transaction, in the same way ``backend.stats.forget_scores`` keeps the
+per-arrow aggregate in step.
+
+The watermark is a score ID rather than a time, so a backdated shot submitted
+late still lands in the next run. IDs are assigned before commit, so the
+highest visible ID may already be above scores of a transaction that is still
+open (a bulk import, or a write-behind flush); moving the watermark past them
+would skip them for good. Each run therefore only records the highest ID it
+sees, with the time, and a later run folds the scores up to that ID in once
+it is at least ``lag`` seconds old, by which time any transaction that held
+lower IDs has committed (or rolled back). Until then the scores stay in the
+tail that queries merge in, so results are unaffected.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, Float, case, cast, func, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.extensions import db
+from backend.models import ArrowScore, DailyRollup, RollupWatermark, utcnow
+
+# The watermark row of the daily rollup
+ROLLUP_NAME = DailyRollup.__tablename__
+
+# Scores folded per transaction
+DEFAULT_BATCH_SIZE = 100_000
+
+# Seconds a score ID must have been visible before it is folded in; longer
+# than any score-writing transaction stays open
+DEFAULT_LAG = 300
+
+
+def day_of(column, dialect):
+    """
+    Build the SQL expression for the UTC day of a timestamp column.
+
+    Args:
+        column (ColumnElement): The naive UTC timestamp.
+        dialect (str): The name of the database dialect.
+
+    Returns:
+        ColumnElement: The day, as a date (a ``YYYY-MM-DD`` string on SQLite).
+    """
+    if dialect == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _aggregates(score):
+    """The count, sum, sum of squares, minimum and maximum of a score column."""
+    return (
+        func.count().label("count"),
+        func.sum(score).label("total"),
+        func.sum(score * score).label("total_sq"),
+        func.min(score).label("min_score"),
+        func.max(score).label("max_score"),
+    )
+
+
+def _upsert(dialect):
+    """
+    Build the statement merging day aggregates into existing rollup rows.
+
+    Args:
+        dialect (str): The name of the database dialect.
+
+    Returns:
+        Insert: An INSERT ... ON CONFLICT DO UPDATE for executemany use.
+    """
+    table = DailyRollup.__table__
+    insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+    stmt = insert(table)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.arrow_id, table.c.day],
+        set_={
+            "count": table.c.count + new.count,
+            "total": table.c.total + new.total,
+            "total_sq": table.c.total_sq + new.total_sq,
+            "min_score": case(
+                (new.min_score < table.c.min_score, new.min_score),
+                else_=table.c.min_score,
+            ),
+            "max_score": case(
+                (new.max_score > table.c.max_score, new.max_score),
+                else_=table.c.max_score,
+            ),
+        },
+    )
+
+
+def _locked_watermark():
+    """
+    Fetch the rollup watermark for update, creating it if it is missing.
+
+    Returns:
+        RollupWatermark: The watermark row, locked for the current transaction.
+    """
+    mark = db.session.get(RollupWatermark, ROLLUP_NAME, with_for_update=True)
+    if mark is None:
+        mark = RollupWatermark(name=ROLLUP_NAME, last_score_id=0)
+        db.session.add(mark)
+    return mark
+
+
+def _upper_bound(lag):
+    """
+    Decide how far this run may roll up, and record the bound for a later run.
+
+    Args:
+        lag (float): Seconds a score ID must have been seen before it is
+            folded in; 0 folds in everything visible now.
+
+    Returns:
+        int: The highest score ID this run may fold in.
+    """
+    mark = _locked_watermark()
+    newest = db.session.scalar(select(func.max(ArrowScore.id))) or 0
+    now = utcnow()
+    upper = mark.last_score_id or 0
+    if lag <= 0:
+        upper = max(upper, newest)
+        mark.pending_score_id = mark.pending_at = None
+    elif mark.pending_at is not None and mark.pending_at <= now - timedelta(seconds=lag):
+        upper = max(upper, mark.pending_score_id)
+        mark.pending_score_id = mark.pending_at = None
+    if mark.pending_score_id is None and newest > upper:
+        mark.pending_score_id, mark.pending_at = newest, now
+    db.session.commit()
+    return upper
+
+
+def run_rollup(batch_size=DEFAULT_BATCH_SIZE, lag=DEFAULT_LAG):
+    """
+    Fold the settled scores above the watermark into the daily rollup.
+
+    Only scores up to the highest ID an earlier run saw at least ``lag``
+    seconds ago are folded in; the highest ID visible now is recorded for a
+    later run. Scores are processed in ID ranges of ``batch_size``, each in
+    its own transaction that also advances the watermark, so an interrupted
+    run loses nothing and the next run resumes where it stopped. Scores
+    without a timestamp are skipped.
+
+    Args:
+        batch_size (int): The width of each ID range.
+        lag (float): Seconds a score ID must have been seen before it is
+            folded in. Pass 0 only when no score-writing transaction can be
+            open, such as right after seeding.
+
+    Returns:
+        tuple[int, int]: The number of scores rolled up and the new watermark.
+    """
+    dialect = db.session.get_bind().dialect.name
+    score = cast(ArrowScore.score, Float)
+    day = day_of(ArrowScore.shot_at, dialect).label("day")
+    upsert = _upsert(dialect)
+    upper = _upper_bound(lag)
+    rolled = 0
+    while True:
+        mark = _locked_watermark()
+        low = mark.last_score_id
+        if low >= upper:
+            db.session.commit()
+            return rolled, low
+        high = min(upper, low + batch_size)
+        groups = db.session.execute(
+            select(ArrowScore.arrow_id, day, *_aggregates(score))
+            .where(
+                ArrowScore.id > low,
+                ArrowScore.id <= high,
+                ArrowScore.shot_at.is_not(None),
+            )
+            .group_by(ArrowScore.arrow_id, day)
+        ).all()
+        if groups:
+            db.session.execute(
+                upsert,
+                [
+                    {
+                        **row._asdict(),
+                        "day": date.fromisoformat(row.day)
+                        if isinstance(row.day, str)
+                        else row.day,
+                    }
+                    for row in groups
+                ],
+            )
+            rolled += sum(row.count for row in groups)
+        mark.last_score_id = high
+        db.session.commit()
+
+
+def daily_aggregates(arrow_id, dialect):
+    """
+    Build a subquery of an arrow's per-day aggregates, rollup plus tail.
+
+    The rolled-up rows are combined with the scores above the watermark,
+    grouped by day on the fly. A day can appear twice (once from each side),
+    so callers re-aggregate by day or coarser.
+
+    Args:
+        arrow_id (int): The ID of the arrow.
+        dialect (str): The name of the database dialect.
+
+    Returns:
+        Subquery: Rows of ``day``, ``count``, ``total``, ``total_sq``,
+        ``min_score`` and ``max_score``.
+    """
+    watermark = (
+        select(RollupWatermark.last_score_id)
+        .where(RollupWatermark.name == ROLLUP_NAME)
+        .scalar_subquery()
+    )
+    score = cast(ArrowScore.score, Float)
+    day = day_of(ArrowScore.shot_at, dialect).label("day")
+    rolled = select(
+        DailyRollup.day,
+        DailyRollup.count,
+        DailyRollup.total,
+        DailyRollup.total_sq,
+        DailyRollup.min_score,
+        DailyRollup.max_score,
+    ).where(DailyRollup.arrow_id == arrow_id)
+    tail = (
+        select(day, *_aggregates(score))
+        .where(
+            ArrowScore.arrow_id == arrow_id,
+            ArrowScore.id > func.coalesce(watermark, 0),
+            ArrowScore.shot_at.is_not(None),
+        )
+        .group_by(day)
+    )
+    return union_all(rolled, tail).subquery()
+
+
+def forget_rolled_up(score):
+    """
+    Remove a deleted score from its day's rollup row, if it was rolled up.
+
+    The minimum and maximum are only recomputed, over the day's remaining
+    rolled-up scores, when the removed value sat on one of the bounds. The
+    delete must already be pending in the session.
+
+    Args:
+        score (ArrowScore): The deleted score.
+    """
+    if score.shot_at is None:
+        return
+    mark = db.session.get(RollupWatermark, ROLLUP_NAME)
+    if mark is None or score.id > mark.last_score_id:
+        return
+    day = score.shot_at.date()
+    row = db.session.get(DailyRollup, (score.arrow_id, day), with_for_update=True)
+    if row is None:
+        return
+    value = float(score.score)
+    row.count -= 1
+    if row.count <= 0:
+        db.session.delete(row)
+        return
+    row.total -= value
+    row.total_sq -= value * value
+    if value <= row.min_score or value >= row.max_score:
+        start = datetime.combine(day, time())
+        low, high = db.session.execute(
+            select(func.min(ArrowScore.score), func.max(ArrowScore.score)).where(
+                ArrowScore.arrow_id == score.arrow_id,
+                ArrowScore.shot_at >= start,
+                ArrowScore.shot_at < start + timedelta(days=1),
+                ArrowScore.id <= mark.last_score_id,
+            )
+        ).one()
+        row.min_score, row.max_score = float(low), float(high)
@@ -0,0 +1,113 @@
+"""
+JSON encoding for the QuiverStats backend.
+
+Responses are encoded by the JSON provider registered on the app. With the
+``JSON_PROVIDER`` config set to ``"auto"`` (the default) that is
+:class:`OrjsonProvider` when orjson is installed, and :class:`StdlibProvider`
+otherwise; ``"orjson"`` or ``"stdlib"`` pick one explicitly.
+
+Both providers produce the same documents: datetimes as ISO 8601 strings,
+``Decimal`` values as numbers and keys in insertion order, so read routes can
+hand database rows over as they are selected (with ``score`` already cast to a
+float in SQL) instead of converting every value in Python first. orjson
+encodes those rows natively, straight to bytes.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import json
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+PROVIDERS = ("auto", "orjson", "stdlib")
+
+
+def _default(obj):
+    """Encode the values neither encoder handles natively."""
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "tolist"):
+        # NumPy arrays and scalars
+        return obj.tolist()
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class StdlibProvider(DefaultJSONProvider):
+    """The standard library encoder, producing the same documents as orjson."""
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+    def encode(self, obj):
+        """
+        Encode a value compactly, as used for each line of an NDJSON stream.
+
+        Args:
+            obj: The value to encode.
+
+        Returns:
+            bytes: The UTF-8 encoded JSON.
+        """
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+class OrjsonProvider(JSONProvider):
+    """A JSON provider backed by orjson."""
+
+    options = 0 if orjson is None else orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def encode(self, obj):
+        """
+        Encode a value compactly, as used for each line of an NDJSON stream.
+
+        Args:
+            obj: The value to encode.
+
+        Returns:
+            bytes: The UTF-8 encoded JSON.
+        """
+        return orjson.dumps(obj, default=_default, option=self.options)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj), mimetype="application/json")
+
+
+def init_app(app):
+    """
+    Register the configured JSON provider on the app.
+
+    Reads ``JSON_PROVIDER`` (one of :data:`PROVIDERS`) from the app config.
+
+    Args:
+        app (flask.Flask): The application.
+
+    Raises:
+        ValueError: If the provider is unknown, or orjson was asked for but is
+            not installed.
+    """
+    choice = app.config.setdefault("JSON_PROVIDER", "auto")
+    if choice not in PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(PROVIDERS)}")
+    if choice == "orjson" and orjson is None:
+        raise ValueError("JSON_PROVIDER is orjson, but orjson is not installed")
+    use_orjson = choice == "orjson" or (choice == "auto" and orjson is not None)
+    app.json = OrjsonProvider(app) if use_orjson else StdlibProvider(app)
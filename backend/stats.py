@@ -0,0 +1,274 @@
+"""
+Running score aggregates for the QuiverStats backend.
+
+Every arrow owns one ArrowStats row holding the count, sum, sum of squares,
+minimum, maximum and per-ring histogram of its scores. The helpers in this
+module update that row alongside score inserts and deletes, inside the caller's
+transaction, so that reading an arrow's statistics is a single primary-key
+lookup regardless of how many scores the arrow has.
+"""
+
+import math
+
+from sqlalchemy import func, select
+
+from backend.extensions import db
+from backend.models import Arrow, ArrowScore, ArrowStats
+
+
+def ring_of(value):
+    """
+    Return the ring a score is counted under in the histogram.
+
+    Args:
+        value (float): The score value.
+
+    Returns:
+        int: The score rounded down to a whole ring.
+    """
+    return int(math.floor(value))
+
+
+def sample_variance(count, total, total_sq):
+    """
+    Compute the sample variance (n - 1 denominator) from running sums.
+
+    Args:
+        count (int): The number of values.
+        total (float): The sum of the values.
+        total_sq (float): The sum of the squared values.
+
+    Returns:
+        float | None: The variance, or None for fewer than two values.
+    """
+    if count < 2:
+        return None
+    return max(0.0, (total_sq - total * total / count) / (count - 1))
+
+
+def empty_stats(arrow):
+    """
+    Create an empty aggregate for an arrow and add it to the session.
+
+    Args:
+        arrow (Arrow): The arrow the aggregate belongs to.
+
+    Returns:
+        ArrowStats: The new, empty aggregate.
+    """
+    stats = ArrowStats(
+        arrow=arrow,
+        count=0,
+        total=0.0,
+        total_sq=0.0,
+        min_score=None,
+        max_score=None,
+        histogram={},
+    )
+    db.session.add(stats)
+    return stats
+
+
+def _locked_stats(arrow):
+    """
+    Fetch an arrow's aggregate row for update, creating it if it is missing.
+
+    Args:
+        arrow (Arrow): The arrow whose aggregate is needed.
+
+    Returns:
+        ArrowStats: The aggregate row, locked for the current transaction.
+    """
+    stats = db.session.get(ArrowStats, arrow.id, with_for_update=True)
+    if stats is None:
+        stats = empty_stats(arrow)
+    return stats
+
+
+def record_scores(arrow, values):
+    """
+    Fold newly inserted scores into an arrow's aggregate.
+
+    Args:
+        arrow (Arrow): The arrow the scores were added to.
+        values (Iterable[float]): The new score values.
+
+    Returns:
+        ArrowStats: The updated aggregate (not yet committed).
+    """
+    stats = _locked_stats(arrow)
+    histogram = dict(stats.histogram or {})
+    for value in values:
+        value = float(value)
+        stats.count += 1
+        stats.total += value
+        stats.total_sq += value * value
+        if stats.min_score is None or value < stats.min_score:
+            stats.min_score = value
+        if stats.max_score is None or value > stats.max_score:
+            stats.max_score = value
+        ring = str(ring_of(value))
+        histogram[ring] = histogram.get(ring, 0) + 1
+    # reassign so the JSON column is marked dirty
+    stats.histogram = histogram
+    return stats
+
+
+def forget_scores(arrow, values):
+    """
+    Remove deleted scores from an arrow's aggregate.
+
+    Count, sums and histogram are adjusted in place. The minimum and maximum are
+    only recomputed, with an aggregate query over the arrow's remaining scores,
+    when a removed value sat on one of the bounds. The deletes must already be
+    pending in the session so that the query does not see the removed rows.
+
+    Args:
+        arrow (Arrow): The arrow the scores were removed from.
+        values (Iterable[float]): The deleted score values.
+
+    Returns:
+        ArrowStats: The updated aggregate (not yet committed).
+    """
+    stats = _locked_stats(arrow)
+    histogram = dict(stats.histogram or {})
+    bounds_touched = False
+    for value in values:
+        value = float(value)
+        stats.count -= 1
+        stats.total -= value
+        stats.total_sq -= value * value
+        if (stats.min_score is not None and value <= stats.min_score) or (
+            stats.max_score is not None and value >= stats.max_score
+        ):
+            bounds_touched = True
+        ring = str(ring_of(value))
+        remaining = histogram.get(ring, 0) - 1
+        if remaining > 0:
+            histogram[ring] = remaining
+        else:
+            histogram.pop(ring, None)
+
+    if stats.count <= 0:
+        stats.count = 0
+        stats.total = 0.0
+        stats.total_sq = 0.0
+        stats.min_score = None
+        stats.max_score = None
+        histogram = {}
+    elif bounds_touched:
+        low, high = db.session.execute(
+            select(func.min(ArrowScore.score), func.max(ArrowScore.score)).where(
+                ArrowScore.arrow_id == arrow.id
+            )
+        ).one()
+        stats.min_score = float(low) if low is not None else None
+        stats.max_score = float(high) if high is not None else None
+    stats.histogram = histogram
+    return stats
+
+
+def stats_to_dict(arrow_id, stats):
+    """
+    Serialize an aggregate into the shape returned by the stats endpoint.
+
+    The variance is the sample variance (n - 1 denominator) and is None for
+    fewer than two scores; the mean, minimum and maximum are None for none.
+
+    Args:
+        arrow_id (int): The ID of the arrow the aggregate belongs to.
+        stats (ArrowStats | None): The aggregate, or None if the arrow has none.
+
+    Returns:
+        dict: The arrow's summary statistics.
+    """
+    count = stats.count if stats is not None else 0
+    total = stats.total if count else 0.0
+    total_sq = stats.total_sq if count else 0.0
+    mean = total / count if count else None
+    variance = sample_variance(count, total, total_sq)
+    histogram = stats.histogram if count else {}
+    return {
+        "arrow_id": arrow_id,
+        "count": count,
+        "sum": total,
+        "sum_sq": total_sq,
+        "mean": mean,
+        "variance": variance,
+        "min": stats.min_score if count else None,
+        "max": stats.max_score if count else None,
+        "histogram": {
+            ring: histogram[ring] for ring in sorted(histogram, key=int)
+        },
+    }
+
+
+def rank_arrows(quiver_id, threshold):
+    """
+    Rank the arrows of a quiver by mean score and flag statistical outliers.
+
+    All per-arrow figures come from one query over the arrows joined with
+    their aggregates, so the cost grows with the number of arrows only.
+    Each arrow's z-score compares its mean with the pooled quiver mean,
+    scaled by the standard error for the arrow's shot count:
+    ``(mean - quiver_mean) / (quiver_stddev / sqrt(count))``.
+
+    Args:
+        quiver_id (int): The ID of the quiver whose arrows are ranked.
+        threshold (float): The absolute z-score above which an arrow is an outlier.
+
+    Returns:
+        dict: The pooled quiver figures and the ranked arrows, best mean first;
+        arrows without scores are listed last, unranked.
+    """
+    rows = db.session.execute(
+        select(
+            Arrow.id,
+            Arrow.name,
+            func.coalesce(ArrowStats.count, 0).label("count"),
+            func.coalesce(ArrowStats.total, 0.0).label("total"),
+            func.coalesce(ArrowStats.total_sq, 0.0).label("total_sq"),
+        )
+        .outerjoin(ArrowStats, ArrowStats.arrow_id == Arrow.id)
+        .where(Arrow.quiver_id == quiver_id)
+        .order_by(Arrow.id)
+    ).all()
+
+    count = sum(row.count for row in rows)
+    total = sum(row.total for row in rows)
+    total_sq = sum(row.total_sq for row in rows)
+    mean = total / count if count else None
+    variance = sample_variance(count, total, total_sq)
+    stddev = math.sqrt(variance) if variance is not None else None
+
+    arrows = []
+    for row in rows:
+        arrow_mean = row.total / row.count if row.count else None
+        arrow_variance = sample_variance(row.count, row.total, row.total_sq)
+        arrow_stddev = math.sqrt(arrow_variance) if arrow_variance is not None else None
+        z_score = None
+        if arrow_mean is not None and stddev:
+            z_score = (arrow_mean - mean) / (stddev / math.sqrt(row.count))
+        arrows.append(
+            {
+                "arrow_id": row.id,
+                "name": row.name,
+                "count": row.count,
+                "mean": arrow_mean,
+                "stddev": arrow_stddev,
+                "z_score": z_score,
+                "outlier": z_score is not None and abs(z_score) > threshold,
+            }
+        )
+
+    arrows.sort(key=lambda a: (a["mean"] is None, -(a["mean"] or 0.0), a["arrow_id"]))
+    for rank, a in enumerate(arrows, start=1):
+        a["rank"] = rank if a["mean"] is not None else None
+    return {
+        "quiver_id": quiver_id,
+        "count": count,
+        "mean": mean,
+        "stddev": stddev,
+        "threshold": threshold,
+        "arrows": arrows,
+    }
@@ -0,0 +1,54 @@
+"""
+Shared fixtures for the QuiverStats backend tests.
+"""
+
+# Standard library imports
+import os
+import sys
+import pytest
+from backend.app import create_app, db
+from backend.cache import stats_cache
+from backend.events import event_hub
+from backend.metrics import metrics
+from backend.replica import replica_router
+# Add the project root directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+
+@pytest.fixture(scope="function", name="flask_app")
+def application():
+    """
+    Create a Flask app for testing, bound to a fresh in-memory database.
+
+    Yields:
+        flask.Flask: The application, with an app context pushed.
+    """
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+
+    # Create app context
+    with app.app_context():
+        # Create all tables
+        db.create_all()
+        yield app
+
+        # Clean up after test
+        db.session.remove()
+        db.drop_all()
+        stats_cache.clear()
+        metrics.reset()
+        event_hub.reset()
+        replica_router.reset()
+
+
+@pytest.fixture(scope="function", name="client_app")
+def client(flask_app):  # Fixture name
+    """
+    Provide a test client for the test app.
+
+    Args:
+        flask_app: Flask app from fixture
+
+    Returns:
+        FlaskClient: A test client for the Flask application.
+    """
+    return flask_app.test_client()
@@ -5,40 +5,58 @@ It includes tests for CRUD operations on quivers, arrows, and scores.
 """
 
 # Standard library imports
-import os
+import base64
+import json
+import re
+import sqlite3
+import subprocess
 import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from contextlib import contextmanager
+import numpy as np
 import pytest
-from backend.app import app, db
-# Add the project root directory to sys.path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from sqlalchemy import create_engine, delete, event, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from flask import Flask
+from backend.app import create_app, db
+from backend.bench.seed import seed
+from backend.models import Arrow, ArrowStats, DailyRollup, Quiver, RollupWatermark
+from backend.rollup import DEFAULT_LAG
+from backend.cache import stats_cache
+from backend.metrics import metrics
+from backend import writebehind
+from backend.ingest import bulk_insert_scores, is_score
+from backend.writebehind import write_buffer
+from backend.events import event_hub
+from backend.replica import REPLICA, replica_router
+from backend.engine import DEFAULTS, configure_engines, engine_options
+from backend.serialization import OrjsonProvider, StdlibProvider, orjson
+from backend import serialization
+from backend.scoring import FACES, TargetFace, centre_offsets, get_face, score_impacts
 
 
-@pytest.fixture(scope="function")
-def client():  # Fixture name
+@contextmanager
+def count_queries():
     """
-    Configure the Flask app for testing and provide a test client.
-
-    This fixture sets up a fresh database for each test function.
+    Record the SQL statements executed while the block runs.
 
     Yields:
-        FlaskClient: A test client for the Flask application.
+        list[tuple]: The (statement, parameters) pairs issued so far, filled in
+        as they execute.
     """
-    # Configure for testing
-    app.config["TESTING"] = True
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
-
-    # Create app context
-    with app.app_context():
-        # Create all tables
-        db.create_all()
+    statements = []
 
-        # Create and yield test client
-        test_client = app.test_client()
-        yield test_client
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
 
-        # Clean up after test
-        db.session.remove()
-        db.drop_all()
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
 
 
 def test_quiver_crud(client_app):  # Different parameter name from fixture
@@ -159,3 +177,1543 @@ def test_score_crud(client_app):  # Different parameter name from fixture
 
     # Back to empty
     assert client_app.get(f"/api/arrows/{a['id']}/scores").get_json() == []
+
+
+def test_arrow_stats(client_app):
+    """
+    Test that arrow statistics follow score inserts and deletes.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q4"}).get_json()
+    a = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A3"}
+    ).get_json()
+
+    # Unknown arrow
+    assert client_app.get("/api/arrows/999/stats").status_code == 404
+
+    # No scores yet
+    stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+    assert stats["count"] == 0 and stats["mean"] is None
+    assert stats["histogram"] == {}
+
+    # Reject non-numeric scores
+    rv = client_app.post(f"/api/arrows/{a['id']}/scores", json={"score": "ten"})
+    assert rv.status_code == 400
+    # ... and the non-finite values Python's JSON decoder accepts
+    assert not any(is_score(v) for v in (float("nan"), float("inf"), float("-inf")))
+    assert is_score(10) and is_score(9.5)
+
+    ids = [
+        client_app.post(f"/api/arrows/{a['id']}/scores", json={"score": v})
+        .get_json()["id"]
+        for v in (10, 8, 9, 10)
+    ]
+    stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+    assert stats["count"] == 4
+    assert stats["sum"] == 37 and stats["sum_sq"] == 345
+    assert stats["mean"] == pytest.approx(9.25)
+    assert stats["variance"] == pytest.approx(0.9166666)
+    assert stats["min"] == 8 and stats["max"] == 10
+    assert stats["histogram"] == {"8": 1, "9": 1, "10": 2}
+
+    # Deleting the minimum recomputes the lower bound
+    client_app.delete(f"/api/arrows/scores/{ids[1]}")
+    stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+    assert stats["count"] == 3 and stats["min"] == 9 and stats["max"] == 10
+    assert stats["histogram"] == {"9": 1, "10": 2}
+
+    for score_id in (ids[0], ids[2], ids[3]):
+        client_app.delete(f"/api/arrows/scores/{score_id}")
+    stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+    assert stats["count"] == 0 and stats["min"] is None and stats["sum"] == 0
+
+
+def test_score_batch(client_app):
+    """
+    Test bulk score creation for one arrow and for several arrows of a quiver.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q5"}).get_json()
+    a1 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A1"}
+    ).get_json()
+    a2 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A2"}
+    ).get_json()
+
+    # One bad value rejects the whole batch
+    rv = client_app.post(
+        f"/api/arrows/{a1['id']}/scores/batch", json={"scores": [10, None, 9]}
+    )
+    assert rv.status_code == 400
+    assert client_app.get(f"/api/arrows/{a1['id']}/scores").get_json() == []
+
+    # Large single-arrow batch, ids come back in order
+    values = [i % 11 for i in range(10_000)]
+    rv = client_app.post(
+        f"/api/arrows/{a1['id']}/scores/batch", json={"scores": values}
+    )
+    assert rv.status_code == 201
+    body = rv.get_json()
+    assert body["count"] == len(values) and body["ids"] == sorted(body["ids"])
+    scores = client_app.get(f"/api/arrows/{a1['id']}/scores").get_json()
+    assert [s["id"] for s in scores] == body["ids"]
+    assert [s["score"] for s in scores] == values
+    stats = client_app.get(f"/api/arrows/{a1['id']}/stats").get_json()
+    assert stats["count"] == len(values) and stats["sum"] == sum(values)
+
+    # Quiver batch must only reference the quiver's own arrows
+    other = client_app.post("/api/quivers", json={"name": "Q6"}).get_json()
+    stray = client_app.post(
+        f"/api/quivers/{other['id']}/arrows", json={"name": "A9"}
+    ).get_json()
+    rv = client_app.post(
+        f"/api/quivers/{q['id']}/scores/batch",
+        json={"scores": [{"arrow_id": stray["id"], "score": 5}]},
+    )
+    assert rv.status_code == 400
+
+    rv = client_app.post(
+        f"/api/quivers/{q['id']}/scores/batch",
+        json={
+            "scores": [
+                {"arrow_id": a2["id"], "score": 7},
+                {"arrow_id": a1["id"], "score": 10},
+                {"arrow_id": a2["id"], "score": 9},
+            ]
+        },
+    )
+    assert rv.status_code == 201
+    ids = rv.get_json()["ids"]
+    assert len(ids) == 3 and ids == sorted(ids)
+    assert [s["score"] for s in client_app.get(
+        f"/api/arrows/{a2['id']}/scores"
+    ).get_json()] == [7, 9]
+    stats = client_app.get(f"/api/arrows/{a2['id']}/stats").get_json()
+    assert stats["count"] == 2 and stats["mean"] == 8
+
+
+def test_list_pagination(client_app):
+    """
+    Test keyset pagination and NDJSON streaming on the list endpoints.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    quivers = [
+        client_app.post("/api/quivers", json={"name": f"Q{i}"}).get_json()
+        for i in range(5)
+    ]
+
+    # Walk the quivers two at a time
+    seen, after = [], None
+    while True:
+        url = "/api/quivers?limit=2" + (f"&after={after}" if after else "")
+        rv = client_app.get(url)
+        seen.extend(rv.get_json())
+        after = rv.headers.get("X-Next-After")
+        if after is None:
+            break
+    assert seen == quivers
+
+    assert client_app.get("/api/quivers?limit=0").status_code == 400
+    assert client_app.get("/api/quivers?after=abc").status_code == 400
+
+    q = quivers[0]
+    a = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A1"}
+    ).get_json()
+    page = client_app.get(f"/api/quivers/{q['id']}/arrows?limit=1").get_json()
+    assert page == [a]
+
+    ids = client_app.post(
+        f"/api/arrows/{a['id']}/scores/batch", json={"scores": [10, 9, 8, 7]}
+    ).get_json()["ids"]
+    rv = client_app.get(f"/api/arrows/{a['id']}/scores?after={ids[0]}&limit=2")
+    assert [s["score"] for s in rv.get_json()] == [9, 8]
+    assert rv.headers["X-Next-After"] == str(ids[2])
+
+    # NDJSON, via the Accept header or the format parameter
+    rv = client_app.get(
+        f"/api/arrows/{a['id']}/scores",
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert rv.mimetype == "application/x-ndjson"
+    lines = rv.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ids
+    rv = client_app.get(f"/api/quivers?format=ndjson&after={quivers[3]['id']}")
+    assert [json.loads(line) for line in rv.get_data(as_text=True).splitlines()] == [
+        quivers[4]
+    ]
+
+
+def test_quiver_expand(client_app):
+    """
+    Test the expanded quiver graph and that its query count is fixed.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q7"}).get_json()
+    assert client_app.get(f"/api/quivers/{q['id']}?expand=bogus").status_code == 400
+
+    query_counts = []
+    for n_arrows in (2, 12):
+        while True:
+            arrows = client_app.get(f"/api/quivers/{q['id']}/arrows").get_json()
+            if len(arrows) == n_arrows:
+                break
+            a = client_app.post(
+                f"/api/quivers/{q['id']}/arrows", json={"name": f"A{len(arrows)}"}
+            ).get_json()
+            client_app.post(
+                f"/api/arrows/{a['id']}/scores/batch", json={"scores": [10, 9]}
+            )
+
+        with count_queries() as statements:
+            rv = client_app.get(f"/api/quivers/{q['id']}?expand=arrows,scores,stats")
+        query_counts.append(len(statements))
+
+        body = rv.get_json()
+        assert [a["id"] for a in body["arrows"]] == [a["id"] for a in arrows]
+        for a in body["arrows"]:
+            assert [s["score"] for s in a["scores"]] == [10, 9]
+            assert a["stats"]["count"] == 2 and a["stats"]["mean"] == 9.5
+
+    # quiver, arrows, scores, stats -- independent of the number of arrows
+    assert query_counts == [4, 4]
+
+    # Without expand, only arrow ids and names are returned
+    body = client_app.get(f"/api/quivers/{q['id']}").get_json()
+    assert set(body["arrows"][0]) == {"id", "name"}
+
+
+def explain(statement, parameters):
+    """
+    Return the query plan for a statement captured by ``count_queries``.
+
+    On PostgreSQL sequential scans are disabled first, so a ``Seq Scan`` in the
+    plan means no usable index exists rather than that one was not worth using.
+
+    Args:
+        statement (str): The SQL as sent to the driver.
+        parameters: The driver-level parameters for the statement.
+
+    Returns:
+        str: The plan, one step per line.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        return "\n".join(row[-1] for row in rows)
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+    return "\n".join(row[0] for row in rows)
+
+
+def test_hot_queries_use_indexes(client_app):
+    """
+    Test that the queries behind the arrow and score routes never scan a table.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q8"}).get_json()
+    arrows = [
+        client_app.post(
+            f"/api/quivers/{q['id']}/arrows", json={"name": f"A{i}"}
+        ).get_json()
+        for i in range(3)
+    ]
+    a = arrows[0]
+    ids = client_app.post(
+        f"/api/arrows/{a['id']}/scores/batch", json={"scores": [10, 8, 9]}
+    ).get_json()["ids"]
+
+    with count_queries() as statements:
+        client_app.get(f"/api/quivers/{q['id']}/arrows")
+        client_app.get(f"/api/quivers/{q['id']}?expand=scores,stats")
+        client_app.get(f"/api/arrows/{a['id']}/scores")
+        client_app.get(f"/api/arrows/{a['id']}/scores?after={ids[0]}&limit=1")
+        client_app.get(f"/api/arrows/{a['id']}/stats")
+        client_app.post(
+            f"/api/quivers/{q['id']}/scores/batch",
+            json={"scores": [{"arrow_id": arrows[1]["id"], "score": 7}]},
+        )
+        client_app.delete(f"/api/arrows/scores/{ids[1]}")
+
+    selects = [(sql, params) for sql, params in statements if sql.startswith("SELECT")]
+    assert selects
+    full_scan = re.compile(r"\b(SCAN|Seq Scan on) (arrow|arrow_score)\b")
+    for sql, params in selects:
+        plan = explain(sql, params)
+        assert not full_scan.search(plan), f"{sql}\n{plan}"
+
+
+def test_grouping(client_app):
+    """
+    Test impact coordinate storage and the grouping analytics endpoints.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q9"}).get_json()
+    a1 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A1"}
+    ).get_json()
+    a2 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A2"}
+    ).get_json()
+
+    # Coordinates come in pairs
+    rv = client_app.post(f"/api/arrows/{a1['id']}/scores", json={"score": 9, "x": 1})
+    assert rv.status_code == 400
+
+    rv = client_app.post(
+        f"/api/arrows/{a1['id']}/scores", json={"score": 10, "x": 1.0, "y": 1.0}
+    )
+    assert rv.status_code == 201 and rv.get_json()["x"] == 1.0
+    client_app.post(
+        f"/api/arrows/{a1['id']}/scores/batch",
+        json={
+            "scores": [
+                {"score": 10, "x": -1.0, "y": 1.0},
+                {"score": 10, "x": -1.0, "y": -1.0},
+                {"score": 10, "x": 1.0, "y": -1.0},
+                8,
+            ]
+        },
+    )
+    scores = client_app.get(f"/api/arrows/{a1['id']}/scores").get_json()
+    assert [(s["x"], s["y"]) for s in scores][-2:] == [(1.0, -1.0), (None, None)]
+
+    # Four corners of a square centred on the target; the shot without
+    # coordinates is ignored
+    g = client_app.get(f"/api/arrows/{a1['id']}/grouping").get_json()
+    assert g["arrow_id"] == a1["id"] and g["count"] == 4
+    assert g["centroid"] == {"x": 0.0, "y": 0.0}
+    assert g["mean_radius"] == pytest.approx(2**0.5)
+    assert g["cep50"] == pytest.approx(2**0.5)
+    assert g["extreme_spread"] == pytest.approx(2 * 2**0.5)
+    assert g["covariance"] == [[pytest.approx(4 / 3), 0.0], [0.0, pytest.approx(4 / 3)]]
+    assert g["ellipse"]["confidence"] == 0.95
+
+    # Quiver grouping pools every arrow
+    client_app.post(
+        f"/api/quivers/{q['id']}/scores/batch",
+        json={"scores": [{"arrow_id": a2["id"], "score": 6, "x": 4.0, "y": 0.0}]},
+    )
+    g = client_app.get(f"/api/quivers/{q['id']}/grouping?confidence=0.5").get_json()
+    assert g["quiver_id"] == q["id"] and g["count"] == 5
+    assert g["centroid"]["x"] == pytest.approx(0.8)
+    assert g["extreme_spread"] == pytest.approx((5**2 + 1**2) ** 0.5)
+    assert g["ellipse"]["confidence"] == 0.5
+
+    # Empty groups and bad parameters
+    a3 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A3"}
+    ).get_json()
+    g = client_app.get(f"/api/arrows/{a3['id']}/grouping").get_json()
+    assert g["count"] == 0 and g["centroid"] is None
+    rv = client_app.get(f"/api/arrows/{a3['id']}/grouping?confidence=2")
+    assert rv.status_code == 400
+    assert client_app.get("/api/quivers/999/grouping").status_code == 404
+
+
+def test_quiver_ranking(client_app):
+    """
+    Test ranking the arrows of a quiver and flagging the outlier.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q10"}).get_json()
+    arrows = [
+        client_app.post(
+            f"/api/quivers/{q['id']}/arrows", json={"name": f"A{i}"}
+        ).get_json()
+        for i in range(5)
+    ]
+    good = [10, 9, 10, 9, 10, 9, 10, 9]
+    bad = [6, 5, 6, 5, 6, 5, 6, 5]
+    entries = []
+    for i, a in enumerate(arrows[:4]):
+        for score in bad if i == 2 else good:
+            entries.append({"arrow_id": a["id"], "score": score})
+    client_app.post(f"/api/quivers/{q['id']}/scores/batch", json={"scores": entries})
+
+    with count_queries() as statements:
+        body = client_app.get(f"/api/quivers/{q['id']}/ranking").get_json()
+    assert len(statements) == 2  # the quiver, then one aggregate query
+
+    assert body["count"] == 32 and body["mean"] == pytest.approx(8.5)
+    ranked = body["arrows"]
+    assert [a["rank"] for a in ranked] == [1, 2, 3, 4, None]
+    assert ranked[3]["arrow_id"] == arrows[2]["id"] and ranked[3]["outlier"]
+    assert ranked[3]["z_score"] < -2
+    assert not any(a["outlier"] for a in ranked[:3])
+    assert ranked[0]["mean"] == 9.5
+    assert ranked[0]["stddev"] == pytest.approx(0.5345, rel=1e-3)
+    assert ranked[4] == {
+        "arrow_id": arrows[4]["id"],
+        "name": "A4",
+        "count": 0,
+        "mean": None,
+        "stddev": None,
+        "z_score": None,
+        "outlier": False,
+        "rank": None,
+    }
+
+    rv = client_app.get(f"/api/quivers/{q['id']}/ranking?threshold=0")
+    assert rv.status_code == 400
+    assert client_app.get("/api/quivers/999/ranking").status_code == 404
+
+
+def test_conditional_get(client_app):
+    """
+    Test weak ETags from version counters and 304 responses.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q11"}).get_json()
+    a = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A1"}
+    ).get_json()
+    quiver_url = f"/api/quivers/{q['id']}?expand=scores,stats"
+    scores_url = f"/api/arrows/{a['id']}/scores"
+
+    rv = client_app.get(quiver_url)
+    quiver_etag = rv.headers["ETag"]
+    assert quiver_etag.startswith("W/")
+    scores_etag = client_app.get(scores_url).headers["ETag"]
+
+    # A matching If-None-Match costs one primary-key lookup
+    with count_queries() as statements:
+        rv = client_app.get(quiver_url, headers={"If-None-Match": quiver_etag})
+    assert rv.status_code == 304 and rv.headers["ETag"] == quiver_etag
+    assert len(statements) == 1
+    rv = client_app.get(scores_url, headers={"If-None-Match": scores_etag})
+    assert rv.status_code == 304
+
+    # Every write below the quiver invalidates both tags
+    previous = {quiver_etag}
+    writes = [
+        lambda: client_app.post(scores_url, json={"score": 10}),
+        lambda: client_app.post(
+            f"/api/arrows/{a['id']}/scores/batch", json={"scores": [9, 8]}
+        ),
+        lambda: client_app.put(f"/api/arrows/{a['id']}", json={"name": "A1b"}),
+        lambda: client_app.delete(
+            f"/api/arrows/scores/{client_app.get(scores_url).get_json()[0]['id']}"
+        ),
+        lambda: client_app.post(
+            f"/api/quivers/{q['id']}/arrows", json={"name": "A2"}
+        ),
+        lambda: client_app.put(f"/api/quivers/{q['id']}", json={"name": "Q11b"}),
+    ]
+    for write in writes:
+        assert write().status_code in (200, 201, 204)
+        rv = client_app.get(quiver_url, headers={"If-None-Match": quiver_etag})
+        assert rv.status_code == 200
+        quiver_etag = rv.headers["ETag"]
+        assert quiver_etag not in previous
+        previous.add(quiver_etag)
+
+    rv = client_app.get(scores_url, headers={"If-None-Match": scores_etag})
+    assert rv.status_code == 200 and rv.headers["ETag"] != scores_etag
+
+
+def test_stats_cache(client_app, flask_app):
+    """
+    Test memoization of computed views and their invalidation on commit.
+
+    Args:
+        client_app: Flask test client from fixture
+        flask_app: Flask app from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q12"}).get_json()
+    a1 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A1"}
+    ).get_json()
+    a2 = client_app.post(
+        f"/api/quivers/{q['id']}/arrows", json={"name": "A2"}
+    ).get_json()
+    for a in (a1, a2):
+        client_app.post(
+            f"/api/arrows/{a['id']}/scores/batch",
+            json={"scores": [{"score": 10, "x": 0.5, "y": 0.5}, 9]},
+        )
+    stats_cache.clear()
+
+    urls = [
+        f"/api/arrows/{a1['id']}/stats",
+        f"/api/arrows/{a2['id']}/stats",
+        f"/api/arrows/{a1['id']}/grouping",
+        f"/api/quivers/{q['id']}/ranking",
+        f"/api/quivers/{q['id']}/grouping",
+    ]
+    first = [client_app.get(url).get_json() for url in urls]
+    assert [client_app.get(url).get_json() for url in urls] == first
+    info = client_app.get("/api/_cache").get_json()
+    assert info["misses"] == 5 and info["hits"] == 5 and info["size"] == 5
+
+    # A new score on A1 drops A1's and the quiver's entries, but not A2's
+    client_app.post(f"/api/arrows/{a1['id']}/scores", json={"score": 4})
+    assert client_app.get("/api/_cache").get_json()["size"] == 1
+    assert client_app.get(urls[0]).get_json()["count"] == 3
+    assert client_app.get(urls[1]).get_json() == first[1]
+    assert client_app.get(urls[3]).get_json()["count"] == 5
+    info = client_app.get("/api/_cache").get_json()
+    assert info["invalidations"] == 4 and info["hits"] == 6
+
+    # Renaming the quiver only affects quiver-level entries
+    client_app.put(f"/api/quivers/{q['id']}", json={"name": "Q12b"})
+    assert client_app.get("/api/_cache").get_json()["size"] == 2
+
+    # Size- and TTL-based eviction
+    cache = flask_app.extensions["stats_cache"]
+    maxsize, ttl = cache.maxsize, cache.ttl
+    try:
+        cache.maxsize = 2
+        for url in urls:
+            client_app.get(url)
+        assert cache.info()["size"] == 2 and cache.info()["evictions"] >= 3
+        cache.ttl = 0
+        cache.clear()
+        client_app.get(urls[0])
+        client_app.get(urls[0])
+        assert cache.info()["expirations"] == 1 and cache.info()["hits"] == 0
+    finally:
+        cache.maxsize, cache.ttl = maxsize, ttl
+
+    # A write committed by another worker bypasses this worker's listeners, but
+    # bumps the version, so the next read misses instead of serving the old
+    # payload under the new ETag
+    before = client_app.get(urls[0])
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(ArrowStats)
+            .where(ArrowStats.arrow_id == a1["id"])
+            .values(count=ArrowStats.count + 1)
+        )
+        conn.execute(
+            update(Arrow).where(Arrow.id == a1["id"]).values(version=Arrow.version + 1)
+        )
+    db.session.expire_all()
+    after = client_app.get(urls[0])
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert after.get_json()["count"] == before.get_json()["count"] + 1
+
+
+def test_metrics(client_app, caplog):
+    """
+    Test the per-route latency and query histograms and the slow-request log.
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    client_app.get(f"/api/quivers/{q['id']}")
+    client_app.get(f"/api/quivers/{q['id']}")
+    client_app.get("/api/quivers/999")
+
+    response = client_app.get("/api/_metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    samples = dict(
+        line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#")
+    )
+
+    route = 'method="GET",route="/api/quivers/<int:quiver_id>"'
+    assert samples[f'quiverstats_request_duration_seconds_count{{{route},status="200"}}'] == "2"
+    assert samples[f'quiverstats_request_duration_seconds_count{{{route},status="404"}}'] == "1"
+    assert samples[
+        f'quiverstats_request_duration_seconds_bucket{{{route},status="200",le="+Inf"}}'
+    ] == "2"
+    # the quiver and its arrows, twice, then the primary-key miss
+    assert samples[f"quiverstats_request_db_queries_count{{{route}}}"] == "3"
+    assert samples[f"quiverstats_request_db_queries_sum{{{route}}}"] == "5"
+    assert samples[f'quiverstats_request_db_queries_bucket{{{route},le="1"}}'] == "1"
+    assert samples[f'quiverstats_request_db_queries_bucket{{{route},le="2"}}'] == "3"
+    assert float(samples[f"quiverstats_request_db_seconds_sum{{{route}}}"]) > 0
+    assert "quiverstats_stats_cache_hits_total" in samples
+
+    metrics.slow_threshold = 0.0
+    try:
+        with caplog.at_level("WARNING"):
+            client_app.get(f"/api/quivers/{q['id']}?expand=arrows")
+    finally:
+        metrics.slow_threshold = None
+    assert "Slow request GET /api/quivers/" in caplog.text
+    assert "FROM arrow" in caplog.text
+
+
+def test_cascading_delete(client_app):
+    """
+    Test that deleting a populated quiver or arrow removes everything beneath
+    it with a few set-based statements, and leaves other quivers alone.
+    """
+    dataset = seed(quivers=2, arrows_per_quiver=10, scores_per_arrow=10_000)
+    doomed, kept = dataset["quiver_ids"]
+    kept_arrow = dataset["arrow_ids"][1][0]
+    client_app.get(f"/api/quivers/{doomed}/ranking")
+    client_app.get(f"/api/arrows/{kept_arrow}/stats")
+
+    def remaining():
+        return {
+            table: db.session.execute(
+                db.text(f"SELECT count(*) FROM {table}")
+            ).scalar()
+            for table in ("quiver", "arrow", "arrow_score", "arrow_stats")
+        }
+
+    with count_queries() as statements:
+        rv = client_app.delete(f"/api/quivers/{doomed}")
+    assert rv.status_code == 204
+    deletes = [s for s, _ in statements if s.startswith("DELETE")]
+    assert len(deletes) == 6 and len(statements) <= 8
+    assert remaining() == {
+        "quiver": 1, "arrow": 10, "arrow_score": 100_000, "arrow_stats": 10,
+    }
+    assert client_app.get(f"/api/quivers/{doomed}").status_code == 404
+    # the cached ranking of the deleted quiver went with it
+    assert stats_cache.info()["size"] == 1
+
+    rv = client_app.delete(f"/api/arrows/{kept_arrow}")
+    assert rv.status_code == 204
+    assert remaining() == {
+        "quiver": 1, "arrow": 9, "arrow_score": 90_000, "arrow_stats": 9,
+    }
+    assert stats_cache.info()["size"] == 0
+    assert len(client_app.get(f"/api/quivers/{kept}/arrows").get_json()) == 9
+
+
+def test_arrow_trend(client_app):
+    """
+    Test timestamped scores and the per-bucket moving-average trend.
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+
+    rv = client_app.post(f"/api/arrows/{a['id']}/scores", json={"score": 9})
+    assert rv.status_code == 201 and rv.get_json()["shot_at"]
+    rv = client_app.post(
+        f"/api/arrows/{a['id']}/scores", json={"score": 9, "shot_at": "yesterday"}
+    )
+    assert rv.status_code == 400
+
+    shots = [
+        ("2025-03-03T09:00:00", 10),  # Monday
+        ("2025-03-03T18:30:00", 8),
+        ("2025-03-05T12:00:00+02:00", 6),  # Wednesday, 10:00 UTC
+        ("2025-03-09T23:00:00", 9),  # Sunday
+        ("2025-03-10T08:00:00", 4),  # the next Monday
+    ]
+    rv = client_app.post(
+        f"/api/arrows/{a['id']}/scores/batch",
+        json={"scores": [{"score": s, "shot_at": t} for t, s in shots]},
+    )
+    assert rv.status_code == 201
+    scores = client_app.get(f"/api/arrows/{a['id']}/scores").get_json()
+    assert scores[3]["shot_at"] == "2025-03-05T10:00:00"
+
+    trend = client_app.get(f"/api/arrows/{a['id']}/trend?window=2").get_json()
+    assert trend["bucket"] == "day" and trend["window"] == 2
+    points = trend["points"][:4]
+    assert [p["bucket"] for p in points] == [
+        "2025-03-03", "2025-03-05", "2025-03-09", "2025-03-10",
+    ]
+    assert [p["count"] for p in points] == [2, 1, 1, 1]
+    assert points[0]["mean"] == 9.0 and points[0]["min"] == 8.0
+    # weighted by shots: (10 + 8 + 6) / 3, then (6 + 9) / 2, then (9 + 4) / 2
+    assert [p["moving_average"] for p in points] == [9.0, 8.0, 7.5, 6.5]
+    assert [p["moving_count"] for p in points] == [2, 3, 2, 2]
+
+    weekly = client_app.get(f"/api/arrows/{a['id']}/trend?bucket=week").get_json()
+    assert [(p["bucket"], p["count"]) for p in weekly["points"][:2]] == [
+        ("2025-03-03", 4), ("2025-03-10", 1),
+    ]
+    monthly = client_app.get(f"/api/arrows/{a['id']}/trend?bucket=month").get_json()
+    assert monthly["points"][0] == {
+        "bucket": "2025-03-01", "count": 5, "mean": 7.4, "min": 4.0, "max": 10.0,
+        "moving_average": 7.4, "moving_count": 5,
+    }
+
+    assert client_app.get(f"/api/arrows/{a['id']}/trend?bucket=year").status_code == 400
+    assert client_app.get(f"/api/arrows/{a['id']}/trend?window=0").status_code == 400
+    assert client_app.get("/api/arrows/999/trend").status_code == 404
+
+
+def test_daily_rollup(client_app, flask_app):
+    """
+    Test the incremental daily rollup and the trend read over rollup plus tail.
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+    url = f"/api/arrows/{a['id']}/trend?window=3"
+
+    def post(shots):
+        return client_app.post(
+            f"/api/arrows/{a['id']}/scores/batch",
+            json={"scores": [{"score": s, "shot_at": t} for t, s in shots]},
+        ).get_json()["ids"]
+
+    ids = post(
+        [
+            ("2025-04-01T10:00:00", 10),
+            ("2025-04-01T11:00:00", 6),
+            ("2025-04-01T12:00:00", 8),
+            ("2025-04-02T10:00:00", 7),
+        ]
+    )
+    expected = client_app.get(url).get_json()["points"]
+
+    # the first run only records the newest ID; a run once the lag has passed
+    # folds the scores up to it in
+    runner = flask_app.test_cli_runner()
+    result = runner.invoke(args=["rollup", "--batch-size", "3"])
+    assert result.exit_code == 0
+    assert "Rolled up 0 scores; watermark is now score 0." in result.output
+    mark = db.session.get(RollupWatermark, DailyRollup.__tablename__)
+    assert mark.pending_score_id == ids[-1]
+    mark.pending_at -= timedelta(seconds=DEFAULT_LAG)
+    db.session.commit()
+    result = runner.invoke(args=["rollup", "--batch-size", "3"])
+    assert result.exit_code == 0
+    assert f"Rolled up 4 scores; watermark is now score {ids[-1]}." in result.output
+    assert db.session.get(RollupWatermark, DailyRollup.__tablename__).pending_at is None
+    rows = db.session.execute(
+        db.select(DailyRollup).order_by(DailyRollup.day)
+    ).scalars().all()
+    assert [(str(r.day), r.count, r.total, r.min_score, r.max_score) for r in rows] == [
+        ("2025-04-01", 3, 24.0, 6.0, 10.0),
+        ("2025-04-02", 1, 7.0, 7.0, 7.0),
+    ]
+    # same answer from the rollup as from the raw scores
+    stats_cache.clear()
+    assert client_app.get(url).get_json()["points"] == expected
+
+    # new shots on a rolled-up day merge with its row; a second run only
+    # picks up what is new
+    post([("2025-04-02T18:00:00", 9), ("2025-04-03T09:00:00", 5)])
+    with count_queries() as statements:
+        points = client_app.get(url).get_json()["points"]
+    assert [(p["bucket"], p["count"], p["mean"]) for p in points] == [
+        ("2025-04-01", 3, 8.0), ("2025-04-02", 2, 8.0), ("2025-04-03", 1, 5.0),
+    ]
+    assert points[-1]["moving_average"] == 45 / 6
+    assert "arrow_score_daily" in statements[-1][0]
+    result = runner.invoke(args=["rollup", "--lag", "0"])
+    assert "Rolled up 2 scores" in result.output
+    assert client_app.get(url).get_json()["points"] == points
+
+    # deleting a rolled-up score on a bound recomputes its day's min and max
+    assert client_app.delete(f"/api/arrows/scores/{ids[0]}").status_code == 204
+    row = db.session.get(DailyRollup, (a["id"], rows[0].day))
+    assert (row.count, row.total, row.min_score, row.max_score) == (2, 14.0, 6.0, 8.0)
+    client_app.delete(f"/api/arrows/scores/{ids[3]}")
+    points = client_app.get(url).get_json()["points"]
+    assert [(p["bucket"], p["count"]) for p in points] == [
+        ("2025-04-01", 2), ("2025-04-02", 1), ("2025-04-03", 1),
+    ]
+
+    client_app.delete(f"/api/arrows/{a['id']}")
+    assert db.session.scalar(db.select(db.func.count()).select_from(DailyRollup)) == 0
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_archive_round_trip(client_app, tmp_path, fmt, flask_app):
+    """
+    Test exporting the archive and importing it again under new IDs.
+    """
+    dataset = seed(quivers=2, arrows_per_quiver=3, scores_per_arrow=50)
+    client_app.post("/api/quivers", json={"name": "Empty"})
+    first_arrow = dataset["arrow_ids"][0][0]
+    client_app.post(f"/api/arrows/{first_arrow}/scores", json={"score": 7.5})
+
+    rv = client_app.get(f"/api/export?format={fmt}")
+    assert rv.status_code == 200
+    assert rv.mimetype == ("text/csv" if fmt == "csv" else "application/x-ndjson")
+    archive = rv.get_data(as_text=True)
+    assert len(archive.splitlines()) == 3 + 6 + 301 + (fmt == "csv")
+
+    rv = client_app.post(
+        f"/api/import?format={fmt}", data=archive.encode(), content_type="text/plain"
+    )
+    assert rv.status_code == 201
+    assert rv.get_json() == {"quivers": 3, "arrows": 6, "scores": 301}
+
+    quivers = client_app.get("/api/quivers").get_json()
+    assert [q["name"] for q in quivers] == ["Quiver 1", "Quiver 2", "Empty"] * 2
+    copied = client_app.get(f"/api/quivers/{quivers[3]['id']}?expand=scores,stats")
+    original = client_app.get(f"/api/quivers/{quivers[0]['id']}?expand=scores,stats")
+    copied, original = copied.get_json(), original.get_json()
+    for new, old in zip(copied["arrows"], original["arrows"]):
+        assert new["id"] != old["id"] and new["name"] == old["name"]
+        assert new["stats"] == {**old["stats"], "arrow_id": new["id"]}
+        assert [s["score"] for s in new["scores"]] == [s["score"] for s in old["scores"]]
+    heatmaps = [
+        client_app.get(f"/api/quivers/{q['id']}/heatmap").get_json() for q in quivers
+    ]
+    assert heatmaps[3]["count"] == 150
+    assert {**heatmaps[3], "quiver_id": None} == {**heatmaps[0], "quiver_id": None}
+
+    # the CLI writes the same archive and loads it back
+    path = tmp_path / f"archive.{fmt}"
+    runner = flask_app.test_cli_runner()
+    result = runner.invoke(
+        args=["export", "--format", fmt, "--quiver-id", str(quivers[0]["id"]), "-o", str(path)]
+    )
+    assert result.exit_code == 0
+    result = runner.invoke(args=["import", str(path)])
+    assert "Imported 1 quivers, 3 arrows and 151 scores." in result.output
+
+
+def test_archive_import_errors(client_app):
+    """
+    Test that a malformed archive is rejected without writing anything.
+    """
+    lines = [
+        {"type": "quiver", "id": 1, "name": "Q"},
+        {"type": "arrow", "id": 1, "quiver_id": 1, "name": "A"},
+        {"type": "score", "id": 1, "arrow_id": 1, "score": 9},
+        {"type": "score", "id": 2, "arrow_id": 2, "score": 9},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+    rv = client_app.post("/api/import", data=body)
+    assert rv.status_code == 400 and b"Line 4: arrow 2 is not in the archive" in rv.data
+    assert client_app.get("/api/quivers").get_json() == []
+
+    rv = client_app.post("/api/import", data="not json\n")
+    assert rv.status_code == 400 and b"Invalid JSON on line 1" in rv.data
+    rv = client_app.post(
+        "/api/import", data="type,id,name\nquiver,1,\n", content_type="text/csv"
+    )
+    assert rv.status_code == 400 and b"missing field" in rv.data
+
+    # non-finite scores and coordinates are refused, as when posting shots
+    for bad in ({"score": float("nan")}, {"score": 9, "x": float("inf"), "y": 0}):
+        lines[3] = {"type": "score", "id": 2, "arrow_id": 1, **bad}
+        body = "\n".join(json.dumps(line) for line in lines)
+        rv = client_app.post("/api/import", data=body)
+        assert rv.status_code == 400 and b"Line 4: " in rv.data
+    rv = client_app.post(
+        "/api/import?format=csv",
+        data="type,id,quiver_id,arrow_id,name,score\nquiver,1,,,Q,\n"
+        "arrow,1,1,,A,\nscore,1,,1,,nan\n",
+        content_type="text/csv",
+    )
+    assert rv.status_code == 400 and b"Line 4: Score must be a number" in rv.data
+    assert client_app.get("/api/quivers").get_json() == []
+    assert client_app.get("/api/export?format=xml").status_code == 400
+    assert client_app.get("/api/export?quiver_id=99").status_code == 404
+
+
+def test_archive_import_negative_rings(client_app):
+    """
+    Test that imported negative scores land in the ring deleting them empties.
+    """
+    lines = [
+        {"type": "quiver", "id": 1, "name": "Q"},
+        {"type": "arrow", "id": 1, "quiver_id": 1, "name": "A"},
+        {"type": "score", "id": 1, "arrow_id": 1, "score": -1.5},
+        {"type": "score", "id": 2, "arrow_id": 1, "score": -2},
+        {"type": "score", "id": 3, "arrow_id": 1, "score": 2.5},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+    assert client_app.post("/api/import", data=body).status_code == 201
+    arrow_id = db.session.scalar(select(Arrow.id))
+    stats = client_app.get(f"/api/arrows/{arrow_id}/stats").get_json()
+    assert stats["histogram"] == {"-2": 2, "2": 1}
+
+    for score in client_app.get(f"/api/arrows/{arrow_id}/scores").get_json():
+        client_app.delete(f"/api/arrows/scores/{score['id']}")
+    stats = client_app.get(f"/api/arrows/{arrow_id}/stats").get_json()
+    assert stats["count"] == 0 and stats["histogram"] == {}
+
+
+def test_score_impacts():
+    """
+    Test that impacts are scored exactly as the frontend's ScoreCalculator does.
+    """
+    face = FACES["122cm"]
+    step = face.step
+    # centre, far outside, just inside the edge, a ring line, each ring's edge
+    x = [61, 200, 61 + 61 - 0.1, 61 + (61 - 2 * step)]
+    x += [61 + step * (10 - ring + 1) for ring in (1, 5, 10)]
+    scores, x_hits = score_impacts(face, *centre_offsets(face, x, [61] * len(x)))
+    assert scores.tolist() == [10, 0, 1, 3, 1, 5, 10]
+    assert x_hits.tolist() == [True] + [False] * 6
+
+    # centred offsets, and a five-zone face without an X ring
+    scores, _ = score_impacts(face, *centre_offsets(face, [0, 0], [-3.0, 7.0], "centre"))
+    assert scores.tolist() == [10, 9]
+    small = TargetFace("f", 80, 5)
+    scores, x_hits = score_impacts(small, [0, 0, 0], [0, -28, -40])
+    assert scores.tolist() == [5, 2, 1] and not x_hits.any()
+
+    # custom faces need a finite, positive size
+    assert get_face({"size": 80, "rings": 5}).step == 8
+    for size in (0, -1, float("inf"), float("nan"), True, "80"):
+        with pytest.raises(ValueError, match="face size"):
+            get_face({"size": size, "rings": 5})
+
+
+def test_create_impacts(client_app):
+    """
+    Test scoring and storing raw impact coordinates.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+    url = f"/api/arrows/{a['id']}/impacts"
+
+    rv = client_app.post(
+        url,
+        json={
+            "impacts": [
+                [61, 61],
+                {"x": 61, "y": 70, "shot_at": "2025-03-01T10:00:00Z"},
+                [0, 0],
+            ]
+        },
+    )
+    assert rv.status_code == 201
+    body = rv.get_json()
+    assert body["scores"] == [10, 9, 0] and body["x_count"] == 1
+    assert body["face"]["name"] == "122cm" and body["count"] == 3
+    stored = client_app.get(f"/api/arrows/{a['id']}/scores").get_json()
+    assert [(s["score"], s["x"], s["y"]) for s in stored] == [
+        (10, 0, 0),
+        (9, 0, 9),
+        (0, -61, -61),
+    ]
+    assert stored[1]["shot_at"].startswith("2025-03-01T10:00:00")
+    stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+    assert stats["count"] == 3 and stats["sum"] == 19
+
+    rv = client_app.post(
+        url,
+        json={
+            "face": {"size": 40, "rings": 10},
+            "origin": "centre",
+            "impacts": [[0, 1.9], [0, 2.1]],
+        },
+    )
+    assert rv.get_json()["scores"] == [10, 9]
+    rv = client_app.post(url, json={"face": "80cm", "impacts": [[40, 40]]})
+    assert rv.get_json()["scores"] == [10]
+
+    for bad in (
+        {"impacts": []},
+        {"impacts": [[1, 2], [1, "2"]]},
+        {"impacts": [[1, 2, 3]]},
+        {"impacts": [{"x": 1, "y": 2, "shot_at": "yesterday"}]},
+        {"face": "60cm", "impacts": [[1, 2]]},
+        {"face": {"size": 0, "rings": 10}, "impacts": [[1, 2]]},
+        {"origin": "middle", "impacts": [[1, 2]]},
+    ):
+        assert client_app.post(url, json=bad).status_code == 400
+    assert client_app.get(f"/api/arrows/{a['id']}/stats").get_json()["count"] == 6
+    rv = client_app.post("/api/arrows/999/impacts", json={"impacts": [[1, 2]]})
+    assert rv.status_code == 404
+
+
+def test_heatmap(client_app):
+    """
+    Test that impact heatmaps follow score inserts and deletes.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a1 = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A1"}).get_json()
+    a2 = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A2"}).get_json()
+
+    def grid(url):
+        body = client_app.get(url).get_json()
+        counts = np.frombuffer(base64.b64decode(body["counts"]), dtype=body["dtype"])
+        return counts.reshape(body["size"], body["size"]), body
+
+    counts, body = grid(f"/api/arrows/{a1['id']}/heatmap")
+    assert body["size"] == 64 and body["count"] == 0 and not counts.any()
+
+    client_app.post(
+        f"/api/arrows/{a1['id']}/scores/batch",
+        json={
+            "scores": [
+                {"score": 10, "x": 0.5, "y": 0.5},
+                {"score": 10, "x": 0.9, "y": 0.1},
+                {"score": 3, "x": -40.0, "y": 20.0},
+                {"score": 0, "x": 90.0, "y": 0.0},
+                7,
+            ]
+        },
+    )
+    single = client_app.post(
+        f"/api/arrows/{a2['id']}/scores", json={"score": 9, "x": 0.5, "y": 0.5}
+    ).get_json()
+
+    counts, body = grid(f"/api/arrows/{a1['id']}/heatmap")
+    assert body["count"] == 3 and body["outside"] == 1
+    assert counts[32, 32] == 2 and counts[42, 11] == 1
+    counts, body = grid(f"/api/quivers/{q['id']}/heatmap")
+    assert body["count"] == 4 and counts[32, 32] == 3
+
+    assert client_app.delete(f"/api/arrows/scores/{single['id']}").status_code == 204
+    counts, body = grid(f"/api/quivers/{q['id']}/heatmap")
+    assert body["count"] == 3 and counts[32, 32] == 2
+
+    assert client_app.get("/api/arrows/999/heatmap").status_code == 404
+    assert client_app.get("/api/quivers/999/heatmap").status_code == 404
+
+
+def test_quiver_comparison(client_app, flask_app):
+    """
+    Test bootstrap intervals and pairwise comparisons between arrows.
+
+    Args:
+        client_app: Flask test client from fixture
+        flask_app: Flask app from fixture
+    """
+    dataset = seed(quivers=1, arrows_per_quiver=3, scores_per_arrow=200)
+    quiver_id = dataset["quiver_ids"][0]
+    good, bad = (
+        client_app.post(f"/api/quivers/{quiver_id}/arrows", json={"name": name}).get_json()
+        for name in ("Good", "Bad")
+    )
+    client_app.post(f"/api/arrows/{good['id']}/scores/batch", json={"scores": [10, 9] * 20})
+    client_app.post(f"/api/arrows/{bad['id']}/scores/batch", json={"scores": [2, 3] * 20})
+    client_app.post(f"/api/quivers/{quiver_id}/arrows", json={"name": "Unused"})
+
+    url = f"/api/quivers/{quiver_id}/comparison?resamples=500"
+    rv = client_app.get(url)
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert [a["count"] for a in body["arrows"]] == [200, 200, 200, 40, 40, 0]
+    for arrow in body["arrows"][:5]:
+        low, high = arrow["ci"]
+        assert low <= arrow["mean"] <= high
+    assert body["arrows"][5]["ci"] is None and body["arrows"][5]["mean"] is None
+    assert len(body["pairs"]) == 10
+    pair = next(
+        p for p in body["pairs"] if (p["arrow_id"], p["other_id"]) == (good["id"], bad["id"])
+    )
+    assert pair["significant"] and pair["difference"] == 7.0 and pair["p_adjusted"] < 0.01
+    assert pair["ci_excludes_zero"]
+    # significance follows the adjusted p-value, not the unadjusted interval
+    assert all(p["significant"] == (p["p_adjusted"] < 0.05) for p in body["pairs"])
+
+    # fixed seeds: the same answer in-process, from a worker pool, and uncached
+    stats_cache.clear()
+    flask_app.config["BOOTSTRAP_WORKERS"] = 2
+    try:
+        assert client_app.get(url).get_json() == body
+    finally:
+        flask_app.config["BOOTSTRAP_WORKERS"] = 1
+    assert client_app.get(url + "&seed=1").get_json()["arrows"] != body["arrows"]
+
+    base = f"/api/quivers/{quiver_id}/comparison"
+    assert client_app.get(base + "?resamples=0").status_code == 400
+    assert client_app.get(base + "?confidence=1.5").status_code == 400
+    assert client_app.get("/api/quivers/999/comparison").status_code == 404
+
+    result = flask_app.test_cli_runner().invoke(
+        args=["compare", str(quiver_id), "--resamples", "200", "--workers", "1"]
+    )
+    assert result.exit_code == 0
+    assert "Good: mean 9.500" in result.output and "Unused: no scores" in result.output
+    for confidence in ("1", "0", "-0.5"):
+        result = flask_app.test_cli_runner().invoke(
+            args=["compare", str(quiver_id), "--confidence", confidence]
+        )
+        assert result.exit_code == 2
+        assert "confidence must be between 0 and 1" in result.output
+
+
+def test_dashboard(client_app):
+    """
+    Test the one-query dashboard summary, its sorting and its pagination.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    dataset = seed(quivers=3, arrows_per_quiver=2, scores_per_arrow=20)
+    empty = client_app.post("/api/quivers", json={"name": "Empty"}).get_json()
+    arrow = dataset["arrow_ids"][1][0]
+    client_app.post(
+        f"/api/arrows/{arrow}/scores",
+        json={"score": 10, "shot_at": "2025-06-01T12:00:00"},
+    )
+
+    with count_queries() as statements:
+        rv = client_app.get("/api/dashboard")
+    assert rv.status_code == 200 and len(statements) == 2
+    body = rv.get_json()
+    assert body["total"] == 4 and body["sort"] == "id"
+    summaries = body["quivers"]
+    assert [q["name"] for q in summaries] == ["Quiver 1", "Quiver 2", "Quiver 3", "Empty"]
+    assert [q["arrows"] for q in summaries] == [2, 2, 2, 0]
+    assert [q["shots"] for q in summaries] == [40, 41, 40, 0]
+    ranking = client_app.get(f"/api/quivers/{dataset['quiver_ids'][1]}/ranking").get_json()
+    assert summaries[1]["mean"] == pytest.approx(ranking["mean"])
+    assert summaries[1]["last_activity"] == "2025-06-01T12:00:00"
+    assert summaries[0]["last_activity"] < "2025-01-01"
+    assert summaries[3]["mean"] is None and summaries[3]["last_activity"] is not None
+
+    # sorting, with quivers without scores last either way
+    for order in ("asc", "desc"):
+        rv = client_app.get(f"/api/dashboard?sort=mean&order={order}")
+        means = [q["mean"] for q in rv.get_json()["quivers"]]
+        assert means[-1] is None
+        assert means[:3] == sorted(means[:3], reverse=order == "desc")
+    rv = client_app.get("/api/dashboard?sort=last_activity&order=desc&limit=2")
+    assert [q["id"] for q in rv.get_json()["quivers"]] == [
+        empty["id"],
+        dataset["quiver_ids"][1],
+    ]
+
+    # pagination
+    rv = client_app.get("/api/dashboard?sort=shots&order=desc&limit=2&offset=2")
+    body = rv.get_json()
+    assert body["total"] == 4 and [q["shots"] for q in body["quivers"]] == [40, 0]
+    assert body["quivers"][1]["id"] == empty["id"]
+
+    for query in ("sort=size", "order=up", "limit=0", "limit=501", "offset=-1"):
+        assert client_app.get(f"/api/dashboard?{query}").status_code == 400
+
+
+def test_write_behind(client_app):
+    """
+    Test buffered score submission, read-your-writes, backpressure and flushing.
+
+    Args:
+        client_app: Flask test client from fixture
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+    doomed = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "B"}).get_json()
+    url = f"/api/arrows/{a['id']}/scores"
+
+    def stored():
+        return db.session.execute(db.text("SELECT count(*) FROM arrow_score")).scalar()
+
+    write_buffer.enabled = True
+    write_buffer.batch_size, write_buffer.flush_interval = 1000, 3600.0
+    try:
+        responses = [
+            client_app.post(url, json={"score": v, "x": 0, "y": 0}) for v in (8, 9, 10)
+        ]
+        assert [rv.status_code for rv in responses] == [202] * 3
+        bodies = [rv.get_json() for rv in responses]
+        assert all(body["id"] is None for body in bodies)
+        assert len({body["provisional_id"] for body in bodies}) == 3
+        assert stored() == 0 and write_buffer.pending(arrow_id=a["id"]) == 3
+
+        # reading the arrow flushes its pending scores first
+        stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+        assert stats["count"] == 3 and stats["sum"] == 27
+        assert write_buffer.pending() == 0 and write_buffer.batches == 1
+        client_app.post(url, json={"score": 5})
+        ranking = client_app.get(f"/api/quivers/{q['id']}/ranking").get_json()
+        assert ranking["arrows"][0]["count"] == 4
+
+        # a full queue turns submitters away
+        write_buffer.max_pending, write_buffer.submit_timeout = 2, 0.01
+        client_app.post(url, json={"score": 1})
+        client_app.post(f"/api/arrows/{doomed['id']}/scores", json={"score": 1})
+        rv = client_app.post(url, json={"score": 1})
+        assert rv.status_code == 503 and rv.headers["Retry-After"] == "1"
+
+        # scores of a deleted arrow are dropped; the rest are flushed on close
+        client_app.delete(f"/api/arrows/{doomed['id']}")
+        write_buffer.close()
+        assert stored() == 5 and write_buffer.dropped == 1
+
+        # a full batch is written by the background thread
+        write_buffer.batch_size = 2
+        client_app.post(url, json={"score": 7})
+        client_app.post(url, json={"score": 7})
+        for _ in range(200):
+            if not write_buffer.pending():
+                break
+            time.sleep(0.01)
+        assert stored() == 7
+        assert "quiverstats_write_buffer_flushed_total 7" in client_app.get(
+            "/api/_metrics"
+        ).get_data(as_text=True)
+    finally:
+        write_buffer.close()
+        write_buffer.enabled = False
+        write_buffer.__init__()
+
+
+def test_write_behind_retries(client_app, monkeypatch):
+    """
+    Test that failed write-behind batches are retried and only rejected shots dropped.
+
+    Args:
+        client_app: Flask test client from fixture
+        monkeypatch: pytest fixture for patching the batch insert
+    """
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+    url = f"/api/arrows/{a['id']}/scores"
+    outages = [1]
+
+    def flaky_insert(arrows, rows):
+        if outages[0]:
+            outages[0] -= 1
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        if any(row["score"] == 10.5 for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("constraint failed"))
+        return bulk_insert_scores(arrows, rows)
+
+    monkeypatch.setattr(writebehind, "bulk_insert_scores", flaky_insert)
+    write_buffer.enabled = True
+    write_buffer.batch_size, write_buffer.flush_interval = 1000, 3600.0
+    write_buffer.retry_backoff = 0.01
+    try:
+        for value in (8, 10.5, 9):
+            assert client_app.post(url, json={"score": value}).status_code == 202
+
+        # a transient failure keeps the shots queued, and the read is refused
+        rv = client_app.get(f"/api/arrows/{a['id']}/stats")
+        assert rv.status_code == 503
+        assert write_buffer.info()["pending"] == 3 and write_buffer.retries == 1
+
+        # on retry the batch is written shot by shot around the rejected one
+        stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+        assert stats["count"] == 2 and stats["sum"] == 17
+        info = write_buffer.info()
+        assert info["pending"] == 0 and info["dropped"] == 1 and info["flushed"] == 2
+        assert "quiverstats_write_buffer_retries_total 1" in client_app.get(
+            "/api/_metrics"
+        ).get_data(as_text=True)
+
+        # at shutdown, shots that still cannot be written are given up after a while
+        outages[0] = 10**6
+        write_buffer.close_timeout = 0.05
+        client_app.post(url, json={"score": 7})
+        write_buffer.close()
+        assert write_buffer.info() == {
+            "pending": 0, "flushed": 2, "batches": 2, "dropped": 2,
+            "retries": write_buffer.retries,
+        }
+        assert write_buffer.retries > 2
+    finally:
+        outages[0] = 0
+        write_buffer.close()
+        write_buffer.enabled = False
+        write_buffer.__init__()
+
+def test_quiver_events(client_app, monkeypatch):
+    """
+    Test the event stream of a quiver: delivery, replay, overflow and shutdown.
+
+    Args:
+        client_app: Flask test client from fixture
+        monkeypatch: pytest fixture for shrinking the subscriber queue
+    """
+
+    def parse(chunk):
+        events = []
+        for frame in chunk.decode().split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in frame.splitlines() if ": " in line
+            )
+            if "event" in fields:
+                events.append(
+                    (fields.get("id"), fields["event"], json.loads(fields["data"]))
+                )
+        return events
+
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    other = client_app.post("/api/quivers", json={"name": "Other"}).get_json()
+    url = f"/api/quivers/{q['id']}/events"
+    assert client_app.get("/api/quivers/999/events").status_code == 404
+    assert client_app.get(f"{url}?timeout=soon").status_code == 400
+
+    rv = client_app.get(url)
+    assert rv.mimetype == "text/event-stream"
+    stream = iter(rv.response)
+    assert next(stream).startswith(b"retry: ")
+    assert event_hub.info()["subscribers"] == 1
+
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+    [(first_id, event, data)] = parse(next(stream))
+    assert event == "arrow_created" and data["id"] == a["id"]
+
+    # a batch arrives as one event with the new IDs; other quivers stay silent
+    client_app.post(f"/api/quivers/{other['id']}/arrows", json={"name": "B"})
+    ids = client_app.post(
+        f"/api/arrows/{a['id']}/scores/batch",
+        json={"scores": [9, {"score": 10, "x": 1.5, "y": -2.0}]},
+    ).get_json()["ids"]
+    [(_, event, data)] = parse(next(stream))
+    assert event == "scores_created" and data["arrow_id"] == a["id"]
+    assert [s["id"] for s in data["scores"]] == ids
+    assert data["scores"][1]["x"] == 1.5
+
+    client_app.delete(f"/api/arrows/scores/{ids[0]}")
+    client_app.put(f"/api/arrows/{a['id']}", json={"name": "A2"})
+    events = parse(next(stream))
+    assert [(e, d.get("ids") or d.get("name")) for _, e, d in events] == [
+        ("scores_deleted", [ids[0]]),
+        ("arrow_updated", "A2"),
+    ]
+    # a rolled-back write publishes nothing
+    assert client_app.post(f"/api/arrows/{a['id']}/scores", json={}).status_code == 400
+    client_app.post(f"/api/arrows/{a['id']}/scores", json={"score": 7})
+    [(_, event, data)] = parse(next(stream))
+    assert event == "scores_created" and data["scores"][0]["score"] == 7
+    rv.close()
+    assert event_hub.info()["subscribers"] == 0
+
+    # reconnecting clients get what they missed, or a reset
+    replay = client_app.get(
+        f"{url}?timeout=0", headers={"Last-Event-ID": first_id}
+    ).get_data()
+    assert [e for _, e, _ in parse(replay)] == [
+        "scores_created",
+        "scores_deleted",
+        "arrow_updated",
+        "scores_created",
+    ]
+    stale = client_app.get(f"{url}?timeout=0&last_event_id=0-1").get_data()
+    assert parse(stale) == [(None, "reset", {"reason": "unknown"})]
+
+    # a subscriber that falls behind is reset and dropped
+    monkeypatch.setattr(event_hub, "queue_size", 2)
+    rv = client_app.get(url)
+    stream = iter(rv.response)
+    next(stream)
+    for name in ("C", "D", "E"):
+        client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": name})
+    assert parse(next(stream)) == [(None, "reset", {"reason": "overflow"})]
+    assert next(stream, None) is None
+    assert event_hub.info()["overflows"] == 1
+    rv.close()
+
+    # deleting the quiver ends its streams
+    rv = client_app.get(url)
+    stream = iter(rv.response)
+    next(stream)
+    client_app.delete(f"/api/quivers/{q['id']}")
+    assert [e for _, e, _ in parse(next(stream))] == ["quiver_deleted"]
+    assert next(stream, None) is None
+    assert event_hub.info()["subscribers"] == 0
+
+    # resetting the hub ends open streams and forgets the counters
+    sub = event_hub.subscribe(q["id"])
+    event_hub.reset()
+    assert sub.closed and sub.take(0) == []
+    assert event_hub.info() == {
+        "subscribers": 0, "quivers": 0, "published": 0, "overflows": 0
+    }
+
+
+def test_replica_routing(client_app, tmp_path, flask_app):
+    """
+    Test that reads go to a replica unless they must see recent writes.
+
+    Args:
+        client_app: Flask test client from fixture
+        tmp_path: Temporary directory for the replica database file
+        flask_app: Flask app from fixture
+    """
+    path = tmp_path / "replica.db"
+    replica = create_engine(f"sqlite:///{path}")
+
+    def replicate():
+        with sqlite3.connect(path) as target:
+            db.engine.raw_connection().driver_connection.backup(target)
+        db.session.remove()  # a fresh session, as in a new request
+
+    q = client_app.post("/api/quivers", json={"name": "Q"}).get_json()
+    a = client_app.post(f"/api/quivers/{q['id']}/arrows", json={"name": "A"}).get_json()
+    client_app.post(f"/api/arrows/{a['id']}/scores", json={"score": 9})
+    replicate()
+    db.engines[REPLICA] = replica
+    try:
+        # recent writes are read back from the primary
+        client_app.post(f"/api/arrows/{a['id']}/scores", json={"score": 7})
+        db.session.remove()
+        stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+        assert stats["count"] == 2 and replica_router.primary_reads == 1
+
+        # once the lag window has passed, the stale replica answers
+        replica_router.max_lag = 0
+        db.session.remove()
+        stats_cache.clear()
+        stats = client_app.get(f"/api/arrows/{a['id']}/stats").get_json()
+        assert stats["count"] == 1 and replica_router.replica_reads == 1
+
+        # a session that writes stays on the primary
+        db.session.info["use_replica"] = True
+        assert db.session.get_bind(clause=select(Quiver)) is replica
+        assert db.session.get_bind(clause=delete(Quiver)) is db.engine
+        assert db.session.get_bind(clause=select(Quiver)) is db.engine
+        db.session.remove()
+
+        # a failing replica falls back to the primary and is skipped for a while
+        with replica.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE arrow_stats")
+        stats_cache.clear()
+        rv = client_app.get(f"/api/arrows/{a['id']}/stats")
+        assert rv.status_code == 200 and rv.get_json()["count"] == 2
+        assert replica_router.fallbacks == 1
+        client_app.get(f"/api/quivers/{q['id']}")
+        assert (replica_router.replica_reads, replica_router.primary_reads) == (2, 2)
+        assert "quiverstats_replica_fallbacks_total 1" in client_app.get(
+            "/api/_metrics"
+        ).get_data(as_text=True)
+    finally:
+        del db.engines[REPLICA]
+        replica.dispose()
+        replica_router.max_lag = flask_app.config["REPLICA_MAX_LAG"]
+
+
+def test_create_app(tmp_path):
+    """
+    Test the app factory's engine settings and its lazy start-up.
+
+    Args:
+        tmp_path: Temporary directory for a SQLite database file
+    """
+    # server databases get a sized, recycled and pre-pinged pool
+    options = engine_options("postgresql://user@localhost/quivers", DEFAULTS)
+    assert options == {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    }
+    assert engine_options("sqlite:///quivers.db", DEFAULTS) == {}
+    bare = Flask(__name__)
+    bare.config.update(
+        SQLALCHEMY_DATABASE_URI="postgresql://user@primary/quivers",
+        SQLALCHEMY_ENGINE_OPTIONS={"pool_size": 3},
+        SQLALCHEMY_BINDS={REPLICA: "postgresql+psycopg2://user@replica/quivers"},
+        DB_MAX_OVERFLOW=5,
+    )
+    configure_engines(bare)
+    assert bare.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_size"] == 3
+    assert bare.config["SQLALCHEMY_ENGINE_OPTIONS"]["max_overflow"] == 5
+    assert bare.config["SQLALCHEMY_BINDS"][REPLICA]["url"].endswith("@replica/quivers")
+    assert bare.config["SQLALCHEMY_BINDS"][REPLICA]["pool_pre_ping"] is True
+
+    # SQLite connections are tuned with pragmas
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'tuned.db'}",
+            "SQLITE_BUSY_TIMEOUT": 2500,
+        }
+    )
+    with app.app_context():
+        pragmas = {
+            name: db.session.execute(db.text(f"PRAGMA {name}")).scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size")
+        }
+        db.session.remove()
+        db.engine.dispose()
+    assert pragmas == {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "busy_timeout": 2500,
+        "mmap_size": DEFAULTS["SQLITE_MMAP_SIZE"],
+    }
+    assert app.extensions["startup_seconds"] > 0
+
+    # a fresh worker starts without NumPy or Alembic
+    script = (
+        "import sys; from backend.app import create_app; "
+        "app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}); "
+        "print(sorted(m for m in ('numpy', 'alembic') if m in sys.modules)); "
+        "print(app.test_client().get('/api/_metrics').get_data(as_text=True))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).resolve().parents[2],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.startswith("[]\n")
+    assert re.search(r"^quiverstats_startup_seconds [0-9.e-]+$", output, re.M)
+
+
+def test_json_providers(client_app, flask_app):
+    """
+    Test that both JSON providers render the listings identically.
+
+    Args:
+        client_app: Flask test client from fixture
+        flask_app: Flask app from fixture
+    """
+    quiver_id = client_app.post("/api/quivers", json={"name": "Q"}).get_json()["id"]
+    rv = client_app.post(f"/api/quivers/{quiver_id}/arrows", json={"name": "A"})
+    arrow_id = rv.get_json()["id"]
+    shots = [
+        {"score": 9, "x": 1.5, "y": -2.0, "shot_at": "2024-05-01T10:00:00"},
+        {"score": 10},
+    ]
+    client_app.post(f"/api/arrows/{arrow_id}/scores/batch", json={"scores": shots})
+
+    def render():
+        bodies = {}
+        for url in (
+            f"/api/arrows/{arrow_id}/scores",
+            f"/api/arrows/{arrow_id}/scores?format=ndjson",
+            f"/api/arrows/{arrow_id}/scores?limit=1",
+            f"/api/quivers/{quiver_id}?expand=scores",
+            f"/api/quivers/{quiver_id}/arrows",
+            "/api/quivers",
+        ):
+            rv = client_app.get(url)
+            assert rv.status_code == 200
+            bodies[url] = rv.get_data(as_text=True)
+        return bodies
+
+    expected = OrjsonProvider if orjson is not None else StdlibProvider
+    assert isinstance(flask_app.json, expected)
+    fast = render()
+    flask_app.json = StdlibProvider(flask_app)
+    slow = render()
+    assert fast.keys() == slow.keys()
+    for url, body in fast.items():
+        parsed = [json.loads(line) for line in body.splitlines()]
+        assert parsed == [json.loads(line) for line in slow[url].splitlines()]
+
+    scores = json.loads(fast[f"/api/arrows/{arrow_id}/scores"])
+    assert scores[0] == {
+        "id": scores[0]["id"],
+        "score": 9.0,
+        "x": 1.5,
+        "y": -2.0,
+        "shot_at": "2024-05-01T10:00:00",
+    }
+    assert isinstance(scores[1]["score"], float) and scores[1]["shot_at"] is not None
+
+    # values the routes hand over unconverted encode the same way
+    value = {"score": Decimal("9.5"), "at": datetime(2024, 5, 1, 10), "n": np.int64(3)}
+    assert json.loads(flask_app.json.dumps(value)) == {
+        "score": 9.5,
+        "at": "2024-05-01T10:00:00",
+        "n": 3,
+    }
+
+    # the provider is chosen through the config
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "JSON_PROVIDER": "stdlib"})
+    assert isinstance(app.json, StdlibProvider)
+    bare = Flask(__name__)
+    bare.config["JSON_PROVIDER"] = "simplejson"
+    with pytest.raises(ValueError):
+        serialization.init_app(bare)
@@ -0,0 +1,141 @@
+"""
+This module contains tests for the QuiverStats benchmark suite.
+
+It runs the suite against a tiny seeded dataset and checks the regression
+comparison, so the benchmarks keep working as routes are added.
+"""
+
+import argparse
+import json
+import pytest
+from backend.bench.load import (
+    DEFAULT_MIX,
+    compare as compare_load,
+    drive,
+    parse_mix,
+    percentile,
+    prepare,
+    running_server,
+    summarize,
+)
+from backend.bench.runner import compare, run_benchmarks, scenarios, uncovered_routes
+from backend.bench.seed import seed
+from backend.bench.serialization import pipelines, render, run
+
+
+def test_every_route_has_a_scenario(flask_app):
+    """
+    Test that each API route is exercised by at least one benchmark scenario.
+    """
+    assert uncovered_routes(flask_app, scenarios()) == []
+
+
+def test_seed_and_run(client_app, flask_app):
+    """
+    Test seeding a small archive and benchmarking every route against it.
+
+    Args:
+        client_app: Flask test client from fixture
+        flask_app: Flask app from fixture
+    """
+    dataset = seed(2, 3, 40)
+    assert len(dataset["arrow_ids"]) == 2 and len(dataset["arrow_ids"][0]) == 3
+
+    arrow_id = dataset["arrow_ids"][0][0]
+    stats = client_app.get(f"/api/arrows/{arrow_id}/stats").get_json()
+    scores = client_app.get(f"/api/arrows/{arrow_id}/scores").get_json()
+    assert stats["count"] == len(scores) == 40
+    assert stats["sum"] == sum(s["score"] for s in scores)
+
+    results = run_benchmarks(flask_app, dataset, repeat=2, batch_size=10)
+    assert len(results) == len(scenarios())
+    for result in results.values():
+        assert result["calls"] == 2 and result["median_ms"] > 0
+    assert results["GET /api/quivers/<id>?expand=scores,stats"]["queries"] == 4
+
+
+@pytest.mark.parametrize(
+    "current, regressed",
+    [
+        ({"median_ms": 10.0, "queries": 3}, False),
+        ({"median_ms": 20.9, "queries": 3}, False),
+        ({"median_ms": 30.0, "queries": 3}, True),
+        ({"median_ms": 5.0, "queries": 4}, True),
+    ],
+)
+def test_compare(current, regressed):
+    """
+    Test that latency and query-count regressions are reported.
+
+    Args:
+        current (dict): The result of the current run for one route.
+        regressed (bool): Whether a regression should be reported.
+    """
+    baseline = {"GET /api/quivers": {"median_ms": 10.0, "queries": 3}}
+    messages = compare({"GET /api/quivers": current}, baseline, latency_tolerance=2.0)
+    assert bool(messages) == regressed
+    assert compare({}, baseline) == ["GET /api/quivers: missing from this run"]
+
+
+def test_serialization_pipelines(flask_app):
+    """
+    Test that every benchmarked serialization pipeline renders the same listing.
+
+    Args:
+        flask_app: Flask app from fixture
+    """
+    arrow_id = seed(1, 1, 30)["arrow_ids"][0][0]
+    for ndjson in (False, True):
+        bodies = []
+        for pipeline in pipelines(flask_app).values():
+            body = render(flask_app, pipeline, arrow_id, ndjson)
+            bodies.append([json.loads(line) for line in body.splitlines()])
+        assert len(bodies[0]) == (30 if ndjson else 1)
+        assert all(body == bodies[0] for body in bodies)
+
+    results = run(flask_app, arrow_id, 30, repeat=1)
+    assert results.keys() == pipelines(flask_app).keys()
+    assert all(result["us_per_row"] > 0 for result in results.values())
+
+
+def test_parse_mix_and_percentile():
+    """
+    Test parsing the load test's route mix and taking latency percentiles.
+    """
+    assert parse_mix("create_score=3, get_quiver=1") == {
+        "create_score": 3.0,
+        "get_quiver": 1.0,
+    }
+    for text in ("create_score=0", "create_score=x", "delete_everything=1", ""):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_mix(text)
+    values = [float(v) for v in range(1, 101)]
+    assert [percentile(values, q) for q in (50, 95, 99, 100)] == [50.0, 95.0, 99.0, 100.0]
+    assert percentile([], 50) is None
+
+
+def test_load_run(tmp_path):
+    """
+    Test a short load run against pre-forked workers on a SQLite file.
+
+    Args:
+        tmp_path: Temporary directory for the database file
+    """
+    database_url = f"sqlite:///{tmp_path / 'load.db'}"
+    dataset = prepare(database_url, 2, 2, 20)
+    with pytest.raises(ValueError):
+        prepare(database_url, 1, 1, 1)
+
+    with running_server(database_url, 2, "werkzeug") as address:
+        records, elapsed = drive(address, dataset, DEFAULT_MIX, clients=3, duration=1.0)
+    report = summarize(records, elapsed)
+    assert set(report["routes"]) <= set(DEFAULT_MIX)
+    total = report["total"]
+    assert total["requests"] == len(records) > 0
+    assert total["errors"] == 0 and total["throughput_rps"] > 0
+    assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"] <= total["max_ms"]
+
+    failed = summarize(records + [("get_dashboard", 0.1, 503)], elapsed)
+    assert failed["routes"]["get_dashboard"]["errors_by_kind"] == {"503": 1}
+    lines = compare_load(failed, report)
+    assert lines[-1].startswith("total: ") and len(lines) == len(report["routes"]) + 1
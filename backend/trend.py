@@ -0,0 +1,100 @@
+"""
+Score trends over time for the QuiverStats backend.
+
+Timestamped scores are grouped into day, week or month buckets and a moving
+average is taken over the most recent buckets, all inside one SQL query using
+a window function, so only one row per bucket ever reaches Python no matter
+how many years of shots an arrow has. The buckets are built from the daily
+rollup plus the not-yet-rolled tail (see ``backend.rollup``), so the query
+scans one row per day rather than one per shot.
+"""
+
+from sqlalchemy import func, select
+
+from backend.extensions import db
+from backend.rollup import daily_aggregates
+
+BUCKETS = ("day", "week", "month")
+
+
+def _bucket_start(bucket, dialect, day):
+    """
+    Build the SQL expression for the start of the bucket a day falls into.
+
+    Weeks start on Monday, as with PostgreSQL's ``date_trunc``.
+
+    Args:
+        bucket (str): One of :data:`BUCKETS`.
+        dialect (str): The name of the database dialect.
+        day (ColumnElement): The day column.
+
+    Returns:
+        ColumnElement: The bucket start, a date string on SQLite and a
+        timestamp elsewhere.
+    """
+    if dialect != "sqlite":
+        return func.date_trunc(bucket, day)
+    if bucket == "day":
+        return func.date(day)
+    if bucket == "week":
+        # forward to the coming Sunday (or stay on it), then back to Monday
+        return func.date(day, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", day)
+
+
+def _iso_date(value):
+    """Render a bucket start, as returned by either dialect, as YYYY-MM-DD."""
+    return value[:10] if isinstance(value, str) else value.isoformat()[:10]
+
+
+def score_trend(arrow_id, bucket="day", window=7):
+    """
+    Aggregate an arrow's timestamped scores per bucket with a moving average.
+
+    The moving average spans the last ``window`` buckets that contain shots,
+    up to and including the current one, and is weighted by the number of
+    shots in each bucket. Scores without a timestamp are left out.
+
+    Args:
+        arrow_id (int): The ID of the arrow.
+        bucket (str): One of :data:`BUCKETS`.
+        window (int): The number of buckets the moving average spans.
+
+    Returns:
+        list[dict]: One entry per bucket in time order, with the bucket start
+        date, the count, mean, minimum and maximum of its scores, and the
+        moving average and shot count over the window ending there.
+    """
+    dialect = db.session.get_bind().dialect.name
+    days = daily_aggregates(arrow_id, dialect)
+    start = _bucket_start(bucket, dialect, days.c.day).label("bucket")
+    per_bucket = (
+        select(
+            start,
+            func.sum(days.c.count).label("count"),
+            func.sum(days.c.total).label("total"),
+            func.min(days.c.min_score).label("min"),
+            func.max(days.c.max_score).label("max"),
+        )
+        .group_by(start)
+        .subquery()
+    )
+    over = {"order_by": per_bucket.c.bucket, "rows": (-(window - 1), 0)}
+    stmt = select(
+        per_bucket,
+        func.sum(per_bucket.c.total).over(**over).label("window_total"),
+        func.sum(per_bucket.c.count).over(**over).label("window_count"),
+    ).order_by(per_bucket.c.bucket)
+
+    return [
+        {
+            "bucket": _iso_date(row.bucket),
+            "count": int(row.count),
+            "mean": row.total / row.count,
+            "min": row.min,
+            "max": row.max,
+            "moving_average": row.window_total / row.window_count,
+            "moving_count": int(row.window_count),
+        }
+        for row in db.session.execute(stmt)
+    ]
@@ -0,0 +1,77 @@
+"""
+Version counters and conditional GET support for the QuiverStats backend.
+
+Every quiver and arrow carries a ``version`` that the write routes bump
+whenever the quiver or arrow, or anything beneath it, changes. Read routes
+derive a weak ETag from the version of the row they already look up first,
+so a matching ``If-None-Match`` is answered with ``304 Not Modified`` after a
+single primary-key lookup, before any child table is queried.
+"""
+
+from flask import Response, request
+
+from backend.models import Arrow, Quiver
+
+
+def touch(*objects):
+    """
+    Bump the version of quivers and arrows, and of the quivers above the arrows.
+
+    The increment is applied in SQL when the session flushes, so concurrent
+    writers never lose an update.
+
+    Args:
+        *objects (Quiver | Arrow): The rows whose content changed.
+    """
+    quivers = {obj.quiver for obj in objects if isinstance(obj, Arrow)}
+    for obj in objects:
+        obj.version = type(obj).version + 1
+    for q in quivers:
+        if q not in objects:
+            q.version = Quiver.version + 1
+
+
+def etag_for(obj):
+    """
+    Build the ETag value for a versioned row.
+
+    Args:
+        obj (Quiver | Arrow): The row the response is derived from.
+
+    Returns:
+        str: The (unquoted) entity tag.
+    """
+    return f"{obj.__tablename__}-{obj.id}-{obj.version}"
+
+
+def not_modified(etag):
+    """
+    Answer a conditional GET whose ``If-None-Match`` matches the current ETag.
+
+    Args:
+        etag (str): The current entity tag of the requested resource.
+
+    Returns:
+        flask.Response | None: A 304 response, or None if the client's copy is
+        stale and the full response must be built.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def tagged(response, etag):
+    """
+    Attach a weak ETag to a response.
+
+    Args:
+        response (flask.Response): The response to tag.
+        etag (str): The entity tag.
+
+    Returns:
+        flask.Response: The same response.
+    """
+    response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,392 @@
+"""
+Write-behind buffering of single score submissions.
+
+With ``WRITE_BEHIND`` enabled, ``POST /api/arrows/<id>/scores`` validates the
+shot, puts it on a bounded in-process queue and answers ``202 Accepted`` with
+a provisional ID straight away. A background thread drains the queue in
+batches, one bulk insert and one commit per batch, once ``batch_size`` shots
+are waiting or the oldest has waited ``flush_interval`` seconds, so a burst of
+archers no longer queues up behind one commit per shot.
+
+When the queue is full, submitters wait up to ``submit_timeout`` seconds for
+room and are then turned away with ``503 Service Unavailable``. Before a read
+of an arrow or quiver with buffered shots, or of the whole archive, the
+pending shots are flushed synchronously, so clients always read their own
+writes. Whatever is still queued when the process exits is flushed. Event
+streams (see ``backend.events``) announce buffered shots when their batch
+commits, with their final IDs.
+
+Accepted shots are only discarded when they can never be written: their
+arrow was deleted, or the database rejects them (an integrity or data error,
+in which case the batch is retried shot by shot to find the culprits). Each
+discarded shot is logged. A batch that fails for any other reason, such as a
+lost connection, goes back to the head of the queue and is retried after an
+exponential backoff, while a full queue keeps turning new shots away.
+
+The buffer is per process: with several workers, read-your-writes holds for
+reads served by the worker that accepted the shot.
+"""
+
+import atexit
+import itertools
+import threading
+import time
+from collections import Counter, deque
+
+from flask import request
+from sqlalchemy import select
+from sqlalchemy.exc import DataError, IntegrityError
+from werkzeug.exceptions import ServiceUnavailable
+
+from backend.events import event_hub, scores_created
+from backend.extensions import db
+from backend.ingest import bulk_insert_scores
+from backend.models import Arrow
+from backend.versioning import touch
+
+# Errors after which retrying the same shots cannot succeed
+PERMANENT_ERRORS = (IntegrityError, DataError)
+
+
+class BufferFull(ServiceUnavailable):
+    """Raised when a shot cannot be queued because the buffer stayed full."""
+
+
+class WriteBuffer:
+    """
+    A bounded queue of accepted scores, flushed in batches by a background thread.
+
+    Attributes:
+        enabled (bool): Whether score submissions are buffered at all.
+        max_pending (int): The most shots queued at once.
+        batch_size (int): Shots written per transaction; also the queue length
+            that triggers a flush.
+        flush_interval (float): Seconds the oldest queued shot may wait.
+        submit_timeout (float): Seconds a submitter waits for room in a full queue.
+        retry_backoff (float): Seconds before the first retry of a failed
+            batch; doubled after each further failure.
+        max_backoff (float): The longest wait between retries.
+        close_timeout (float): Seconds spent retrying at shutdown before the
+            shots still queued are given up.
+        flushed (int): Shots written since start.
+        batches (int): Transactions committed since start.
+        dropped (int): Shots discarded because their arrow was deleted or the
+            database rejected them.
+        retries (int): Failed batches put back on the queue.
+    """
+
+    def __init__(
+        self, max_pending=10_000, batch_size=500, flush_interval=0.05, submit_timeout=1.0,
+        retry_backoff=0.1, max_backoff=5.0, close_timeout=10.0,
+    ):
+        self.enabled = False
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.close_timeout = close_timeout
+        self.flushed = self.batches = self.dropped = self.retries = 0
+        self.app = None
+        # (queued at, arrow_id, quiver_id, row), oldest first
+        self._queue = deque()
+        # shots not yet committed, queued or in flight, per arrow and quiver
+        self._arrows = Counter()
+        self._quivers = Counter()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._closed = False
+        # consecutive failed batches, and when the next attempt is due
+        self._failures = 0
+        self._retry_at = float("-inf")
+
+    def init_app(self, app):
+        """
+        Configure the buffer from the app and install the read-your-writes hook.
+
+        Reads ``WRITE_BEHIND`` (off by default), ``WRITE_BEHIND_MAX_PENDING``,
+        ``WRITE_BEHIND_BATCH_SIZE``, ``WRITE_BEHIND_FLUSH_INTERVAL``,
+        ``WRITE_BEHIND_SUBMIT_TIMEOUT``, ``WRITE_BEHIND_RETRY_BACKOFF``,
+        ``WRITE_BEHIND_MAX_BACKOFF`` and ``WRITE_BEHIND_CLOSE_TIMEOUT`` (all
+        in seconds) from the app config.
+
+        Args:
+            app (flask.Flask): The application.
+        """
+        self.enabled = app.config.setdefault("WRITE_BEHIND", self.enabled)
+        self.max_pending = app.config.setdefault(
+            "WRITE_BEHIND_MAX_PENDING", self.max_pending
+        )
+        self.batch_size = app.config.setdefault(
+            "WRITE_BEHIND_BATCH_SIZE", self.batch_size
+        )
+        self.flush_interval = app.config.setdefault(
+            "WRITE_BEHIND_FLUSH_INTERVAL", self.flush_interval
+        )
+        self.submit_timeout = app.config.setdefault(
+            "WRITE_BEHIND_SUBMIT_TIMEOUT", self.submit_timeout
+        )
+        self.retry_backoff = app.config.setdefault(
+            "WRITE_BEHIND_RETRY_BACKOFF", self.retry_backoff
+        )
+        self.max_backoff = app.config.setdefault(
+            "WRITE_BEHIND_MAX_BACKOFF", self.max_backoff
+        )
+        self.close_timeout = app.config.setdefault(
+            "WRITE_BEHIND_CLOSE_TIMEOUT", self.close_timeout
+        )
+        self.app = app
+        app.extensions["write_buffer"] = self
+        app.before_request(self._read_your_writes)
+        atexit.unregister(self.close)
+        atexit.register(self.close)
+
+    def submit(self, arrow, row):
+        """
+        Queue one validated score for writing.
+
+        Args:
+            arrow (Arrow): The arrow the score belongs to.
+            row (dict): The score's 'arrow_id', 'score', 'x', 'y' and 'shot_at'.
+
+        Returns:
+            str: A provisional ID for the accepted score.
+
+        Raises:
+            BufferFull: If the queue stayed full for ``submit_timeout`` seconds.
+        """
+        with self._cond:
+            deadline = time.monotonic() + self.submit_timeout
+            while len(self._queue) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BufferFull(
+                        "Too many scores are waiting to be written; try again shortly",
+                        retry_after=1,
+                    )
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+            self._queue.append((time.monotonic(), arrow.id, arrow.quiver_id, row))
+            self._arrows[arrow.id] += 1
+            self._quivers[arrow.quiver_id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="score-write-behind", daemon=True
+                )
+                self._thread.start()
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return f"pending-{next(self._ids)}"
+
+    def pending(self, arrow_id=None, quiver_id=None):
+        """
+        Count the shots accepted but not yet committed.
+
+        Args:
+            arrow_id (int | None): Only count this arrow's shots.
+            quiver_id (int | None): Only count the shots of this quiver's arrows.
+
+        Returns:
+            int: The number of uncommitted shots.
+        """
+        with self._cond:
+            if arrow_id is not None:
+                return self._arrows[arrow_id]
+            if quiver_id is not None:
+                return self._quivers[quiver_id]
+            return sum(self._arrows.values())
+
+    def info(self):
+        """
+        Report the number of pending shots and the counters.
+
+        Returns:
+            dict: Pending shots and the flushed, batches, dropped and retries
+            counters, read together.
+        """
+        with self._cond:
+            return {
+                "pending": sum(self._arrows.values()),
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "retries": self.retries,
+            }
+
+    def flush(self):
+        """
+        Write every queued shot now, in batches, and wait until they are committed.
+
+        A batch that fails with a transient error is put back at the head of
+        the queue and flushing stops; the background thread retries it after
+        the backoff.
+
+        Returns:
+            bool: True if the queue was emptied, False if a batch must be retried.
+        """
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    size = min(self.batch_size, len(self._queue))
+                    batch = [self._queue.popleft() for _ in range(size)]
+                    self._cond.notify_all()
+                if not batch:
+                    return True
+                done = self._write_batch(batch)
+                if done < len(batch):
+                    self._retry_later(batch[done:])
+                    return False
+
+    def close(self):
+        """
+        Stop the background thread after flushing everything still queued.
+
+        Failed batches are retried for up to ``close_timeout`` seconds; the
+        shots still queued after that are logged and given up.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        deadline = time.monotonic() + self.close_timeout
+        while not self.flush() and self._retry_at < deadline:
+            time.sleep(max(0.0, self._retry_at - time.monotonic()))
+        with self._cond:
+            lost, self._queue = list(self._queue), deque()
+        if lost:
+            self.app.logger.error(
+                "Gave up on %d buffered scores that could not be written", len(lost)
+            )
+            self._settle(lost, 0)
+        with self._cond:
+            self._closed = False
+
+    def _run(self):
+        """Flush whenever a batch is full or the oldest shot has waited long enough."""
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    if not self._queue:
+                        wait = None
+                    elif now < self._retry_at:
+                        wait = self._retry_at - now
+                    elif len(self._queue) >= self.batch_size:
+                        break
+                    else:
+                        wait = self._queue[0][0] + self.flush_interval - now
+                        if wait <= 0:
+                            break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+            self.flush()
+
+    def _write_batch(self, entries):
+        """
+        Write queued shots, isolating the ones the database rejects.
+
+        Args:
+            entries (list[tuple]): Queued ``(queued at, arrow_id, quiver_id, row)``
+                entries, oldest first.
+
+        Returns:
+            int: How many of the entries, from the start, were written or
+            dropped; the rest failed with a transient error.
+        """
+        try:
+            self._write(entries)
+            return len(entries)
+        except PERMANENT_ERRORS:
+            if len(entries) == 1:
+                self.app.logger.exception(
+                    "Dropped a buffered score the database rejected: %r", entries[0][3]
+                )
+                self._settle(entries, 0)
+                return 1
+        except Exception:  # pylint: disable=broad-except
+            self.app.logger.exception(
+                "Write-behind batch of %d scores failed; it will be retried", len(entries)
+            )
+            return 0
+        # some shot of the batch can never be written: find it by writing them singly
+        for done, entry in enumerate(entries):
+            if not self._write_batch([entry]):
+                return done
+        return len(entries)
+
+    def _retry_later(self, entries):
+        """Put failed entries back at the head of the queue and back off."""
+        with self._cond:
+            self._queue.extendleft(reversed(entries))
+            self.retries += 1
+            self._failures += 1
+            delay = min(self.max_backoff, self.retry_backoff * 2 ** (self._failures - 1))
+            self._retry_at = time.monotonic() + delay
+            self._cond.notify_all()
+
+    def _settle(self, entries, written):
+        """Stop counting entries as pending, as written or dropped ones."""
+        with self._cond:
+            for _, arrow_id, quiver_id, _ in entries:
+                self._arrows[arrow_id] -= 1
+                self._quivers[quiver_id] -= 1
+            # adding an empty Counter drops the zero counts
+            self._arrows += Counter()
+            self._quivers += Counter()
+            if written:
+                self.flushed += written
+                self.batches += 1
+                self._failures = 0
+            self.dropped += len(entries) - written
+            self._cond.notify_all()
+
+    def _write(self, entries):
+        """Insert one batch in its own app context and transaction."""
+        with self.app.app_context():
+            arrow_ids = {arrow_id for _, arrow_id, _, _ in entries}
+            arrows = {
+                a.id: a
+                for a in db.session.scalars(select(Arrow).where(Arrow.id.in_(arrow_ids)))
+            }
+            kept = [entry for entry in entries if entry[1] in arrows]
+            gone = [entry for entry in entries if entry[1] not in arrows]
+            created = []
+            if kept:
+                rows = [row for _, _, _, row in kept]
+                ids = bulk_insert_scores(arrows, rows)
+                touch(*{arrows[row["arrow_id"]] for row in rows})
+                created = scores_created(arrows, rows, ids)
+                db.session.commit()
+                self._settle(kept, len(kept))
+            if gone:
+                self.app.logger.warning(
+                    "Dropped %d buffered scores of deleted arrows", len(gone)
+                )
+                self._settle(gone, 0)
+            event_hub.publish_all(created)
+
+    def _read_your_writes(self):
+        """Flush buffered shots that the current read depends on."""
+        if request.method not in ("GET", "HEAD") or not self.pending():
+            return
+        args = request.view_args or {}
+        if "arrow_id" in args:
+            needed = self.pending(arrow_id=args["arrow_id"])
+        elif "quiver_id" in args:
+            needed = self.pending(quiver_id=args["quiver_id"])
+        else:
+            needed = True
+        if needed and not self.flush():
+            raise ServiceUnavailable(
+                "Buffered scores could not be written yet; try again shortly",
+                retry_after=1,
+            )
+
+
+write_buffer = WriteBuffer()